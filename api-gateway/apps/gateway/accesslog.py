@@ -0,0 +1,206 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+
+from shared.tracing import tracer
+
+from .ratelimit import get_client_ip
+
+DEFAULT_ACCESS_LOG_SETTINGS = {
+    'ENABLED': True,
+    'HEAD_SAMPLE_RATE': 0.1,
+    'TAIL_MIN_STATUS': 500,
+    'TAIL_SLOW_THRESHOLD': 1.0,
+    'QUEUE_SIZE': 10000,
+    'FILE': None,
+    'REDACT': ['authorization', 'cookie', 'x-gateway-admin-token', 'password',
+               'password_confirm', 'token', 'access', 'refresh', 'secret'],
+    'CAPTURE_BODIES': False,
+    'MAX_BODY_SIZE': 4096,
+}
+
+REDACTED = '[redacted]'
+
+
+class JsonRecordFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; сериализация идет в потоке QueueListener"""
+
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись и не блокирует запрос
+
+    Запись уходит в очередь как есть (словарь), а при переполненной очереди
+    отбрасывается: потеря части access log лучше задержки запросов.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessLog:
+    """Структурированный access log gateway: одна JSON-запись на запрос
+
+    Записи пишутся логгером gateway.access через очередь; форматирование и
+    запись на диск выполняет фоновый поток. В лог попадает доля
+    HEAD_SAMPLE_RATE запросов (решение принимается в начале запроса) и все
+    ошибки и медленные запросы (решение в конце - tail sampling).
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('gateway.access')
+        self.handler = None
+        self._listener = None
+
+    @property
+    def config(self) -> Dict:
+        config = dict(DEFAULT_ACCESS_LOG_SETTINGS)
+        config.update(getattr(settings, 'ACCESS_LOG', {}))
+        return config
+
+    def start(self):
+        """Подключение очереди и фонового потока записи (один раз на процесс)"""
+        if self._listener is not None:
+            return
+        config = self.config
+        log_queue = queue.Queue(maxsize=config['QUEUE_SIZE'])
+
+        if config['FILE']:
+            target = logging.FileHandler(config['FILE'])
+        else:
+            target = logging.StreamHandler(sys.stdout)
+        target.setFormatter(JsonRecordFormatter())
+
+        self.handler = DroppingQueueHandler(log_queue)
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+        self._listener = QueueListener(log_queue, target)
+        self._listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def begin(self, request) -> Optional[Dict]:
+        """Начало записи о запросе или None, если access log выключен"""
+        config = self.config
+        if not config['ENABLED']:
+            return None
+        span = tracer.current_span()
+        return {
+            'started': time.monotonic(),
+            'trace_id': span.context.trace_id if span else None,
+            'head_sampled': random.random() < config['HEAD_SAMPLE_RATE'],
+            'config': config,
+        }
+
+    def finish(self, request, response, state: Dict, response_bytes: int):
+        """Запись о завершенном запросе, если он попал в выборку"""
+        config = state['config']
+        duration = time.monotonic() - state['started']
+        status = response.status_code
+
+        if state['head_sampled']:
+            sampled = 'head'
+        elif status >= config['TAIL_MIN_STATUS'] or duration >= config['TAIL_SLOW_THRESHOLD']:
+            sampled = 'tail'
+        else:
+            return
+
+        route = getattr(request, 'gateway_route', None)
+        claims = getattr(request, 'jwt_claims', None)
+        entry = {
+            'ts': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'query': redact_query(request.META.get('QUERY_STRING', ''), config['REDACT']),
+            'route': route.prefix if route else None,
+            'upstream': route.upstream if route else None,
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'upstream_ms': getattr(request, 'upstream_ms', None),
+            'request_bytes': content_length(request),
+            'response_bytes': response_bytes,
+            'cache': response.get('X-Cache'),
+            'client_ip': get_client_ip(request),
+            'user_id': claims.get('user_id') if claims else None,
+            'sampled': sampled,
+            'trace_id': state['trace_id'],
+        }
+
+        # Тела и заголовки - только в отладочном режиме
+        if config['CAPTURE_BODIES']:
+            entry['request_headers'] = redact(dict(request.headers), config['REDACT'])
+            entry['request_body'] = capture_body(getattr(request, '_body', b''), config)
+            if not response.streaming:
+                entry['response_body'] = capture_body(response.content, config)
+
+        self.logger.info(entry)
+
+
+def content_length(request) -> int:
+    """Размер тела запроса по Content-Length; некорректный заголовок - 0"""
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return 0
+
+
+def redact(value, keys):
+    """Копия JSON-подобного значения со скрытыми значениями секретных ключей"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in keys else redact(item, keys)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item, keys) for item in value]
+    return value
+
+
+def redact_query(query_string: str, keys) -> str:
+    if not query_string:
+        return ''
+    params = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([(key, REDACTED if key.lower() in keys else value) for key, value in params], safe='[]')
+
+
+def capture_body(body: bytes, config: Dict):
+    """Тело для отладочного лога: JSON со скрытыми секретами, не больше MAX_BODY_SIZE"""
+    if not body:
+        return None
+    if len(body) > config['MAX_BODY_SIZE']:
+        # Обрезанный JSON нельзя надежно очистить от секретов
+        return f'<{len(body)} bytes>'
+    try:
+        return redact(json.loads(body), config['REDACT'])
+    except ValueError:
+        return body.decode('utf-8', errors='replace')
+
+
+access_log = AccessLog()
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+from typing import Dict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from shared.deadline import reset_deadline, set_deadline
+
+from .concurrency import get_request_priority
+from .routing import route_table
+from .upstream import send_upstream_request
+from .views import ProxyView, describe_upstream_error, get_request_deadline, read_raw_body
+
+DEFAULT_STOREFRONT_SETTINGS = {
+    'TIMEOUT': 5.0,
+    'SECTIONS': {},
+}
+
+
+def get_storefront_settings() -> Dict:
+    config = dict(DEFAULT_STOREFRONT_SETTINGS)
+    config.update(getattr(settings, 'STOREFRONT', {}))
+    return config
+
+
+class StorefrontView(ProxyView):
+    """Витрина одним запросом: разделы из нескольких сервисов параллельно
+
+    Каждый раздел - GET к пути gateway из settings.STOREFRONT['SECTIONS'],
+    который проходит ту же таблицу маршрутов, кэш ответов и балансировку, что
+    и обычный запрос. Ошибка или таймаут раздела не ломает остальные: раздел
+    возвращается со своим статусом и текстом ошибки.
+
+    Параметры запроса:
+    sections=products,categories - только перечисленные разделы
+    products.page=2              - параметр запроса раздела products
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({'error': f'Method {request.method} not allowed'}, status=405)
+
+        config = get_storefront_settings()
+        sections = config['SECTIONS']
+        requested = request.GET.get('sections')
+        if requested:
+            sections = {name: sections[name] for name in requested.split(',') if name in sections}
+
+        request.priority = get_request_priority(request)
+        started = time.monotonic()
+        token = set_deadline(get_request_deadline(request, config['TIMEOUT']))
+        try:
+            results = await asyncio.gather(*[
+                self.fetch_section(request, name, section, config['TIMEOUT'])
+                for name, section in sections.items()
+            ])
+        finally:
+            reset_deadline(token)
+        return JsonResponse({
+            'sections': dict(zip(sections, results)),
+            'latency_ms': round((time.monotonic() - started) * 1000, 1),
+        })
+
+    async def fetch_section(self, request, name, section, timeout):
+        """Загрузка одного раздела: {'status', 'data' или 'error', 'latency_ms'}"""
+        started = time.monotonic()
+        try:
+            status, data = await asyncio.wait_for(self.load_section(request, name, section), timeout)
+        except Exception as e:
+            status, data = describe_upstream_error(e, f"storefront section {name}")
+
+        result = {'status': status, 'data' if status < 400 else 'error': data}
+        result['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        return result
+
+    async def load_section(self, request, name, section):
+        path = section['path']
+        route = route_table.match(path)
+        if route is None:
+            return 404, {'error': 'Service not found'}
+
+        # Персональные разделы без действительного токена не запрашиваем
+        requires_auth = section.get('auth') == 'required' or route.auth == 'required'
+        if requires_auth and not getattr(request, 'jwt_claims', None):
+            return 401, {'error': 'Authentication required'}
+
+        params = dict(section.get('params', {}))
+        prefix = f"{name}."
+        params.update({key[len(prefix):]: value for key, value in request.GET.items() if key.startswith(prefix)})
+        query_string = urlencode(params)
+
+        # Тело раздела встраивается в общий JSON, поэтому сжатие не запрашиваем
+        headers = self.get_forward_headers(request)
+        headers.pop('Accept-Encoding', None)
+        target_path = route.target_path(path)
+        upstream_path = f"{target_path}?{query_string}" if query_string else target_path
+
+        if route.cache:
+            entry, _ = await self.load_cached_entry(route, path, query_string, upstream_path, headers,
+                                                    route.cache, request.priority)
+            return entry.status, decode_body(entry.body)
+
+        response = await send_upstream_request(route.upstream, 'GET', upstream_path, headers,
+                                               read_timeout=route.timeout, hedge=route.hedge,
+                                               priority=request.priority)
+        return response.status_code, decode_body(await read_raw_body(response))
+
+
+def decode_body(body: bytes):
+    """Тело ответа сервиса как JSON, если это возможно"""
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode('utf-8', errors='replace')
+
+
+storefront_view = StorefrontView.as_view()
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class GatewayConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.gateway'
+
+    def ready(self):
+        from django.conf import settings
+        from .balancer import load_balancer
+        from .routing import route_table
+
+        # Компилируем таблицу маршрутов и пулы экземпляров один раз при старте процесса
+        route_table.load(settings.GATEWAY_ROUTES, settings.MICROSERVICES)
+        load_balancer.load(settings.MICROSERVICES)
@@ -0,0 +1,35 @@
+import logging
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from shared.identity import build_identity_headers
+from shared.jwks import jwks_verifier
+
+logger = logging.getLogger(__name__)
+
+
+def get_bearer_token(request) -> Optional[str]:
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
+def verify_access_token(token: str) -> Optional[Dict]:
+    """Локальная проверка подписи и срока действия access токена по ключам JWKS user-service"""
+    return jwks_verifier.verify(token)
+
+
+async def averify_access_token(token: str) -> Optional[Dict]:
+    """verify_access_token для ASGI: ключи загружаются без блокировки event loop"""
+    return await jwks_verifier.averify(token)
+
+
+def get_identity_headers(claims: Dict) -> Dict[str, str]:
+    """Подписанные заголовки идентичности для сервисов"""
+    return build_identity_headers(
+        settings.GATEWAY_IDENTITY_SECRET,
+        claims['user_id'],
+        claims.get('email', '')
+    )
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import math
+import random
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .resilience import resilience
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BALANCING_SETTINGS = {
+    'strategy': 'round_robin',
+    'ewma_decay': 10.0,
+    'health_check_path': '/health/',
+    'health_check_interval': 5.0,
+    'health_check_timeout': 1.0,
+    'unhealthy_threshold': 2,
+    'healthy_threshold': 1,
+}
+
+
+def get_balancing_settings(service_name: str) -> Dict:
+    """Настройки балансировки сервиса: значения по умолчанию + переопределения"""
+    config = dict(DEFAULT_BALANCING_SETTINGS)
+    configured = getattr(settings, 'UPSTREAM_BALANCING', {})
+    config.update(configured.get('default', {}))
+    config.update(configured.get(service_name, {}))
+    return config
+
+
+def get_instance_urls(value) -> List[str]:
+    """Адреса экземпляров сервиса: строка или список строк из MICROSERVICES"""
+    urls = [value] if isinstance(value, str) else list(value)
+    return [url.rstrip('/') for url in urls]
+
+
+class UpstreamInstance:
+    """Экземпляр сервиса и его текущая нагрузка"""
+
+    __slots__ = ('url', 'decay', 'outstanding', 'ewma', 'ewma_updated_at', 'healthy',
+                 'health_failures', 'health_successes', 'requests', 'failures')
+
+    def __init__(self, url: str, decay: float):
+        self.url = url
+        self.decay = decay
+        self.outstanding = 0
+        self.ewma = 0.0
+        self.ewma_updated_at = 0.0
+        self.healthy = True
+        self.health_failures = 0
+        self.health_successes = 0
+        self.requests = 0
+        self.failures = 0
+
+    def start(self):
+        self.outstanding += 1
+        self.requests += 1
+
+    def cancel(self, elapsed: Optional[float] = None):
+        """Запрос отменен; elapsed - сколько он уже ждал (нижняя оценка задержки)"""
+        self.outstanding -= 1
+        if elapsed is not None:
+            # Иначе экземпляр, чьи медленные запросы всегда отменяет хедж, выглядел бы быстрым
+            self._observe(elapsed)
+
+    def finish(self, success: bool, latency: float):
+        self.outstanding -= 1
+        if not success:
+            self.failures += 1
+        self._observe(latency)
+
+    def _observe(self, latency: float):
+        # EWMA с затуханием по времени: давние замеры весят меньше
+        now = time.monotonic()
+        weight = math.exp(-(now - self.ewma_updated_at) / self.decay) if self.ewma_updated_at else 0.0
+        self.ewma = self.ewma * weight + latency * (1 - weight)
+        self.ewma_updated_at = now
+
+    def current_ewma(self) -> float:
+        """EWMA, затухающая без новых замеров, чтобы простаивающий экземпляр снова получил пробу"""
+        if not self.ewma_updated_at:
+            return 0.0
+        return self.ewma * math.exp(-(time.monotonic() - self.ewma_updated_at) / self.decay)
+
+    @property
+    def ejected(self) -> bool:
+        return resilience.outliers.is_ejected(self.url)
+
+    def snapshot(self) -> Dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'ejected': self.ejected,
+            'outstanding': self.outstanding,
+            'ewma_ms': round(self.current_ewma() * 1000, 2),
+            'requests': self.requests,
+            'failures': self.failures,
+        }
+
+
+class RoundRobinStrategy:
+    """По очереди"""
+
+    def __init__(self):
+        self._next = 0
+
+    def choose(self, instances: List[UpstreamInstance]) -> UpstreamInstance:
+        self._next += 1
+        return instances[self._next % len(instances)]
+
+
+class LeastOutstandingStrategy:
+    """Экземпляр с наименьшим числом незавершенных запросов"""
+
+    def choose(self, instances: List[UpstreamInstance]) -> UpstreamInstance:
+        fewest = min(instance.outstanding for instance in instances)
+        return random.choice([instance for instance in instances if instance.outstanding == fewest])
+
+
+class PowerOfTwoEWMAStrategy:
+    """Лучший из двух случайных экземпляров по EWMA задержки с учетом очереди
+
+    Два случайных кандидата вместо полного перебора не дают всем процессам
+    gateway одновременно навалиться на один самый быстрый экземпляр.
+    """
+
+    def choose(self, instances: List[UpstreamInstance]) -> UpstreamInstance:
+        if len(instances) == 1:
+            return instances[0]
+        first, second = random.sample(instances, 2)
+        return first if self._cost(first) <= self._cost(second) else second
+
+    def _cost(self, instance: UpstreamInstance) -> float:
+        # Экземпляр без замеров считается быстрым, чтобы он получил трафик
+        return (instance.current_ewma() + 0.001) * (instance.outstanding + 1)
+
+
+STRATEGIES = {
+    'round_robin': RoundRobinStrategy,
+    'least_outstanding': LeastOutstandingStrategy,
+    'p2c_ewma': PowerOfTwoEWMAStrategy,
+}
+
+
+class UpstreamPool:
+    """Экземпляры одного сервиса и стратегия выбора между ними"""
+
+    def __init__(self, service_name: str, urls: List[str], config: Dict):
+        strategy_class = STRATEGIES.get(config['strategy'])
+        if strategy_class is None:
+            raise ImproperlyConfigured(
+                f"Unknown balancing strategy {config['strategy']!r} for {service_name}")
+        if not urls:
+            raise ImproperlyConfigured(f"Service {service_name} has no instances")
+
+        self.service_name = service_name
+        self.config = config
+        self.instances = [UpstreamInstance(url, config['ewma_decay']) for url in urls]
+        self.strategy = strategy_class()
+
+    def choose(self, exclude: Iterable[UpstreamInstance] = ()) -> UpstreamInstance:
+        """Выбор экземпляра для запроса
+
+        Исключенные детектором выбросов и не прошедшие health check экземпляры
+        пропускаются. Если таких не осталось (panic mode), трафик идет на все
+        экземпляры: лучше попытаться, чем отказать всем запросам.
+        """
+        candidates = [
+            instance for instance in self.instances
+            if instance not in exclude and instance.healthy and not instance.ejected
+        ]
+        if not candidates:
+            candidates = [instance for instance in self.instances if instance not in exclude] or self.instances
+            if len(self.instances) > 1:
+                logger.warning(f"No healthy instances of {self.service_name}, balancing across all")
+        return self.strategy.choose(candidates)
+
+    def snapshot(self) -> Dict:
+        return {
+            'strategy': self.config['strategy'],
+            'instances': [instance.snapshot() for instance in self.instances],
+        }
+
+
+class LoadBalancer:
+    """Пулы экземпляров всех сервисов и активные health checks"""
+
+    def __init__(self):
+        self._pools = {}
+        self._health_tasks = weakref.WeakKeyDictionary()
+
+    def load(self, services: Dict):
+        """Построение пулов из настроек (MICROSERVICES, UPSTREAM_BALANCING)"""
+        self._pools = {
+            service_name: UpstreamPool(service_name, get_instance_urls(urls), get_balancing_settings(service_name))
+            for service_name, urls in services.items()
+        }
+
+    def pool(self, service_name: str) -> UpstreamPool:
+        return self._pools[service_name]
+
+    def start_health_checks(self):
+        """Запуск health checks в event loop ASGI-сервера (при старте, см. config/asgi.py)"""
+        loop = asyncio.get_running_loop()
+        if loop in self._health_tasks:
+            return
+        self._health_tasks[loop] = [
+            loop.create_task(self._health_check_loop(pool)) for pool in self._pools.values()
+        ]
+
+    async def stop_health_checks(self):
+        tasks = self._health_tasks.pop(asyncio.get_running_loop(), [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _health_check_loop(self, pool: UpstreamPool):
+        config = pool.config
+        async with httpx.AsyncClient(timeout=config['health_check_timeout']) as client:
+            while True:
+                await asyncio.gather(*[
+                    self._check_instance(client, pool, instance) for instance in pool.instances
+                ])
+                await asyncio.sleep(config['health_check_interval'])
+
+    async def _check_instance(self, client: httpx.AsyncClient, pool: UpstreamPool, instance: UpstreamInstance):
+        config = pool.config
+        try:
+            response = await client.get(f"{instance.url}{config['health_check_path']}")
+            passed = response.status_code == 200
+        except httpx.HTTPError:
+            passed = False
+
+        if passed:
+            instance.health_failures = 0
+            instance.health_successes += 1
+            if not instance.healthy and instance.health_successes >= config['healthy_threshold']:
+                instance.healthy = True
+                logger.info(f"Instance {instance.url} of {pool.service_name} is back in rotation")
+        else:
+            instance.health_successes = 0
+            instance.health_failures += 1
+            if instance.healthy and instance.health_failures >= config['unhealthy_threshold']:
+                instance.healthy = False
+                logger.warning(f"Instance {instance.url} of {pool.service_name} failed health checks")
+
+    def snapshot(self) -> Dict:
+        return {service_name: pool.snapshot() for service_name, pool in self._pools.items()}
+
+
+load_balancer = LoadBalancer()
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SETTINGS = {
+    'MAX_ENTRIES': 1000,
+    'MAX_BODY_SIZE': 1024 * 1024,
+    'VARY_HEADERS': ['Accept', 'Accept-Encoding', 'Accept-Language'],
+}
+
+# Заголовки ответа сервиса, которые сохраняются вместе с телом
+STORED_HEADERS = ['Content-Type', 'Content-Encoding', 'Cache-Control', 'Last-Modified']
+
+
+class CacheEntry:
+    """Закэшированный ответ сервиса"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes,
+                 ttl: float, stale_ttl: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stored_at = time.monotonic()
+        self.etag = headers.get('ETag') or f'"{hashlib.md5(body).hexdigest()}"'
+
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+    def is_fresh(self) -> bool:
+        return self.age() < self.ttl
+
+    def is_usable(self) -> bool:
+        """Запись еще можно отдавать (свежая или в окне stale-while-revalidate)"""
+        return self.age() < self.ttl + self.stale_ttl
+
+    def is_cacheable(self, max_body_size: int) -> bool:
+        cache_control = self.headers.get('Cache-Control', '').lower()
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return False
+        return self.status == 200 and len(self.body) <= max_body_size
+
+
+class ResponseCache:
+    """In-process LRU кэш GET-ответов каталога
+
+    Ключ строится из пути, нормализованной query string и заголовков из
+    VARY_HEADERS. Устаревшие записи отдаются, пока одна фоновая задача
+    обновляет их в сервисе (stale-while-revalidate).
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def config(self) -> Dict:
+        config = dict(DEFAULT_CACHE_SETTINGS)
+        config.update(getattr(settings, 'RESPONSE_CACHE', {}))
+        return config
+
+    def get_policy(self, request, route) -> Optional[Dict]:
+        """Политика кэширования для запроса или None, если запрос не кэшируется"""
+        if request.method != 'GET':
+            return None
+
+        # Политика задается в маршруте (ключ 'cache' в GATEWAY_ROUTES)
+        policy = route.cache
+
+        # Данные об остатках не кэшируем
+        if policy and request.path.endswith(tuple(policy.get('exclude_suffixes', []))):
+            return None
+        return policy
+
+    def build_key(self, path: str, query_string: str, headers) -> str:
+        """Ключ кэша: путь, отсортированные параметры запроса и значимые заголовки"""
+        query = urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+        vary = '|'.join(headers.get(name, '') for name in self.config['VARY_HEADERS'])
+        return f"{path}?{query}|{vary}"
+
+    def lookup(self, key: str):
+        """Поиск записи, возвращает (запись или None, статус: HIT/STALE/MISS)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.is_fresh():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, 'HIT'
+            if entry.is_usable():
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return entry, 'STALE'
+            del self._entries[key]
+
+        self.misses += 1
+        return None, 'MISS'
+
+    def make_entry(self, status: int, headers, body: bytes, policy: Dict) -> CacheEntry:
+        stored_headers = {name: headers[name] for name in STORED_HEADERS + ['ETag'] if name in headers}
+        return CacheEntry(status, stored_headers, body,
+                          ttl=policy.get('ttl', 30), stale_ttl=policy.get('stale_ttl', 0))
+
+    def store(self, key: str, entry: CacheEntry):
+        if not entry.is_cacheable(self.config['MAX_BODY_SIZE']):
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config['MAX_ENTRIES']:
+            self._entries.popitem(last=False)
+
+    def schedule_refresh(self, key: str, refresh):
+        """Запуск одной фоновой задачи обновления записи
+
+        refresh - фабрика корутины, возвращающей новую CacheEntry.
+        """
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def run():
+            try:
+                self.store(key, await refresh())
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def purge(self, prefix: str = '') -> int:
+        """Удаление записей, путь которых начинается с prefix"""
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        logger.info(f"Purged {len(keys)} cache entries with prefix '{prefix}'")
+        return len(keys)
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+        }
+
+    def build_response(self, request, entry: CacheEntry, cache_status: str):
+        """Ответ клиенту из записи кэша, с локальной обработкой If-None-Match"""
+        if entry.status == 200 and etag_matches(request.headers.get('If-None-Match'), entry.etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(entry.body, status=entry.status,
+                                    content_type=entry.headers.get('Content-Type', 'application/json'))
+            for name, value in entry.headers.items():
+                response[name] = value
+
+        response['ETag'] = entry.etag
+        response['Age'] = str(int(entry.age()))
+        response['X-Cache'] = cache_status
+        return response
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (слабое сравнение, как для GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [value.strip().removeprefix('W/') for value in if_none_match.split(',')]
+    return etag.removeprefix('W/') in candidates
+
+
+response_cache = ResponseCache()
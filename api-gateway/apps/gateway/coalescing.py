@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import weakref
+from typing import Dict
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCING_SETTINGS = {
+    'ENABLED': True,
+    'KEY_HEADERS': ['Accept', 'Accept-Encoding', 'Accept-Language'],
+    'WAIT_TIMEOUT': 10.0,
+}
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых запросов в один запрос к сервису
+
+    Первый запрос с ключом запускает загрузку отдельной задачей, остальные
+    ждут ее результата не дольше WAIT_TIMEOUT. Загрузка не отменяется, если
+    клиент, который ее начал, отключился: результат нужен остальным.
+    """
+
+    def __init__(self):
+        # Задачи привязаны к event loop, поэтому хранятся отдельно для каждого loop
+        self._inflight = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    @property
+    def config(self) -> Dict:
+        config = dict(DEFAULT_COALESCING_SETTINGS)
+        config.update(getattr(settings, 'REQUEST_COALESCING', {}))
+        return config
+
+    def build_key(self, method: str, path: str, query_string: str, headers) -> str:
+        """Ключ объединения: путь, отсортированные параметры и заголовки из KEY_HEADERS"""
+        query = urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+        key_headers = '|'.join(headers.get(name, '') for name in self.config['KEY_HEADERS'])
+        return f"{method} {path}?{query}|{key_headers}"
+
+    async def do(self, key: str, fetch):
+        """Результат fetch() для ключа, один на все одновременные вызовы
+
+        fetch - фабрика корутины. Ошибка загрузки передается всем ожидающим.
+        """
+        config = self.config
+        if not config['ENABLED']:
+            return await fetch()
+
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = loop.create_task(fetch())
+            inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(inflight, key, done))
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), config['WAIT_TIMEOUT'])
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Timed out waiting for in-flight request {key}")
+            raise
+
+    def _finish(self, inflight: Dict, key: str, task: asyncio.Task):
+        inflight.pop(key, None)
+        # Забираем ошибку, даже если ждать результат уже некому
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        return {
+            'in_flight': sum(len(inflight) for inflight in self._inflight.values()),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'timeouts': self.timeouts,
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,213 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+DEFAULT_CONCURRENCY_SETTINGS = {
+    'enabled': True,
+    'initial_limit': 20,
+    'min_limit': 2,
+    'max_limit': 200,
+    'slow_threshold': 1.0,
+    'backoff_ratio': 0.9,
+    'backoff_interval': 0.5,
+    'max_queue': 50,
+    'queue_timeout': 1.0,
+}
+
+# Классы запросов от важных к менее важным; при перегрузке первыми отклоняются последние
+PRIORITIES = ('critical', 'high', 'normal', 'low')
+DEFAULT_PRIORITY = PRIORITIES.index('normal')
+
+DEFAULT_PRIORITY_SETTINGS = {
+    'RULES': [],
+    'AUTHENTICATED': 'normal',
+    'ANONYMOUS': 'low',
+}
+
+
+def get_concurrency_settings(service_name: str) -> Dict:
+    """Настройки лимита параллельности сервиса: значения по умолчанию + переопределения"""
+    config = dict(DEFAULT_CONCURRENCY_SETTINGS)
+    configured = getattr(settings, 'UPSTREAM_CONCURRENCY', {})
+    config.update(configured.get('default', {}))
+    config.update(configured.get(service_name, {}))
+    return config
+
+
+def get_request_priority(request) -> int:
+    """Приоритет запроса (индекс в PRIORITIES): первое подходящее правило
+    REQUEST_PRIORITIES['RULES'], иначе класс по наличию JWT"""
+    config = dict(DEFAULT_PRIORITY_SETTINGS)
+    config.update(getattr(settings, 'REQUEST_PRIORITIES', {}))
+    for rule in config['RULES']:
+        methods = rule.get('methods')
+        if request.path.startswith(rule['prefix']) and (not methods or request.method in methods):
+            return PRIORITIES.index(rule['priority'])
+    if getattr(request, 'jwt_claims', None):
+        return PRIORITIES.index(config['AUTHENTICATED'])
+    return PRIORITIES.index(config['ANONYMOUS'])
+
+
+class OverloadedError(Exception):
+    """Запрос отклонен лимитером параллельности сервиса"""
+
+    def __init__(self, service_name: str, reason: str):
+        super().__init__(f"{service_name} is overloaded ({reason})")
+        self.service_name = service_name
+        self.reason = reason
+
+
+class Waiter:
+    """Запрос в очереди ожидания слота"""
+
+    __slots__ = ('priority', 'seq', 'loop', 'future', 'granted')
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+
+
+class AdaptiveLimiter:
+    """Адаптивный лимит одновременных запросов к сервису (AIMD)
+
+    Каждый успешный быстрый ответ увеличивает лимит на 1/limit (примерно +1
+    за "круг" запросов), ошибка или ответ медленнее slow_threshold уменьшает
+    его в backoff_ratio раз, не чаще раза в backoff_interval. Запросы сверх
+    лимита ждут в ограниченной очереди не дольше queue_timeout; освободившийся
+    слот получает самый приоритетный из ожидающих, а при полной очереди
+    новый запрос вытесняет менее приоритетный или сразу получает отказ.
+
+    Состояние защищено блокировкой, ожидающие будятся через свой event loop,
+    поэтому лимитер общий для процесса и под ASGI, и под WSGI.
+    """
+
+    def __init__(self, service_name: str, config: Dict):
+        self.service_name = service_name
+        self.config = config
+        self.limit = float(config['initial_limit'])
+        self.in_flight = 0
+        self.shed = {}
+        self._waiters: List[Waiter] = []
+        self._seq = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self, priority: int):
+        """Занять слот или дождаться его в очереди; иначе OverloadedError"""
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return
+            waiter = self._enqueue(priority)
+
+        try:
+            await asyncio.wait_for(waiter.future, self.config['queue_timeout'])
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            with self._lock:
+                if waiter.granted:
+                    # Слот выдан одновременно с таймаутом или отменой
+                    if timed_out:
+                        return
+                    self._release()
+                    raise
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                if timed_out:
+                    self._count_shed(priority, 'queue_timeout')
+            if timed_out:
+                raise OverloadedError(self.service_name, 'queue_timeout')
+            raise
+
+    def _enqueue(self, priority: int) -> Waiter:
+        if len(self._waiters) >= self.config['max_queue']:
+            lowest = max(self._waiters, key=lambda waiter: (waiter.priority, waiter.seq))
+            if lowest.priority <= priority:
+                self._count_shed(priority, 'queue_full')
+                raise OverloadedError(self.service_name, 'queue_full')
+            # Более важный запрос вытесняет наименее важный из очереди
+            self._waiters.remove(lowest)
+            self._count_shed(lowest.priority, 'preempted')
+            lowest.loop.call_soon_threadsafe(reject_waiter, lowest, self.service_name)
+
+        self._seq += 1
+        waiter = Waiter(priority, self._seq)
+        self._waiters.append(waiter)
+        return waiter
+
+    def release(self, latency: float, outcome: str):
+        """Освобождение слота; outcome - 'success', 'error' или 'cancelled' (лимит не меняется)"""
+        with self._lock:
+            if outcome != 'cancelled':
+                self._adjust(latency, outcome == 'success')
+            self._release()
+
+    def _release(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = min(self._waiters, key=lambda waiter: (waiter.priority, waiter.seq))
+            self._waiters.remove(waiter)
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.loop.call_soon_threadsafe(grant_waiter, waiter)
+
+    def _adjust(self, latency: float, success: bool):
+        config = self.config
+        if success and latency < config['slow_threshold']:
+            # Увеличиваем лимит, только если он действительно используется
+            if self.in_flight >= self.limit / 2:
+                self.limit = min(config['max_limit'], self.limit + 1 / self.limit)
+            return
+        now = time.monotonic()
+        if now - self._last_decrease >= config['backoff_interval']:
+            self._last_decrease = now
+            self.limit = max(config['min_limit'], self.limit * config['backoff_ratio'])
+
+    def _count_shed(self, priority: int, reason: str):
+        key = (PRIORITIES[priority], reason)
+        self.shed[key] = self.shed.get(key, 0) + 1
+
+    def snapshot(self) -> Dict:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': len(self._waiters),
+            'shed': {f"{priority}:{reason}": count for (priority, reason), count in self.shed.items()},
+        }
+
+
+def grant_waiter(waiter: Waiter):
+    if not waiter.future.done():
+        waiter.future.set_result(True)
+
+
+def reject_waiter(waiter: Waiter, service_name: str):
+    if not waiter.future.done():
+        waiter.future.set_exception(OverloadedError(service_name, 'preempted'))
+
+
+class ConcurrencyLimits:
+    """Лимитеры параллельности по сервисам"""
+
+    def __init__(self):
+        self._limiters = {}
+
+    def limiter(self, service_name: str) -> Optional[AdaptiveLimiter]:
+        """Лимитер сервиса или None, если ограничение выключено"""
+        if service_name not in self._limiters:
+            config = get_concurrency_settings(service_name)
+            limiter = AdaptiveLimiter(service_name, config) if config['enabled'] else None
+            self._limiters.setdefault(service_name, limiter)
+        return self._limiters[service_name]
+
+    def snapshot(self) -> Dict:
+        return {name: limiter.snapshot() for name, limiter in list(self._limiters.items()) if limiter}
+
+
+concurrency_limits = ConcurrencyLimits()
@@ -0,0 +1,70 @@
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.urls import resolve
+
+from apps.gateway.routing import route_table
+
+SAMPLE_PATHS = [
+    '/api/products/',
+    '/api/products/42/',
+    '/api/products/42/check-availability/',
+    '/api/categories/electronics/',
+    '/api/cart/',
+    '/api/cart/update/7/',
+    '/api/orders/create/',
+    '/api/orders/15/status/',
+    '/api/users/profile/',
+    '/api/auth/login/',
+    '/api/unknown/path/',
+]
+
+# Прежняя схема: шесть re_path и цепочка startswith в ProxyView
+LEGACY_PATTERNS = [re.compile(pattern) for pattern in [
+    r'^auth/.*', r'^users/.*', r'^products/.*',
+    r'^categories/.*', r'^cart/.*', r'^orders/.*',
+]]
+
+
+def legacy_match(path):
+    relative = path[len('/api/'):]
+    for pattern in LEGACY_PATTERNS:
+        if pattern.match(relative):
+            break
+    else:
+        return None
+
+    if path.startswith('/api/auth/') or path.startswith('/api/users/'):
+        return 'user-service'
+    elif path.startswith('/api/products/') or path.startswith('/api/categories/'):
+        return 'product-service'
+    elif path.startswith('/api/cart/'):
+        return 'cart-service'
+    elif path.startswith('/api/orders/'):
+        return 'order-service'
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Микробенчмарк стоимости маршрутизации запроса в gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        benchmarks = [
+            ('route table (prefix trie)', lambda: [route_table.match(path) for path in SAMPLE_PATHS]),
+            ('legacy re_path + startswith', lambda: [legacy_match(path) for path in SAMPLE_PATHS]),
+            ('django resolve + route table', lambda: [
+                (resolve(path), route_table.match(path)) for path in SAMPLE_PATHS
+            ]),
+        ]
+
+        self.stdout.write(f"{len(route_table.routes)} routes, {len(SAMPLE_PATHS)} paths, {iterations} iterations")
+        for name, func in benchmarks:
+            elapsed = min(timeit.repeat(func, number=iterations // len(SAMPLE_PATHS), repeat=3))
+            per_lookup_ns = elapsed / (iterations // len(SAMPLE_PATHS) * len(SAMPLE_PATHS)) * 1e9
+            self.stdout.write(f"{name:32} {per_lookup_ns:8.0f} ns/request")
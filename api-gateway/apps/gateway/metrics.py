@@ -0,0 +1,106 @@
+from shared.metrics import registry
+
+from .accesslog import access_log
+from .balancer import load_balancer
+from .cache import response_cache
+from .coalescing import single_flight
+from .concurrency import concurrency_limits
+from .resilience import CircuitBreaker, resilience
+
+# Метрики gateway; общие метрики HTTP - в shared/metrics.py (MetricsMiddleware)
+
+UPSTREAM_DURATION = registry.histogram(
+    'gateway_upstream_request_duration_seconds',
+    'Time waiting for upstream response headers, per attempt',
+    ('upstream', 'instance', 'outcome'))
+
+HEDGED_REQUESTS = registry.counter(
+    'gateway_upstream_hedged_requests_total',
+    'Hedging decisions: sent, won by the hedge, or skipped (budget_exhausted, no_instance, breaker_open)',
+    ('upstream', 'outcome'))
+
+RATE_LIMIT_REJECTIONS = registry.counter(
+    'gateway_rate_limit_rejections_total', 'Requests rejected by the rate limiter', ('route',))
+
+BREAKER_STATES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+def cache_lookups():
+    stats = response_cache.stats()
+    return [(('hit',), stats['hits']), (('stale',), stats['stale_hits']), (('miss',), stats['misses'])]
+
+
+def coalesced_requests():
+    stats = single_flight.stats()
+    return [(('leader',), stats['leaders']), (('waiter',), stats['coalesced']), (('timeout',), stats['timeouts'])]
+
+
+def breaker_states():
+    return [((name,), BREAKER_STATES[breaker['state']])
+            for name, breaker in resilience.snapshot()['breakers'].items()]
+
+
+def retries():
+    return [((name,), budget['retries']) for name, budget in resilience.snapshot()['retry_budgets'].items()]
+
+
+def instance_values(field):
+    def collect():
+        return [
+            ((service_name, instance['url']), int(instance[field]))
+            for service_name, pool in load_balancer.snapshot().items()
+            for instance in pool['instances']
+        ]
+    return collect
+
+
+def limiter_values(field):
+    def collect():
+        return [((name,), limiter[field]) for name, limiter in concurrency_limits.snapshot().items()]
+    return collect
+
+
+def shed_requests():
+    return [
+        ((name,) + tuple(key.split(':')), count)
+        for name, limiter in concurrency_limits.snapshot().items()
+        for key, count in limiter['shed'].items()
+    ]
+
+
+registry.counter_callback(
+    'gateway_cache_lookups_total', 'Response cache lookups by result', ('result',), cache_lookups)
+registry.gauge(
+    'gateway_cache_entries', 'Entries in the response cache', (),
+    lambda: [((), response_cache.stats()['entries'])])
+registry.counter_callback(
+    'gateway_coalesced_requests_total', 'Cache misses by single-flight role', ('role',), coalesced_requests)
+registry.gauge(
+    'gateway_breaker_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open', ('upstream',), breaker_states)
+registry.counter_callback(
+    'gateway_upstream_retries_total', 'Retried upstream requests', ('upstream',), retries)
+registry.gauge(
+    'gateway_upstream_hedge_delay_seconds', 'Current hedging delay (latency percentile) per upstream',
+    ('upstream',), lambda: [((name,), policy['delay'])
+                            for name, policy in resilience.snapshot()['hedging'].items()])
+registry.gauge(
+    'gateway_upstream_outstanding_requests', 'In-flight requests per upstream instance',
+    ('upstream', 'instance'), instance_values('outstanding'))
+registry.gauge(
+    'gateway_upstream_healthy', 'Active health check result per upstream instance',
+    ('upstream', 'instance'), instance_values('healthy'))
+registry.gauge(
+    'gateway_upstream_concurrency_limit', 'Adaptive concurrency limit per upstream', ('upstream',),
+    limiter_values('limit'))
+registry.gauge(
+    'gateway_upstream_in_flight_requests', 'Requests holding a concurrency slot per upstream', ('upstream',),
+    limiter_values('in_flight'))
+registry.gauge(
+    'gateway_upstream_queued_requests', 'Requests waiting for a concurrency slot per upstream', ('upstream',),
+    limiter_values('queued'))
+registry.counter_callback(
+    'gateway_shed_requests_total', 'Requests rejected by the concurrency limiter',
+    ('upstream', 'priority', 'reason'), shed_requests)
+registry.counter_callback(
+    'gateway_access_log_dropped_total', 'Access log records dropped on a full queue', (),
+    lambda: [((), access_log.handler.dropped if access_log.handler else 0)])
@@ -1,51 +1,164 @@
 import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import JsonResponse
-from django.core.cache import cache
-from django.conf import settings
+from .accesslog import access_log
+from .auth import averify_access_token, get_bearer_token, verify_access_token
+from .metrics import RATE_LIMIT_REJECTIONS
+from .ratelimit import get_route_limit, rate_limiter
+
+class AccessLogMiddleware:
+    """Структурированный access log (см. apps/gateway/accesslog.py)
+
+    Стоит в MIDDLEWARE сразу после TracingMiddleware (нужен trace_id) и
+    MetricsMiddleware, до всех middleware, которые могут отклонить запрос,
+    чтобы учитывать и отклоненные запросы (401, 429). Для потокового ответа
+    запись делается, когда тело отдано клиенту.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        access_log.start()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = access_log.begin(request)
+        response = self.get_response(request)
+        return self.log_response(request, response, state)
+
+    async def __acall__(self, request):
+        state = access_log.begin(request)
+        response = await self.get_response(request)
+        return self.log_response(request, response, state)
+
+    def log_response(self, request, response, state):
+        if state is None:
+            return response
+        if not response.streaming:
+            access_log.finish(request, response, state, len(response.content))
+            return response
+
+        if response.is_async:
+            response.streaming_content = self.count_async(request, response, state, response.streaming_content)
+        else:
+            response.streaming_content = self.count_sync(request, response, state, response.streaming_content)
+        return response
+
+    async def count_async(self, request, response, state, content):
+        sent = 0
+        try:
+            async for chunk in content:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            access_log.finish(request, response, state, sent)
+
+    def count_sync(self, request, response, state, content):
+        sent = 0
+        try:
+            for chunk in content:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            access_log.finish(request, response, state, sent)
+
+class EdgeAuthenticationMiddleware:
+    """Проверка JWT на входе в gateway
+
+    Подпись и срок действия токена проверяются локально по открытым ключам
+    user-service (shared/jwks.py) один раз, результат сохраняется в
+    request.jwt_claims. Запрос с недействительным токеном не отклоняется: он
+    уходит в сервис без заголовков идентичности, и решение принимает сам
+    сервис.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        self.authenticate(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        token = get_bearer_token(request)
+        request.jwt_claims = await averify_access_token(token) if token else None
+        return await self.get_response(request)
+
+    def authenticate(self, request):
+        token = get_bearer_token(request)
+        request.jwt_claims = verify_access_token(token) if token else None
 
 class RateLimitMiddleware:
-    """Middleware для ограничения частоты запросов"""
+    """Middleware для ограничения частоты запросов
+
+    Лимиты считаются в Redis (см. apps/gateway/ratelimit.py) и общие для всех
+    процессов gateway. Настройки - settings.RATE_LIMIT.
+    """
+
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        # В асинхронном режиме (ASGI) не переключаемся в поток на каждый запрос
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Пропускаем статические файлы и админку
-        if request.path.startswith('/static/') or request.path.startswith('/admin/'):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if self.should_skip(request):
             return self.get_response(request)
 
-        # Получаем IP адрес клиента
-        client_ip = self.get_client_ip(request)
+        result = rate_limiter.check(request)
+        if not result.allowed:
+            return self.rejection_response(request, result)
 
-        # Создаем ключ для кэша
-        cache_key = f"rate_limit:{client_ip}"
+        response = self.get_response(request)
+        return self.add_limit_headers(response, result)
 
-        # Получаем текущее количество запросов
-        current_requests = cache.get(cache_key, 0)
+    async def __acall__(self, request):
+        if self.should_skip(request):
+            return await self.get_response(request)
 
-        # Проверяем лимит
-        if current_requests >= settings.RATE_LIMIT_REQUESTS_PER_MINUTE:
-            return JsonResponse({
-                'error': 'Rate limit exceeded',
-                'message': f'Maximum {settings.RATE_LIMIT_REQUESTS_PER_MINUTE} requests per minute allowed'
-            }, status=429)
+        result = await rate_limiter.acheck(request)
+        if not result.allowed:
+            return self.rejection_response(request, result)
 
-        # Увеличиваем счетчик
-        cache.set(cache_key, current_requests + 1, 60)  # 60 секунд
+        response = await self.get_response(request)
+        return self.add_limit_headers(response, result)
 
-        response = self.get_response(request)
+    def should_skip(self, request):
+        # Пропускаем статические файлы и админку
+        return request.path.startswith('/static/') or request.path.startswith('/admin/')
+
+    def rejection_response(self, request, result):
+        RATE_LIMIT_REJECTIONS.inc(get_route_limit(request.path)[0])
+        response = JsonResponse({
+            'error': 'Rate limit exceeded',
+            'message': f'Maximum {result.limit} requests allowed, retry in {result.retry_after:.1f}s'
+        }, status=429)
+        response['Retry-After'] = str(max(1, int(result.retry_after + 0.999)))
+        return self.add_limit_headers(response, result)
 
+    def add_limit_headers(self, response, result):
         # Добавляем заголовки с информацией о лимитах
-        response['X-RateLimit-Limit'] = str(settings.RATE_LIMIT_REQUESTS_PER_MINUTE)
-        response['X-RateLimit-Remaining'] = str(max(0, settings.RATE_LIMIT_REQUESTS_PER_MINUTE - current_requests - 1))
+        response['X-RateLimit-Limit'] = str(result.limit)
+        response['X-RateLimit-Remaining'] = str(result.remaining)
 
         return response
-
-    def get_client_ip(self, request):
-        """Получение IP адреса клиента"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import uuid
+import weakref
+from collections import namedtuple
+from typing import Dict
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'retry_after'])
+
+# Token bucket: емкость limit, полное пополнение за period.
+# Время берется из Redis (TIME), поэтому часы всех узлов gateway не важны.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local rate = capacity / period
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], period)
+return {allowed, math.floor(tokens), retry_after}
+"""
+
+# Sliding window log: отметки запросов в ZSET за последние period мс
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - period)
+local count = redis.call('ZCARD', KEYS[1])
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], period)
+    return {1, limit - count - 1, 0}
+end
+
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, 0, math.max(1, tonumber(oldest[2]) + period - now)}
+"""
+
+SCRIPTS = {
+    'token_bucket': TOKEN_BUCKET_SCRIPT,
+    'sliding_window': SLIDING_WINDOW_SCRIPT,
+}
+
+
+def get_rate_limit_config() -> Dict:
+    config = {
+        'REDIS_URL': 'redis://localhost:6379/0',
+        'DEFAULT': {
+            'algorithm': 'token_bucket',
+            'limit': settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+            'period': 60,
+            'identity': 'ip',
+        },
+        'ROUTES': {},
+    }
+    config.update(getattr(settings, 'RATE_LIMIT', {}))
+    return config
+
+
+def get_route_limit(path: str):
+    """Политика лимита для пути, возвращает (префикс маршрута, политика)"""
+    config = get_rate_limit_config()
+    policy = dict(config['DEFAULT'])
+    matched_prefix = ''
+    for prefix in config['ROUTES']:
+        if path.startswith(prefix) and len(prefix) > len(matched_prefix):
+            matched_prefix = prefix
+    if matched_prefix:
+        policy.update(config['ROUTES'][matched_prefix])
+    return matched_prefix or '*', policy
+
+
+def get_client_ip(request) -> str:
+    """Получение IP адреса клиента"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def get_identity(request, policy: Dict) -> str:
+    """Ключ клиента: JWT subject для identity='user' (если есть), иначе IP"""
+    # jwt_claims заполняет EdgeAuthenticationMiddleware после проверки подписи
+    claims = getattr(request, 'jwt_claims', None)
+    if policy.get('identity') == 'user' and claims:
+        return f"user:{claims['user_id']}"
+    return f"ip:{get_client_ip(request)}"
+
+
+class RateLimiter:
+    """Распределенный лимитер запросов на Redis
+
+    Каждая проверка - один атомарный вызов Lua-скрипта (EVALSHA), поэтому
+    счетчики общие и точные для всех процессов и узлов gateway.
+    """
+
+    def __init__(self):
+        self._sync_scripts = None
+        self._async_scripts = weakref.WeakKeyDictionary()
+
+    def _register(self, client):
+        return {name: client.register_script(script) for name, script in SCRIPTS.items()}
+
+    def _get_sync_scripts(self):
+        if self._sync_scripts is None:
+            client = redis.Redis.from_url(get_rate_limit_config()['REDIS_URL'])
+            self._sync_scripts = self._register(client)
+        return self._sync_scripts
+
+    def _get_async_scripts(self):
+        # Асинхронный клиент привязан к event loop, как и пулы соединений к сервисам
+        loop = asyncio.get_running_loop()
+        scripts = self._async_scripts.get(loop)
+        if scripts is None:
+            client = aioredis.Redis.from_url(get_rate_limit_config()['REDIS_URL'])
+            scripts = self._async_scripts[loop] = self._register(client)
+        return scripts
+
+    def _prepare(self, request):
+        route_prefix, policy = get_route_limit(request.path)
+        key = f"rate_limit:{policy['algorithm']}:{route_prefix}:{get_identity(request, policy)}"
+        args = [policy['limit'], int(policy['period'] * 1000), uuid.uuid4().hex]
+        return key, args, policy
+
+    def check(self, request) -> RateLimitResult:
+        key, args, policy = self._prepare(request)
+        try:
+            result = self._get_sync_scripts()[policy['algorithm']](keys=[key], args=args)
+        except redis.RedisError as e:
+            return self._fail_open(policy, e)
+        return self._to_result(result, policy)
+
+    async def acheck(self, request) -> RateLimitResult:
+        key, args, policy = self._prepare(request)
+        try:
+            result = await self._get_async_scripts()[policy['algorithm']](keys=[key], args=args)
+        except redis.RedisError as e:
+            return self._fail_open(policy, e)
+        return self._to_result(result, policy)
+
+    def _to_result(self, result, policy) -> RateLimitResult:
+        allowed, remaining, retry_after_ms = result
+        return RateLimitResult(bool(allowed), policy['limit'], int(remaining), int(retry_after_ms) / 1000)
+
+    def _fail_open(self, policy, error) -> RateLimitResult:
+        # Недоступность Redis не должна останавливать весь трафик
+        logger.error(f"Rate limiter unavailable, allowing request: {error}")
+        return RateLimitResult(True, policy['limit'], policy['limit'], 0)
+
+
+rate_limiter = RateLimiter()
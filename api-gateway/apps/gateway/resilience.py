@@ -0,0 +1,364 @@
+import time
+from collections import deque
+from typing import Dict
+
+from django.conf import settings
+
+DEFAULT_RESILIENCE_SETTINGS = {
+    'CIRCUIT_BREAKER': {
+        'window': 10,
+        'min_requests': 20,
+        'error_rate_threshold': 0.5,
+        'slow_call_threshold': 5.0,
+        'slow_call_rate_threshold': 0.8,
+        'open_duration': 15,
+        'half_open_max_calls': 5,
+    },
+    'RETRY': {
+        'methods': ['GET', 'HEAD', 'OPTIONS'],
+        'max_attempts': 3,
+        'retry_on_status': [502, 503, 504],
+        'backoff': 0.05,
+        'budget_ratio': 0.2,
+        'budget_min_per_second': 1.0,
+    },
+    'OUTLIER_DETECTION': {
+        'consecutive_errors': 5,
+        'base_ejection_time': 30,
+        'max_ejection_time': 300,
+        'max_ejection_percent': 50,
+    },
+    'HEDGING': {
+        'percentile': 0.95,
+        'window': 1000,
+        'min_samples': 50,
+        'initial_delay': 0.1,
+        'min_delay': 0.01,
+        'max_delay': 1.0,
+        'budget_ratio': 0.05,
+        'budget_min_per_second': 1.0,
+    },
+}
+
+
+def get_resilience_settings(section: str) -> Dict:
+    config = dict(DEFAULT_RESILIENCE_SETTINGS[section])
+    config.update(getattr(settings, 'UPSTREAM_RESILIENCE', {}).get(section, {}))
+    return config
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: circuit breaker сервиса разомкнут"""
+
+    def __init__(self, service_name: str, retry_after: float):
+        super().__init__(f"Circuit open for {service_name}")
+        self.service_name = service_name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker одного сервиса: closed -> open -> half-open
+
+    Ошибки и медленные вызовы считаются в скользящем окне посекундных корзин.
+    При превышении порога доли ошибок или медленных вызовов breaker
+    размыкается на open_duration секунд, затем пропускает несколько пробных
+    запросов (half-open) и замыкается, если все они успешны.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, service_name: str, config: Dict):
+        self.service_name = service_name
+        self.config = config
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.half_opened_at = 0.0
+        self.times_opened = 0
+        self._buckets = deque()
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+
+    def allow_request(self) -> bool:
+        """Можно ли отправить запрос; каждый разрешенный вызов завершается record()"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.config['open_duration']:
+                return False
+            self._half_open()
+
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.config['half_open_max_calls']:
+                # Пробные запросы зависли (например, клиент отключился) - начинаем пробу заново
+                if time.monotonic() - self.half_opened_at < self.config['open_duration']:
+                    return False
+                self._half_open()
+            self._half_open_calls += 1
+
+        return True
+
+    def release(self):
+        """Возврат разрешения без результата (запрос отменен)"""
+        if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record(self, success: bool, latency: float):
+        """Учет результата вызова"""
+        if self.state == self.HALF_OPEN:
+            if not success:
+                self._open()
+                return
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.config['half_open_max_calls']:
+                self.state = self.CLOSED
+                self._buckets.clear()
+            return
+
+        bucket = self._current_bucket()
+        bucket[1] += 1
+        if not success:
+            bucket[2] += 1
+        if latency >= self.config['slow_call_threshold']:
+            bucket[3] += 1
+
+        if self.state == self.CLOSED and self._should_open():
+            self._open()
+
+    def retry_after(self) -> float:
+        return max(0.0, self.config['open_duration'] - (time.monotonic() - self.opened_at))
+
+    def _current_bucket(self):
+        now = int(time.monotonic())
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0, 0])
+        while self._buckets and self._buckets[0][0] <= now - self.config['window']:
+            self._buckets.popleft()
+        return self._buckets[-1]
+
+    def _totals(self):
+        total = errors = slow = 0
+        for _, bucket_total, bucket_errors, bucket_slow in self._buckets:
+            total += bucket_total
+            errors += bucket_errors
+            slow += bucket_slow
+        return total, errors, slow
+
+    def _should_open(self) -> bool:
+        total, errors, slow = self._totals()
+        if total < self.config['min_requests']:
+            return False
+        return (errors / total >= self.config['error_rate_threshold']
+                or slow / total >= self.config['slow_call_rate_threshold'])
+
+    def _half_open(self):
+        self.state = self.HALF_OPEN
+        self.half_opened_at = time.monotonic()
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._buckets.clear()
+
+    def snapshot(self) -> Dict:
+        total, errors, slow = self._totals()
+        return {
+            'state': self.state,
+            'window_requests': total,
+            'window_errors': errors,
+            'window_slow_calls': slow,
+            'times_opened': self.times_opened,
+            'retry_after': round(self.retry_after(), 1) if self.state == self.OPEN else 0,
+        }
+
+
+class RetryBudget:
+    """Бюджет повторов сервиса
+
+    Каждый исходный запрос пополняет бюджет на budget_ratio токена, плюс
+    budget_min_per_second токенов в секунду; повтор тратит один токен. Так
+    повторы не превышают заданной доли трафика и не добивают деградирующий
+    сервис.
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self.max_tokens = max(10.0, config['budget_min_per_second'] * 10)
+        self.tokens = self.max_tokens
+        self.updated_at = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.config['budget_ratio'])
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens,
+                          self.tokens + (now - self.updated_at) * self.config['budget_min_per_second'])
+        self.updated_at = now
+
+    def snapshot(self) -> Dict:
+        return {
+            'tokens': round(self.tokens, 2),
+            'retries': self.retries,
+            'exhausted': self.exhausted,
+        }
+
+
+class OutlierDetector:
+    """Исключение экземпляров сервиса после подряд идущих ошибок
+
+    Экземпляр исключается на base_ejection_time * (число исключений) секунд,
+    но не более max_ejection_time. Одновременно исключается не больше
+    max_ejection_percent экземпляров сервиса (хотя бы один).
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self._hosts = {}
+        self._consecutive_errors = {}
+        self._ejected_until = {}
+        self._ejection_count = {}
+
+    def record(self, service_name: str, host: str, success: bool):
+        self._hosts.setdefault(service_name, set()).add(host)
+        if success:
+            self._consecutive_errors[host] = 0
+            return
+
+        errors = self._consecutive_errors.get(host, 0) + 1
+        self._consecutive_errors[host] = errors
+        if errors >= self.config['consecutive_errors'] and not self.is_ejected(host):
+            self._eject(service_name, host)
+
+    def is_ejected(self, host: str) -> bool:
+        return self._ejected_until.get(host, 0) > time.monotonic()
+
+    def _eject(self, service_name: str, host: str):
+        now = time.monotonic()
+        hosts = self._hosts[service_name]
+        ejected = sum(1 for other in hosts if self._ejected_until.get(other, 0) > now)
+        max_ejected = max(1, len(hosts) * self.config['max_ejection_percent'] // 100)
+        if ejected >= max_ejected:
+            return
+
+        count = self._ejection_count.get(host, 0) + 1
+        self._ejection_count[host] = count
+        duration = min(self.config['base_ejection_time'] * count, self.config['max_ejection_time'])
+        self._ejected_until[host] = now + duration
+        self._consecutive_errors[host] = 0
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        return {
+            host: {
+                'ejected': self._ejected_until.get(host, 0) > now,
+                'ejected_for': round(max(0.0, self._ejected_until.get(host, 0) - now), 1),
+                'consecutive_errors': self._consecutive_errors.get(host, 0),
+                'times_ejected': self._ejection_count.get(host, 0),
+            }
+            for hosts in self._hosts.values() for host in hosts
+        }
+
+
+class HedgePolicy:
+    """Хеджирование запросов к сервису: задержка второй попытки и бюджет
+
+    Задержка - заданный перцентиль задержки последних window ответов
+    сервиса (до min_samples замеров - initial_delay) в пределах
+    [min_delay, max_delay]. Перцентиль пересчитывается раз в
+    RECOMPUTE_EVERY замеров, а не на каждый запрос. Хеджи тратят токены
+    собственного бюджета с той же моделью, что и у повторов.
+    """
+
+    RECOMPUTE_EVERY = 20
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self.budget = RetryBudget(config)
+        self.latencies = deque(maxlen=config['window'])
+        self.hedges = 0
+        self.wins = 0
+        self._delay = config['initial_delay']
+        self._pending = 0
+
+    def observe(self, latency: float):
+        self.latencies.append(latency)
+        self._pending += 1
+        if self._pending >= self.RECOMPUTE_EVERY and len(self.latencies) >= self.config['min_samples']:
+            self._pending = 0
+            ordered = sorted(self.latencies)
+            value = ordered[min(len(ordered) - 1, int(len(ordered) * self.config['percentile']))]
+            self._delay = min(self.config['max_delay'], max(self.config['min_delay'], value))
+
+    def delay(self) -> float:
+        return self._delay
+
+    def snapshot(self) -> Dict:
+        return {
+            'delay': round(self._delay, 4),
+            'samples': len(self.latencies),
+            'tokens': round(self.budget.tokens, 2),
+            'hedges': self.hedges,
+            'wins': self.wins,
+            'exhausted': self.budget.exhausted,
+        }
+
+
+class ResilienceRegistry:
+    """Circuit breakers, бюджеты повторов и хеджирование по сервисам"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._budgets = {}
+        self._hedging = {}
+        self._outliers = None
+
+    def breaker(self, service_name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(service_name)
+        if breaker is None:
+            breaker = self._breakers[service_name] = CircuitBreaker(
+                service_name, get_resilience_settings('CIRCUIT_BREAKER'))
+        return breaker
+
+    def retry_budget(self, service_name: str) -> RetryBudget:
+        budget = self._budgets.get(service_name)
+        if budget is None:
+            budget = self._budgets[service_name] = RetryBudget(get_resilience_settings('RETRY'))
+        return budget
+
+    def hedging(self, service_name: str) -> HedgePolicy:
+        policy = self._hedging.get(service_name)
+        if policy is None:
+            policy = self._hedging[service_name] = HedgePolicy(get_resilience_settings('HEDGING'))
+        return policy
+
+    @property
+    def outliers(self) -> OutlierDetector:
+        if self._outliers is None:
+            self._outliers = OutlierDetector(get_resilience_settings('OUTLIER_DETECTION'))
+        return self._outliers
+
+    def snapshot(self) -> Dict:
+        return {
+            'breakers': {name: breaker.snapshot() for name, breaker in self._breakers.items()},
+            'retry_budgets': {name: budget.snapshot() for name, budget in self._budgets.items()},
+            'hedging': {name: policy.snapshot() for name, policy in self._hedging.items()},
+            'outliers': self.outliers.snapshot(),
+        }
+
+
+resilience = ResilienceRegistry()
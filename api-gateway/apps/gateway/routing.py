@@ -0,0 +1,105 @@
+from typing import Dict, List, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class Route:
+    """Маршрут gateway: префикс пути -> сервис"""
+
+    __slots__ = ('prefix', 'depth', 'upstream', 'rewrite', 'timeout', 'methods', 'cache', 'auth', 'hedge')
+
+    def __init__(self, prefix: str, upstream: str, rewrite: Optional[str] = None,
+                 timeout: Optional[float] = None, methods: Optional[List[str]] = None,
+                 cache: Optional[Dict] = None, auth: str = 'optional', hedge: bool = False):
+        self.prefix = prefix
+        # Число сегментов префикса: match сравнивает сегменты, а не символы пути
+        self.depth = len(split_path(prefix))
+        self.upstream = upstream
+        self.rewrite = rewrite
+        self.timeout = timeout
+        self.methods = frozenset(method.upper() for method in methods) if methods else None
+        self.cache = cache
+        self.auth = auth
+        self.hedge = hedge
+
+    def target_path(self, path: str) -> str:
+        """Путь в сервисе с учетом переписывания префикса"""
+        if self.rewrite is None:
+            return path
+        # Отрезаются совпавшие сегменты, а не len(prefix) символов: в пути
+        # могут быть пустые сегменты ('/api//products/1' совпадает с '/api/products/')
+        rest = strip_segments(path, self.depth)
+        if self.prefix.endswith('/'):
+            return self.rewrite + rest.lstrip('/')
+        return self.rewrite + ('/' + rest.lstrip('/') if rest else '')
+
+    def allows_method(self, method: str) -> bool:
+        return self.methods is None or method in self.methods
+
+    def __repr__(self):
+        return f"Route({self.prefix!r} -> {self.upstream!r})"
+
+
+class RouteTable:
+    """Таблица маршрутов, скомпилированная в префиксное дерево по сегментам пути
+
+    Поиск проходит путь один раз и возвращает маршрут с самым длинным
+    совпавшим префиксом, поэтому стоимость - O(длины пути) и не зависит от
+    количества маршрутов.
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.routes = []
+
+    def load(self, route_configs: List[Dict], services: Dict):
+        """Компиляция маршрутов из настроек (GATEWAY_ROUTES)"""
+        root = {}
+        routes = []
+        for config in route_configs:
+            config = dict(config)
+            prefix = config.pop('prefix', '')
+            upstream = config.pop('upstream', None)
+            if not prefix.startswith('/'):
+                raise ImproperlyConfigured(f"Gateway route prefix must start with '/': {prefix!r}")
+            if upstream not in services:
+                raise ImproperlyConfigured(f"Gateway route {prefix} points to unknown service {upstream!r}")
+
+            route = Route(prefix, upstream, **config)
+            node = root
+            for segment in split_path(prefix):
+                node = node.setdefault(segment, {})
+            node[None] = route
+            routes.append(route)
+
+        self._root = root
+        self.routes = routes
+
+    def match(self, path: str) -> Optional[Route]:
+        """Маршрут с самым длинным префиксом для пути"""
+        node = self._root
+        route = node.get(None)
+        for segment in split_path(path):
+            node = node.get(segment)
+            if node is None:
+                break
+            route = node.get(None, route)
+        return route
+
+
+def split_path(path: str) -> List[str]:
+    return [segment for segment in path.split('/') if segment]
+
+
+def strip_segments(path: str, count: int) -> str:
+    """Остаток пути после первых count непустых сегментов (начинается с '/' или пустой)"""
+    index = 0
+    for _ in range(count):
+        while path.startswith('/', index):
+            index += 1
+        end = path.find('/', index)
+        index = len(path) if end == -1 else end
+    return path[index:]
+
+
+route_table = RouteTable()
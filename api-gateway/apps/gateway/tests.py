@@ -1,3 +1,44 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from shared.deadline import DeadlineExceeded, reset_deadline, set_deadline
+
+from .resilience import resilience
+from .routing import Route
+from .upstream import send_with_retries
+
+
+class RouteTargetPathTest(SimpleTestCase):
+    """Переписывание префикса по совпавшим сегментам пути"""
+
+    def test_rewrite_keeps_rest_of_path(self):
+        route = Route('/api/v2/', 'product-service', rewrite='/api/')
+        self.assertEqual(route.target_path('/api/v2/products/1/'), '/api/products/1/')
+
+    def test_rewrite_with_empty_segments(self):
+        route = Route('/api/v2/', 'product-service', rewrite='/api/')
+        self.assertEqual(route.target_path('/api//v2/products/1/'), '/api/products/1/')
+        self.assertEqual(route.target_path('/api/v2//products/1'), '/api/products/1')
+
+    def test_prefix_without_trailing_slash(self):
+        route = Route('/api/v2', 'product-service', rewrite='/api')
+        self.assertEqual(route.target_path('/api/v2/products'), '/api/products')
+        self.assertEqual(route.target_path('/api/v2'), '/api')
+
+
+class SendWithRetriesDeadlineTest(SimpleTestCase):
+    """Истекший срок запроса не занимает разрешения circuit breaker"""
+
+    async def test_expired_deadline_releases_half_open_permit(self):
+        breaker = resilience.breaker('deadline-test-service')
+        breaker._half_open()
+        token = set_deadline(time.time() - 1)
+        try:
+            for hedge in (False, True):
+                with self.assertRaises(DeadlineExceeded):
+                    await send_with_retries('deadline-test-service', 'GET', '/api/products/', {},
+                                            None, None, hedge=hedge)
+                self.assertEqual(breaker._half_open_calls, 0)
+        finally:
+            reset_deadline(token)
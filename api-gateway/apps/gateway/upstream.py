@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import random
+import time
+import weakref
+from typing import Dict, List, Optional
+
+import httpx
+from django.conf import settings
+
+from shared.deadline import DeadlineExceeded, deadline_headers, get_timeout
+from shared.tracing import TRACEPARENT_HEADER, tracer
+
+from .balancer import load_balancer
+from .concurrency import DEFAULT_PRIORITY, concurrency_limits
+from .metrics import HEDGED_REQUESTS, UPSTREAM_DURATION
+from .resilience import CircuitOpenError, get_resilience_settings, resilience
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SETTINGS = {
+    'max_connections': 100,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 30.0,
+    'connect_timeout': 5.0,
+    'read_timeout': 30.0,
+    'write_timeout': 30.0,
+    'pool_timeout': 5.0,
+}
+
+
+def get_pool_settings(service_name: str) -> Dict:
+    """Настройки пула для сервиса: значения по умолчанию + переопределения"""
+    pool_settings = dict(DEFAULT_POOL_SETTINGS)
+    configured = getattr(settings, 'UPSTREAM_POOL', {})
+    pool_settings.update(configured.get('default', {}))
+    pool_settings.update(configured.get(service_name, {}))
+    return pool_settings
+
+
+class UpstreamPools:
+    """Реестр долгоживущих пулов соединений к микросервисам
+
+    httpx.AsyncClient привязан к event loop, в котором открыты его соединения,
+    поэтому клиенты хранятся отдельно для каждого loop. Под ASGI-сервером loop
+    один на процесс, и на каждый сервис приходится ровно один пул keep-alive
+    соединений.
+    """
+
+    def __init__(self):
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get_client(self, service_name: str) -> httpx.AsyncClient:
+        """Получение клиента (пула соединений) для сервиса"""
+        loop = asyncio.get_running_loop()
+        clients = self._clients.setdefault(loop, {})
+        client = clients.get(service_name)
+        if client is None or client.is_closed:
+            client = self._create_client(service_name)
+            clients[service_name] = client
+            logger.info(f"Created connection pool for {service_name}")
+        return client
+
+    def _create_client(self, service_name: str) -> httpx.AsyncClient:
+        pool_settings = get_pool_settings(service_name)
+        limits = httpx.Limits(
+            max_connections=pool_settings['max_connections'],
+            max_keepalive_connections=pool_settings['max_keepalive_connections'],
+            keepalive_expiry=pool_settings['keepalive_expiry'],
+        )
+        timeout = httpx.Timeout(
+            connect=pool_settings['connect_timeout'],
+            read=pool_settings['read_timeout'],
+            write=pool_settings['write_timeout'],
+            pool=pool_settings['pool_timeout'],
+        )
+        return httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=False)
+
+    async def aclose(self):
+        """Закрытие всех пулов текущего event loop"""
+        loop = asyncio.get_running_loop()
+        clients = self._clients.pop(loop, {})
+        for service_name, client in clients.items():
+            await client.aclose()
+            logger.info(f"Closed connection pool for {service_name}")
+
+
+upstream_pools = UpstreamPools()
+
+
+def record_result(service_name: str, host: str, success: bool, latency: float):
+    """Учет результата вызова в circuit breaker и детекторе выбросов"""
+    resilience.breaker(service_name).record(success, latency)
+    resilience.outliers.record(service_name, host, success)
+
+
+def is_retryable_method(method: str) -> bool:
+    return method in get_resilience_settings('RETRY')['methods']
+
+
+async def send_upstream_request(service_name: str, method: str, path: str,
+                                headers: Dict, content: Optional[bytes] = None,
+                                read_timeout: Optional[float] = None,
+                                hedge: bool = False, priority: int = DEFAULT_PRIORITY) -> httpx.Response:
+    """Отправка запроса в сервис в пределах адаптивного лимита параллельности
+
+    Запрос (со всеми повторами и хеджем) занимает один слот лимитера сервиса
+    до получения заголовков ответа; при перегрузке - OverloadedError без
+    обращения к сервису. Задержка и исход запроса корректируют лимит.
+    """
+    limiter = concurrency_limits.limiter(service_name)
+    if limiter is None:
+        return await send_with_retries(service_name, method, path, headers, content, read_timeout, hedge)
+
+    await limiter.acquire(priority)
+    started = time.monotonic()
+    outcome = 'cancelled'
+    try:
+        response = await send_with_retries(service_name, method, path, headers, content, read_timeout, hedge)
+        outcome = 'success' if response.status_code < 500 else 'error'
+        return response
+    except (httpx.TransportError, asyncio.TimeoutError):
+        outcome = 'error'
+        raise
+    finally:
+        # Быстрый отказ breaker и отмена клиентом лимит не меняют
+        limiter.release(time.monotonic() - started, outcome)
+
+
+async def send_with_retries(service_name: str, method: str, path: str, headers: Dict,
+                            content: Optional[bytes], read_timeout: Optional[float],
+                            hedge: bool) -> httpx.Response:
+    """Отправка запроса в сервис через circuit breaker, с повторами в рамках бюджета
+
+    Экземпляр сервиса выбирает балансировщик, повтор уходит на другой
+    экземпляр, если он есть. Тело ответа читается потоком; вызывающий код
+    закрывает ответ. Повторяются только идемпотентные методы и только при
+    ошибках соединения или статусах из retry_on_status, пока позволяет бюджет
+    повторов сервиса. С hedge=True первая попытка идемпотентного запроса
+    хеджируется (см. send_hedged).
+    """
+    retry_config = get_resilience_settings('RETRY')
+    breaker = resilience.breaker(service_name)
+    budget = resilience.retry_budget(service_name)
+    client = upstream_pools.get_client(service_name)
+    idempotent = is_retryable_method(method)
+    max_attempts = retry_config['max_attempts'] if idempotent else 1
+    hedging = resilience.hedging(service_name)
+
+    def send(attempt, hedge=False):
+        # Вызывается после allow_request() (попытки или хеджа)
+        try:
+            timeout = get_attempt_timeout(client, read_timeout)
+        except DeadlineExceeded:
+            # Попытка не отправляется и record() не будет - возвращаем разрешение,
+            # иначе в half-open слот пробного запроса остается занятым навсегда
+            breaker.release()
+            raise
+        return send_attempt(client, service_name, method, path, headers, content, timeout, tried, attempt, hedge)
+
+    budget.deposit()
+    hedge = hedge and idempotent
+    if hedge:
+        hedging.budget.deposit()
+    tried = []
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow_request():
+            raise CircuitOpenError(service_name, breaker.retry_after())
+
+        try:
+            if hedge and attempt == 1:
+                response = await send_hedged(service_name, send, tried)
+            else:
+                response = await send(attempt)
+        except httpx.TransportError:
+            if attempt >= max_attempts or not budget.try_withdraw():
+                raise
+            logger.warning(f"Retrying {method} {service_name}{path} after connection error (attempt {attempt})")
+        else:
+            if (response.status_code not in retry_config['retry_on_status']
+                    or attempt >= max_attempts or not budget.try_withdraw()):
+                return response
+            await response.aclose()
+            logger.warning(f"Retrying {method} {service_name}{path} after status {response.status_code} "
+                           f"(attempt {attempt})")
+
+        # Экспоненциальная задержка с полным jitter
+        await asyncio.sleep(random.uniform(0, retry_config['backoff'] * 2 ** (attempt - 1)))
+
+
+def get_attempt_timeout(client: httpx.AsyncClient, read_timeout: Optional[float]) -> httpx.Timeout:
+    """Таймауты попытки: read-таймаут маршрута (или пула), но не дольше оставшегося срока запроса
+
+    Если срок уже истек - DeadlineExceeded, попытка не отправляется.
+    """
+    read = get_timeout(client.timeout.read if read_timeout is None else read_timeout)
+    return httpx.Timeout(connect=min(client.timeout.connect, read), read=read,
+                         write=client.timeout.write, pool=client.timeout.pool)
+
+
+async def send_attempt(client: httpx.AsyncClient, service_name: str, method: str, path: str,
+                       headers: Dict, content: Optional[bytes], timeout: httpx.Timeout,
+                       tried: List, attempt: int, hedge: bool = False) -> httpx.Response:
+    """Одна попытка на выбранный балансировщиком экземпляр (не из tried)
+
+    hedge - это хедж попытки attempt (атрибут спана, номер попытки тот же).
+    Результат учитывается в breaker, детекторе выбросов, метриках и
+    задержке хеджирования; ошибка соединения пробрасывается.
+    """
+    breaker = resilience.breaker(service_name)
+    instance = load_balancer.pool(service_name).choose(exclude=tried)
+    tried.append(instance)
+    host = instance.url
+    # Отдельный клиентский спан на каждую попытку; сервис продолжает трассу от него
+    span = tracer.start_span(f"{method} {service_name}", 'client', attributes={
+        'upstream': service_name, 'instance': host, 'attempt': attempt, 'hedge': hedge})
+    attempt_headers = deadline_headers(headers)
+    attempt_headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+    upstream_request = client.build_request(
+        method=method, url=f"{host}{path}", headers=attempt_headers, content=content, timeout=timeout
+    )
+    started = time.monotonic()
+    instance.start()
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except asyncio.CancelledError:
+        # Клиент ушел или победил хедж - это не ошибка сервиса, освобождаем слот пробного запроса
+        instance.cancel(time.monotonic() - started)
+        breaker.release()
+        span.status = 'cancelled'
+        tracer.finish_span(span)
+        raise
+    except httpx.TransportError as e:
+        latency = time.monotonic() - started
+        instance.finish(False, latency)
+        record_result(service_name, host, False, latency)
+        UPSTREAM_DURATION.observe(latency, service_name, host, 'error')
+        span.status = 'error'
+        span.set_attribute('error', repr(e))
+        tracer.finish_span(span)
+        raise
+
+    latency = time.monotonic() - started
+    success = response.status_code < 500
+    instance.finish(success, latency)
+    record_result(service_name, host, success, latency)
+    UPSTREAM_DURATION.observe(latency, service_name, host, str(response.status_code))
+    resilience.hedging(service_name).observe(latency)
+    span.set_attribute('http.status_code', response.status_code)
+    if not success:
+        span.status = 'error'
+    tracer.finish_span(span)
+    return response
+
+
+async def send_hedged(service_name: str, send, tried: List) -> httpx.Response:
+    """Первая попытка с хеджем: если за задержку хеджирования ответа нет,
+    та же попытка уходит на другой экземпляр, побеждает первый ответ
+
+    Проигравшая попытка отменяется (или ее ответ закрывается). Хедж
+    отправляется, только если есть другой экземпляр, breaker пропускает
+    запрос и в бюджете хеджирования есть токен.
+    """
+    hedging = resilience.hedging(service_name)
+    primary = asyncio.ensure_future(send(1))
+    secondary = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedging.delay())
+        if done:
+            return primary.result()
+
+        pool = load_balancer.pool(service_name)
+        if len(pool.instances) < 2 or not hedging.budget.try_withdraw():
+            HEDGED_REQUESTS.inc(service_name, 'budget_exhausted' if len(pool.instances) > 1 else 'no_instance')
+            return await primary
+        if not resilience.breaker(service_name).allow_request():
+            HEDGED_REQUESTS.inc(service_name, 'breaker_open')
+            return await primary
+
+        hedging.hedges += 1
+        HEDGED_REQUESTS.inc(service_name, 'sent')
+        secondary = asyncio.ensure_future(send(1, hedge=True))
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                # Первый полученный ответ побеждает: второй запрос отменяем, а если
+                # он завершился в том же wait - закрываем его ответ
+                for other in pending:
+                    other.cancel()
+                for other in (done | pending) - {task}:
+                    await finish_loser(other)
+                if task is secondary:
+                    hedging.wins += 1
+                    HEDGED_REQUESTS.inc(service_name, 'won')
+                return task.result()
+        raise error
+    except asyncio.CancelledError:
+        # Запрос клиента отменен - отменяем и обе попытки
+        primary.cancel()
+        if secondary is not None:
+            secondary.cancel()
+        raise
+
+
+async def finish_loser(task: asyncio.Future):
+    """Дождаться отмены проигравшей попытки; если ответ уже получен - закрыть его"""
+    try:
+        response = await task
+    except (asyncio.CancelledError, Exception):
+        # Ошибка проигравшей попытки ни на что не влияет
+        return
+    await response.aclose()
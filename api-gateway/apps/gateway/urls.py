@@ -1,19 +1,11 @@
-from django.urls import re_path
+from django.urls import path, re_path
 from . import views
+from .aggregation import storefront_view
 
-# Все API запросы проксируем к соответствующим сервисам
+# Все API запросы проксируем к соответствующим сервисам,
+# сервис выбирается по таблице маршрутов settings.GATEWAY_ROUTES
 urlpatterns = [
-    # User service routes
-    re_path(r'^auth/.*', views.proxy_view, name='auth-proxy'),
-    re_path(r'^users/.*', views.proxy_view, name='users-proxy'),
-
-    # Product service routes
-    re_path(r'^products/.*', views.proxy_view, name='products-proxy'),
-    re_path(r'^categories/.*', views.proxy_view, name='categories-proxy'),
-
-    # Cart service routes
-    re_path(r'^cart/.*', views.proxy_view, name='cart-proxy'),
-
-    # Order service routes
-    re_path(r'^orders/.*', views.proxy_view, name='orders-proxy'),
+    # Составной ответ витрины собирает сам gateway
+    path('storefront/', storefront_view, name='storefront'),
+    re_path(r'^', views.proxy_view, name='proxy'),
 ]
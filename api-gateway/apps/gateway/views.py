@@ -1,150 +1,331 @@
-import requests
-import json
+import asyncio
+import hmac
+import httpx
 import logging
-from django.http import JsonResponse, HttpResponse
+import time
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views import View
+from shared.deadline import (
+    DEADLINE_HEADER, DeadlineExceeded, parse_deadline, reset_deadline, set_deadline,
+)
+
+from .auth import get_identity_headers
+from .balancer import load_balancer
+from .cache import response_cache
+from .coalescing import single_flight
+from .concurrency import DEFAULT_PRIORITY, PRIORITIES, OverloadedError, concurrency_limits, get_request_priority
+from .resilience import CircuitOpenError, resilience
+from .routing import route_table
+from .upstream import send_upstream_request
 
 logger = logging.getLogger(__name__)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ProxyView(View):
-    """Базовый класс для проксирования запросов к микросервисам"""
+    """Базовый класс для проксирования запросов к микросервисам
+
+    Представление асинхронное: под ASGI (config/asgi.py) один процесс
+    обслуживает множество одновременных запросов, а соединения к сервисам
+    берутся из долгоживущих пулов upstream_pools. Экземпляр сервиса для
+    каждого запроса выбирает load_balancer.
+    """
 
-    def dispatch(self, request, *args, **kwargs):
-        # Логируем запрос
-        logger.info(f"Gateway request: {request.method} {request.path}")
-        logger.info(f"Headers: {dict(request.headers)}")
-        logger.info(f"Body: {request.body.decode('utf-8') if request.body else 'No body'}")
+    view_is_async = True
 
-        # Определяем целевой сервис
-        service_name = self.get_service_name(request)
-        if not service_name:
+    async def dispatch(self, request, *args, **kwargs):
+        # Определяем маршрут по таблице GATEWAY_ROUTES
+        route = route_table.match(request.path)
+        if not route:
             logger.error(f"Service not found for path: {request.path}")
             return JsonResponse({'error': 'Service not found'}, status=404)
 
-        # Получаем URL сервиса
-        service_url = settings.MICROSERVICES.get(service_name)
-        if not service_url:
-            logger.error(f"Service {service_name} not configured")
-            return JsonResponse({'error': f'Service {service_name} not configured'}, status=500)
-
-        # Формируем целевой URL
-        target_path = self.get_target_path(request)
-        target_url = f"{service_url}{target_path}"
-
-        logger.info(f"Proxying to: {target_url}")
-
-        # Проксируем запрос
-        return self.proxy_request(request, target_url)
-
-    def get_service_name(self, request):
-        """Определение сервиса по URL"""
-        path = request.path
-
-        if path.startswith('/api/auth/') or path.startswith('/api/users/'):
-            return 'user-service'
-        elif path.startswith('/api/products/') or path.startswith('/api/categories/'):
-            return 'product-service'
-        elif path.startswith('/api/cart/'):
-            return 'cart-service'
-        elif path.startswith('/api/orders/'):
-            return 'order-service'
-
-        return None
-
-    def get_target_path(self, request):
-        """Формирование пути для целевого сервиса"""
-        # Убираем префикс /api если он есть и добавляем обратно для сервиса
-        path = request.path
-        if path.startswith('/api/'):
-            return path  # Оставляем как есть
-        return path
-
-    def proxy_request(self, request, target_url):
-        """Проксирование HTTP запроса"""
+        # Маршрут попадает в access log и метрики
+        request.gateway_route = route
+        request.metrics_route = route.prefix
+
+        if not route.allows_method(request.method):
+            return JsonResponse({'error': f'Method {request.method} not allowed'}, status=405)
+
+        # Маршруты, требующие авторизации, отклоняем без обращения к сервису
+        if route.auth == 'required' and not getattr(request, 'jwt_claims', None):
+            return JsonResponse({
+                'error': 'Authentication required',
+                'message': 'Valid Bearer token is required'
+            }, status=401)
+
+        # Класс запроса для лимитера параллельности: при перегрузке первыми отклоняются менее важные
+        request.priority = get_request_priority(request)
+
+        # Путь в сервисе; экземпляр сервиса выбирает балансировщик
+        target_path = route.target_path(request.path)
+
+        # Срок ответа клиенту передается сервисам в X-Request-Deadline
+        token = set_deadline(get_request_deadline(request, route.timeout or settings.GATEWAY_REQUEST_TIMEOUT))
         try:
-            # Подготавливаем headers
-            headers = {}
-
-            # Копируем важные заголовки
-            important_headers = [
-                'Authorization', 'Content-Type', 'Accept', 'User-Agent',
-                'Accept-Language', 'Accept-Encoding'
-            ]
-
-            for header_name in important_headers:
-                header_value = request.headers.get(header_name)
-                if header_value:
-                    headers[header_name] = header_value
-
-            # Логируем заголовки для отладки
-            logger.info(f"Forwarding headers: {headers}")
-
-            # Подготавливаем данные
-            data = None
-            json_data = None
-
-            if request.method in ['POST', 'PUT', 'PATCH']:
-                content_type = request.headers.get('Content-Type', '')
-
-                if 'application/json' in content_type:
-                    try:
-                        if request.body:
-                            json_data = json.loads(request.body.decode('utf-8'))
-                            logger.info(f"JSON data: {json_data}")
-                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                        logger.error(f"Failed to parse JSON: {e}")
-                        data = request.body
-                else:
-                    data = request.body
-
-            # Добавляем query parameters
-            params = dict(request.GET.items())
-            if params:
-                logger.info(f"Query params: {params}")
-
-            # Выполняем запрос
-            response = requests.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                json=json_data,
-                data=data if json_data is None else None,
-                params=params,
-                timeout=30
+            # GET запросы каталога обслуживаем через кэш ответов
+            cache_policy = response_cache.get_policy(request, route)
+            if cache_policy:
+                return await self.cached_proxy_request(request, route, target_path, cache_policy)
+
+            # Проксируем запрос
+            return await self.proxy_request(request, route, target_path)
+        finally:
+            reset_deadline(token)
+
+    async def proxy_request(self, request, route, target_path):
+        """Проксирование HTTP запроса
+
+        Тело запроса передается в сервис как есть, без разбора JSON, а тело
+        ответа отдается клиенту потоком по мере получения от сервиса.
+        """
+        try:
+            started = time.monotonic()
+            response = await self.send_upstream(request, route, target_path)
+            request.upstream_ms = round((time.monotonic() - started) * 1000, 2)
+            return await self.build_response(request, response)
+        except Exception as e:
+            return upstream_error_response(e, f"{route.upstream}{target_path}")
+
+    async def cached_proxy_request(self, request, route, target_path, policy):
+        """Проксирование GET запроса каталога через кэш ответов"""
+        try:
+            started = time.monotonic()
+            entry, cache_status = await self.load_cached_entry(
+                route, request.path, request.META.get('QUERY_STRING', ''),
+                self.get_upstream_path(request, target_path),
+                self.get_forward_headers(request), policy, request.priority
+            )
+            if cache_status == 'MISS':
+                request.upstream_ms = round((time.monotonic() - started) * 1000, 2)
+        except Exception as e:
+            return upstream_error_response(e, f"{route.upstream}{target_path}")
+
+        return response_cache.build_response(request, entry, cache_status)
+
+    async def load_cached_entry(self, route, path, query_string, upstream_path, headers, policy,
+                                priority=DEFAULT_PRIORITY):
+        """Запись кэша для GET запроса, возвращает (запись, статус: HIT/STALE/MISS)
+
+        Ключи кэша и объединения строятся по заголовкам, уходящим в сервис:
+        только от них может зависеть его ответ.
+        """
+        cache_key = response_cache.build_key(path, query_string, headers)
+        entry, cache_status = response_cache.lookup(cache_key)
+
+        if cache_status == 'STALE':
+            # Отдаем устаревшую запись, пока одна фоновая задача обновляет ее
+            response_cache.schedule_refresh(
+                cache_key,
+                lambda: self.fetch_cache_entry(route, 'GET', upstream_path, headers, policy,
+                                               PRIORITIES.index('low'))
             )
 
-            logger.info(f"Response status: {response.status_code}")
-            logger.info(f"Response content: {response.text[:200]}...")  # Логируем первые 200 символов
+        if entry is None:
+            # Одновременные одинаковые промахи кэша уходят в сервис одним запросом
+            async def fetch_and_store():
+                fetched = await self.fetch_cache_entry(route, 'GET', upstream_path, headers, policy, priority)
+                response_cache.store(cache_key, fetched)
+                return fetched
+
+            coalesce_key = single_flight.build_key('GET', path, query_string, headers)
+            entry = await single_flight.do(coalesce_key, fetch_and_store)
+
+        return entry, cache_status
+
+    async def fetch_cache_entry(self, route, method, upstream_path, headers, policy, priority=DEFAULT_PRIORITY):
+        """Полная загрузка ответа сервиса для записи в кэш"""
+        response = await send_upstream_request(
+            route.upstream, method, upstream_path, headers,
+            read_timeout=route.timeout, hedge=route.hedge, priority=priority
+        )
+        body = await read_raw_body(response)
+        return response_cache.make_entry(response.status_code, response.headers, body, policy)
+
+    def get_forward_headers(self, request):
+        """Заголовки запроса, передаваемые в сервис"""
+        headers = {}
+
+        # Копируем важные заголовки
+        important_headers = [
+            'Authorization', 'Content-Type', 'Accept', 'User-Agent',
+            'Accept-Language', 'Accept-Encoding'
+        ]
 
-            # Возвращаем ответ
+        for header_name in important_headers:
+            header_value = request.headers.get(header_name)
+            if header_value:
+                headers[header_name] = header_value
+
+        # Токен уже проверен на входе, передаем сервису подписанную идентичность
+        claims = getattr(request, 'jwt_claims', None)
+        if claims:
+            headers.update(get_identity_headers(claims))
+        return headers
+
+    def get_upstream_path(self, request, target_path):
+        """Путь в сервисе вместе с query string"""
+        # Query string передаем без разбора, чтобы сохранить повторяющиеся параметры
+        query_string = request.META.get('QUERY_STRING', '')
+        if query_string:
+            return f"{target_path}?{query_string}"
+        return target_path
+
+    async def send_upstream(self, request, route, target_path):
+        """Отправка запроса в сервис, тело ответа читается потоком"""
+        return await send_upstream_request(
+            route.upstream, request.method,
+            self.get_upstream_path(request, target_path),
+            self.get_forward_headers(request),
+            content=request.body or None,
+            read_timeout=route.timeout,
+            hedge=route.hedge,
+            priority=request.priority
+        )
+
+    async def build_response(self, request, response):
+        """Формирование ответа клиенту из ответа сервиса"""
+        content_type = response.headers.get('content-type', 'application/json')
+
+        if isinstance(request, ASGIRequest):
+            # Под ASGI отдаем байты сервиса потоком, не держа тело в памяти
+            django_response = StreamingHttpResponse(
+                self.stream_body(response),
+                status=response.status_code,
+                content_type=content_type
+            )
+        else:
+            # Под WSGI пул привязан к event loop запроса, поэтому дочитываем тело сразу
             django_response = HttpResponse(
-                response.content,
+                await read_raw_body(response),
                 status=response.status_code,
-                content_type=response.headers.get('content-type', 'application/json')
+                content_type=content_type
             )
 
-            # Копируем важные заголовки ответа
-            response_headers_to_copy = ['Content-Type', 'Cache-Control', 'ETag']
-            for key in response_headers_to_copy:
-                if key in response.headers:
-                    django_response[key] = response.headers[key]
+        # Копируем важные заголовки ответа (тело не перекодируется, поэтому
+        # Content-Encoding и Content-Length остаются верными)
+        response_headers_to_copy = [
+            'Content-Type', 'Content-Encoding', 'Content-Length',
+            'Cache-Control', 'ETag', 'Last-Modified'
+        ]
+        for key in response_headers_to_copy:
+            if key in response.headers:
+                django_response[key] = response.headers[key]
 
-            return django_response
+        return django_response
 
-        except requests.exceptions.Timeout:
-            logger.error(f"Timeout when calling {target_url}")
-            return JsonResponse({'error': 'Service timeout'}, status=504)
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"Connection error when calling {target_url}: {e}")
-            return JsonResponse({'error': 'Service unavailable'}, status=503)
-        except Exception as e:
-            logger.error(f"Error proxying request to {target_url}: {e}")
-            return JsonResponse({'error': 'Internal server error'}, status=500)
+    async def stream_body(self, response):
+        """Потоковая передача сырых байтов ответа сервиса"""
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+
+async def read_raw_body(response):
+    """Чтение тела ответа сервиса без декодирования Content-Encoding"""
+    try:
+        return b''.join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+
+def get_request_deadline(request, timeout):
+    """Срок запроса: через timeout секунд, клиент может только сократить его своим X-Request-Deadline"""
+    deadline = time.time() + timeout
+    client_deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+    if client_deadline is not None:
+        deadline = min(deadline, client_deadline)
+    return deadline
+
+def upstream_error_response(error, target):
+    """Ответ клиенту при ошибке обращения к сервису"""
+    status, message = describe_upstream_error(error, target)
+    response = JsonResponse(message, status=status)
+    if isinstance(error, CircuitOpenError):
+        response['Retry-After'] = str(max(1, int(error.retry_after + 0.999)))
+    elif isinstance(error, OverloadedError):
+        response['Retry-After'] = '1'
+    return response
+
+def describe_upstream_error(error, target):
+    """Статус и тело ошибки обращения к сервису, с записью в лог"""
+    if isinstance(error, CircuitOpenError):
+        # Быстрый отказ без обращения к деградировавшему сервису
+        logger.warning(f"Circuit open, fast-failing request to {target}")
+        return 503, {
+            'error': 'Service unavailable',
+            'message': f'{error.service_name} is temporarily unavailable'
+        }
+    if isinstance(error, OverloadedError):
+        # Сброс нагрузки: быстрый отказ вместо ожидания в очереди до таймаута
+        logger.warning(f"Shedding request to {target}: {error.reason}")
+        return 503, {
+            'error': 'Service overloaded',
+            'message': f'{error.service_name} is overloaded, retry later'
+        }
+    if isinstance(error, DeadlineExceeded):
+        logger.warning(f"Deadline exceeded before {target} answered")
+        return 504, {'error': 'Deadline exceeded'}
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+        logger.error(f"Timeout when calling {target}")
+        return 504, {'error': 'Service timeout'}
+    if isinstance(error, httpx.TransportError):
+        logger.error(f"Connection error when calling {target}: {error}")
+        return 503, {'error': 'Service unavailable'}
+    logger.error(f"Error proxying request to {target}: {error}")
+    return 500, {'error': 'Internal server error'}
+
+def is_gateway_admin(request):
+    """Проверка служебного токена для управляющих эндпоинтов gateway"""
+    token = request.headers.get('X-Gateway-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(token, settings.GATEWAY_ADMIN_TOKEN)
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def cache_purge_view(request):
+    """Сброс кэша ответов по префиксу пути"""
+    if not is_gateway_admin(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    prefix = request.GET.get('prefix', '')
+    purged = response_cache.purge(prefix)
+    return JsonResponse({'purged': purged, 'prefix': prefix, 'cache': response_cache.stats()})
+
+@require_http_methods(['GET'])
+async def breakers_view(request):
+    """Состояние circuit breakers, бюджетов повторов и исключенных экземпляров"""
+    if not is_gateway_admin(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    return JsonResponse(resilience.snapshot())
+
+@require_http_methods(['GET'])
+async def upstreams_view(request):
+    """Экземпляры сервисов: стратегия балансировки, здоровье и текущая нагрузка"""
+    if not is_gateway_admin(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    return JsonResponse(load_balancer.snapshot())
+
+@require_http_methods(['GET'])
+async def concurrency_view(request):
+    """Адаптивные лимиты параллельности, очереди и отказы по сервисам"""
+    if not is_gateway_admin(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    return JsonResponse(concurrency_limits.snapshot())
+
+@require_http_methods(['GET'])
+async def coalescing_view(request):
+    """Счетчики объединения одновременных одинаковых запросов"""
+    if not is_gateway_admin(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    return JsonResponse(single_flight.stats())
 
 # Создаем экземпляр для всех API запросов
 proxy_view = ProxyView.as_view()
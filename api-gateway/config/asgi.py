@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Gateway runs in async proxy mode under an ASGI server, e.g.:
+
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +17,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """Django ASGI приложение + lifespan: health checks экземпляров и закрытие пулов соединений"""
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    from apps.gateway.balancer import load_balancer
+    from apps.gateway.upstream import upstream_pools
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            load_balancer.start_health_checks()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await load_balancer.stop_health_checks()
+            await upstream_pools.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
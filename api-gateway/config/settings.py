@@ -1,9 +1,15 @@
 # ===== api-gateway/config/settings.py =====
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий код сервисов (shared/) лежит в корне репозитория
+ROOT_DIR = BASE_DIR.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
 SECRET_KEY = 'api-gateway-secret-key-change-in-production'
 DEBUG = True
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
@@ -29,6 +35,9 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'shared.tracing.TracingMiddleware',
+    'shared.metrics.MetricsMiddleware',
+    'apps.gateway.middleware.AccessLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -37,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.gateway.middleware.EdgeAuthenticationMiddleware',
     'apps.gateway.middleware.RateLimitMiddleware',
 ]
 
@@ -91,6 +101,7 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Service URLs
+# Экземпляры сервисов: адрес или список адресов (балансировка - UPSTREAM_BALANCING)
 MICROSERVICES = {
     'user-service': 'http://localhost:8004',
     'product-service': 'http://localhost:8001',
@@ -98,5 +109,246 @@ MICROSERVICES = {
     'order-service': 'http://localhost:8003',
 }
 
+# Таблица маршрутов gateway (apps/gateway/routing.py), компилируется при старте.
+# prefix   - префикс пути (совпадение по целым сегментам, выигрывает самый длинный)
+# upstream - сервис из MICROSERVICES
+# rewrite  - замена префикса в пути к сервису (по умолчанию путь не меняется)
+# timeout  - read-таймаут запроса к сервису, секунд
+# methods  - разрешенные методы (по умолчанию все)
+# cache    - политика кэша ответов: ttl - сколько запись свежая, stale_ttl - сколько
+#            еще ее можно отдавать, пока в фоне идет обновление (stale-while-revalidate)
+# auth     - 'required': без действительного JWT gateway сразу отвечает 401
+# hedge    - хеджирование GET: вторая попытка на другой экземпляр, если первая не ответила
+#            за задержку UPSTREAM_RESILIENCE['HEDGING']
+GATEWAY_ROUTES = [
+    {'prefix': '/api/auth/', 'upstream': 'user-service'},
+    {'prefix': '/api/users/', 'upstream': 'user-service'},
+    {
+        'prefix': '/api/products/',
+        'upstream': 'product-service',
+        'cache': {'ttl': 30, 'stale_ttl': 120, 'exclude_suffixes': ['/check-availability/']},
+        'hedge': True,
+    },
+    {
+        'prefix': '/api/categories/',
+        'upstream': 'product-service',
+        'cache': {'ttl': 300, 'stale_ttl': 600},
+        'hedge': True,
+    },
+    {'prefix': '/api/cart/', 'upstream': 'cart-service', 'auth': 'required', 'timeout': 10},
+    {'prefix': '/api/orders/', 'upstream': 'order-service', 'auth': 'required'},
+]
+
+# Пулы keep-alive соединений к сервисам (async proxy, см. apps/gateway/upstream.py)
+# 'default' применяется ко всем сервисам, ключ с именем сервиса переопределяет значения
+UPSTREAM_POOL = {
+    'default': {
+        'max_connections': 100,
+        'max_keepalive_connections': 20,
+        'keepalive_expiry': 30.0,
+        'connect_timeout': 5.0,
+        'read_timeout': 30.0,
+        'write_timeout': 30.0,
+        'pool_timeout': 5.0,
+    },
+}
+
+# Балансировка между экземплярами сервиса (apps/gateway/balancer.py)
+# strategy - 'round_robin', 'least_outstanding' (меньше всего незавершенных запросов)
+#            или 'p2c_ewma' (лучший из двух случайных по EWMA задержки)
+# health_check_* - активная проверка экземпляров GET health_check_path;
+#            экземпляр выводится из ротации после unhealthy_threshold неудач подряд
+UPSTREAM_BALANCING = {
+    'default': {
+        'strategy': 'round_robin',
+        'ewma_decay': 10.0,
+        'health_check_path': '/health/',
+        'health_check_interval': 5.0,
+        'health_check_timeout': 1.0,
+        'unhealthy_threshold': 2,
+        'healthy_threshold': 1,
+    },
+    'product-service': {
+        'strategy': 'p2c_ewma',
+    },
+}
+
+# Адаптивный лимит одновременных запросов к сервису (apps/gateway/concurrency.py)
+# Лимит растет на 1/limit с каждым быстрым успешным ответом и умножается на backoff_ratio
+# при ошибке или ответе медленнее slow_threshold секунд. Сверх лимита запросы ждут в очереди
+# (max_queue, не дольше queue_timeout секунд), иначе gateway сразу отвечает 503
+UPSTREAM_CONCURRENCY = {
+    'default': {
+        'enabled': True,
+        'initial_limit': 20,
+        'min_limit': 2,
+        'max_limit': 200,
+        'slow_threshold': 1.0,
+        'backoff_ratio': 0.9,
+        'backoff_interval': 0.5,
+        'max_queue': 50,
+        'queue_timeout': 1.0,
+    },
+}
+
+# Классы запросов для сброса нагрузки: 'critical' > 'high' > 'normal' > 'low'
+# RULES - первое совпадение по префиксу пути (и методу); остальные запросы получают
+# AUTHENTICATED или ANONYMOUS в зависимости от наличия действительного JWT
+REQUEST_PRIORITIES = {
+    'RULES': [
+        {'prefix': '/api/orders/create/', 'methods': ['POST'], 'priority': 'critical'},
+        {'prefix': '/api/cart/', 'methods': ['POST', 'PUT', 'PATCH', 'DELETE'], 'priority': 'critical'},
+    ],
+    'AUTHENTICATED': 'normal',
+    'ANONYMOUS': 'low',
+}
+
+# Устойчивость к деградации сервисов (apps/gateway/resilience.py)
+# CIRCUIT_BREAKER   - размыкание по доле ошибок/медленных вызовов в окне window секунд
+# RETRY             - повторы только идемпотентных методов, не больше budget_ratio от потока
+# OUTLIER_DETECTION - исключение экземпляра после consecutive_errors ошибок подряд
+# HEDGING           - задержка хеджа: percentile задержки последних window ответов сервиса
+#                     в пределах [min_delay, max_delay]; хеджи - не больше budget_ratio от потока
+UPSTREAM_RESILIENCE = {
+    'CIRCUIT_BREAKER': {
+        'window': 10,
+        'min_requests': 20,
+        'error_rate_threshold': 0.5,
+        'slow_call_threshold': 5.0,
+        'slow_call_rate_threshold': 0.8,
+        'open_duration': 15,
+        'half_open_max_calls': 5,
+    },
+    'RETRY': {
+        'methods': ['GET', 'HEAD', 'OPTIONS'],
+        'max_attempts': 3,
+        'retry_on_status': [502, 503, 504],
+        'backoff': 0.05,
+        'budget_ratio': 0.2,
+        'budget_min_per_second': 1.0,
+    },
+    'OUTLIER_DETECTION': {
+        'consecutive_errors': 5,
+        'base_ejection_time': 30,
+        'max_ejection_time': 300,
+        'max_ejection_percent': 50,
+    },
+    'HEDGING': {
+        'percentile': 0.95,
+        'window': 1000,
+        'min_samples': 50,
+        'initial_delay': 0.1,
+        'min_delay': 0.01,
+        'max_delay': 1.0,
+        'budget_ratio': 0.05,
+        'budget_min_per_second': 1.0,
+    },
+}
+
 # Rate limiting settings
 RATE_LIMIT_REQUESTS_PER_MINUTE = 100
+
+# Распределенный лимитер (apps/gateway/ratelimit.py)
+# algorithm: 'token_bucket' | 'sliding_window'; identity: 'ip' | 'user' (JWT subject, иначе IP)
+# В ROUTES ключ - префикс пути, значения дополняют DEFAULT
+RATE_LIMIT = {
+    'REDIS_URL': 'redis://localhost:6379/0',
+    'DEFAULT': {
+        'algorithm': 'token_bucket',
+        'limit': RATE_LIMIT_REQUESTS_PER_MINUTE,
+        'period': 60,
+        'identity': 'ip',
+    },
+    'ROUTES': {
+        '/api/auth/login/': {'algorithm': 'sliding_window', 'limit': 10, 'period': 60},
+        '/api/users/register/': {'algorithm': 'sliding_window', 'limit': 5, 'period': 60},
+        '/api/cart/': {'limit': 120, 'identity': 'user'},
+        '/api/orders/create/': {'algorithm': 'sliding_window', 'limit': 10, 'period': 60, 'identity': 'user'},
+    },
+}
+
+# Кэш GET-ответов каталога (apps/gateway/cache.py), политики - в GATEWAY_ROUTES
+RESPONSE_CACHE = {
+    'MAX_ENTRIES': 1000,
+    'MAX_BODY_SIZE': 1024 * 1024,
+    'VARY_HEADERS': ['Accept', 'Accept-Encoding', 'Accept-Language'],
+}
+
+# Объединение одновременных одинаковых GET при промахе кэша (apps/gateway/coalescing.py)
+# KEY_HEADERS  - заголовки (из передаваемых в сервис), входящие в ключ вместе с путем и query string
+# WAIT_TIMEOUT - сколько ожидающий запрос ждет общий ответ, секунд (затем 504)
+REQUEST_COALESCING = {
+    'ENABLED': True,
+    'KEY_HEADERS': ['Accept', 'Accept-Encoding', 'Accept-Language'],
+    'WAIT_TIMEOUT': 10.0,
+}
+
+# Витрина /api/storefront/ (apps/gateway/aggregation.py): разделы запрашиваются параллельно
+# path   - путь gateway, маршрутизируется по GATEWAY_ROUTES
+# params - параметры запроса по умолчанию (переопределяются как ?<раздел>.<параметр>=...)
+# auth   - 'required': раздел запрашивается только для пользователя с действительным JWT
+STOREFRONT = {
+    'TIMEOUT': 5.0,
+    'SECTIONS': {
+        'categories': {'path': '/api/categories/'},
+        'products': {'path': '/api/products/', 'params': {'page_size': 8, 'ordering': '-created_at'}},
+        'cart': {'path': '/api/cart/summary/', 'auth': 'required'},
+        'profile': {'path': '/api/users/profile/', 'auth': 'required'},
+    },
+}
+
+# Access log gateway (apps/gateway/accesslog.py): JSON-запись на запрос через очередь
+# HEAD_SAMPLE_RATE    - доля запросов, попадающих в лог независимо от результата
+# TAIL_MIN_STATUS     - ответы с этим статусом и выше логируются всегда
+# TAIL_SLOW_THRESHOLD - запросы дольше стольких секунд логируются всегда
+# FILE                - файл лога (None - stdout)
+# REDACT              - ключи заголовков, параметров и JSON, значения которых скрываются (в нижнем регистре)
+# CAPTURE_BODIES      - отладочный режим: заголовки и тела запроса/ответа в записи
+ACCESS_LOG = {
+    'ENABLED': True,
+    'HEAD_SAMPLE_RATE': 0.1,
+    'TAIL_MIN_STATUS': 500,
+    'TAIL_SLOW_THRESHOLD': 1.0,
+    'QUEUE_SIZE': 10000,
+    'FILE': None,
+    'REDACT': ['authorization', 'cookie', 'x-gateway-admin-token', 'password',
+               'password_confirm', 'token', 'access', 'refresh', 'secret'],
+    'CAPTURE_BODIES': False,
+    'MAX_BODY_SIZE': 4096,
+}
+
+# Трассировка W3C trace context (shared/tracing.py)
+# SAMPLE_RATE - доля новых трасс, которые записываются (входящий traceparent решает сам)
+# EXPORTER    - 'file' (JSON-строки в FILE, по умолчанию во временном каталоге) | 'otlp' (пачки POST на OTLP_ENDPOINT) | 'none'
+TRACING = {
+    'SERVICE_NAME': 'api-gateway',
+    'SAMPLE_RATE': 1.0,
+    'EXPORTER': 'file',
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+}
+
+# Срок ответа клиенту по умолчанию, секунд (маршрут может задать свой 'timeout').
+# Передается сервисам абсолютным временем в X-Request-Deadline (shared/deadline.py);
+# клиент может сократить его своим заголовком X-Request-Deadline
+GATEWAY_REQUEST_TIMEOUT = 30.0
+
+# Токен для служебных эндпоинтов gateway (/gateway/...), заголовок X-Gateway-Admin-Token
+GATEWAY_ADMIN_TOKEN = 'gateway-admin-token-change-in-production'
+
+# Проверка JWT на входе (apps/gateway/auth.py, shared/jwks.py)
+# Токены подписаны RS256 ключом user-service; открытые ключи загружаются из его
+# /.well-known/jwks.json и кэшируются на KEYS_TTL секунд. Токен с неизвестным kid
+# (ротация ключа) загружает их заново, не чаще MIN_REFRESH_INTERVAL
+JWT_AUTH = {
+    'JWKS_SERVICE': 'user-service',
+    'KEYS_TTL': 300.0,
+    'MIN_REFRESH_INTERVAL': 10.0,
+}
+
+# Клиенты сервисов для собственных запросов gateway (shared/http_client.py): ключи JWKS
+SERVICE_CLIENTS = {
+    'user-service': {'base_url': MICROSERVICES['user-service']},
+}
+
+# Секрет для подписи заголовков идентичности (X-User-Id и др.), общий с cart и order сервисами
+GATEWAY_IDENTITY_SECRET = 'gateway-identity-secret-change-in-production'
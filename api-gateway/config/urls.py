@@ -2,6 +2,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
+from shared.metrics import metrics_view
+from apps.gateway.views import (
+    breakers_view, cache_purge_view, coalescing_view, concurrency_view, upstreams_view,
+)
 
 def health_check(request):
     return JsonResponse({
@@ -18,5 +22,11 @@ def health_check(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', health_check),
+    path('metrics', metrics_view),
+    path('gateway/cache/purge/', cache_purge_view),
+    path('gateway/breakers/', breakers_view),
+    path('gateway/upstreams/', upstreams_view),
+    path('gateway/coalescing/', coalescing_view),
+    path('gateway/concurrency/', concurrency_view),
     path('api/', include('apps.gateway.urls')),
 ]
@@ -0,0 +1,11 @@
+import api from './api'
+
+const storefrontService = {
+  // Categories, products, cart summary and profile in one gateway round trip.
+  // Each section comes back as { status, data | error, latency_ms }.
+  async getStorefront(params = {}) {
+    return await api.get('/storefront/', { params })
+  }
+}
+
+export default storefrontService
@@ -1,7 +1,7 @@
-import jwt
 from django.http import JsonResponse
 from django.conf import settings
-from .services import UserService
+from shared.identity import verify_identity_headers
+from shared.jwks import verify_access_token
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,14 +13,23 @@ class JWTAuthenticationMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Пропускаем health check и admin
-        if request.path in ['/health/', '/admin/'] or request.path.startswith('/admin/'):
+        # Пропускаем health check, метрики и admin
+        if request.path in ['/health/', '/metrics', '/admin/'] or request.path.startswith('/admin/'):
             return self.get_response(request)
 
         # Пропускаем OPTIONS запросы (preflight)
         if request.method == 'OPTIONS':
             return self.get_response(request)
 
+        # Gateway уже проверил токен и передал подписанную идентичность
+        identity = verify_identity_headers(
+            settings.GATEWAY_IDENTITY_SECRET, request.headers, settings.GATEWAY_IDENTITY_MAX_AGE
+        )
+        if identity:
+            request.user_id = identity['id']
+            request.user_email = identity['email']
+            return self.get_response(request)
+
         # Извлекаем токен
         auth_header = request.headers.get('Authorization')
 
@@ -28,12 +37,12 @@ class JWTAuthenticationMiddleware:
             token = auth_header.split(' ')[1]
             logger.info(f"Found auth token in request to {request.path}")
 
-            # Получаем пользователя через user-service
-            user_data = UserService.get_user_from_token(token)
-            if user_data:
-                request.user_id = user_data['id']
-                request.user_email = user_data['email']
-                logger.info(f"Authenticated user {user_data['id']} for {request.path}")
+            # Подпись проверяется локально по ключам из JWKS user-service
+            claims = verify_access_token(token)
+            if claims:
+                request.user_id = claims['user_id']
+                request.user_email = claims.get('email', '')
+                logger.info(f"Authenticated user {claims['user_id']} for {request.path}")
 
                 response = self.get_response(request)
                 return response
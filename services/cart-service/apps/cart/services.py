@@ -1,7 +1,6 @@
-import requests
 import logging
-from django.conf import settings
 from typing import Optional, Dict, Any
+from shared.http_client import ServiceCallError, get_client, response_data
 
 logger = logging.getLogger(__name__)
 
@@ -12,14 +11,13 @@ class ProductService:
     def get_product(product_id: int) -> Optional[Dict[str, Any]]:
         """Получение информации о товаре"""
         try:
-            response = requests.get(
-                f"{settings.PRODUCT_SERVICE_URL}/api/products/{product_id}/",
-                timeout=10
+            response = get_client('product-service').get(
+                f"/api/products/{product_id}/", operation='get_product'
             )
             if response.status_code == 200:
-                return response.json()
+                return response_data(response)
             return None
-        except requests.exceptions.RequestException as e:
+        except (ServiceCallError, ValueError) as e:
             logger.error(f"Failed to get product {product_id}: {e}")
             return None
 
@@ -27,35 +25,14 @@ class ProductService:
     def check_availability(product_id: int, quantity: int) -> bool:
         """Проверка наличия товара"""
         try:
-            response = requests.get(
-                f"{settings.PRODUCT_SERVICE_URL}/api/products/{product_id}/check-availability/",
-                params={'quantity': quantity},
-                timeout=10
+            response = get_client('product-service').get(
+                f"/api/products/{product_id}/check-availability/", operation='check_availability',
+                params={'quantity': quantity}
             )
             if response.status_code == 200:
-                data = response.json()
+                data = response_data(response)
                 return data.get('available', False)
             return False
-        except requests.exceptions.RequestException as e:
+        except (ServiceCallError, ValueError) as e:
             logger.error(f"Failed to check availability for product {product_id}: {e}")
             return False
-
-class UserService:
-    """Сервис для взаимодействия с User Service"""
-
-    @staticmethod
-    def get_user_from_token(token: str) -> Optional[Dict[str, Any]]:
-        """Получение информации о пользователе по токену"""
-        try:
-            headers = {'Authorization': f'Bearer {token}'}
-            response = requests.get(
-                f"{settings.USER_SERVICE_URL}/api/users/profile/",
-                headers=headers,
-                timeout=10
-            )
-            if response.status_code == 200:
-                return response.json()
-            return None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get user from token: {e}")
-            return None
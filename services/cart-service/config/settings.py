@@ -1,8 +1,14 @@
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий код сервисов (shared/) лежит в корне репозитория
+ROOT_DIR = BASE_DIR.parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
 SECRET_KEY = 'cart-service-secret-key-change-in-production'
 DEBUG = True
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
@@ -22,12 +28,16 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    'shared',
     'apps.cart',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'shared.tracing.TracingMiddleware',
+    'shared.metrics.MetricsMiddleware',
+    'shared.deadline.DeadlineMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -61,6 +71,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR.parent.parent / 'databases' / 'cart.db',
+        # Транзакция сразу берет блокировку записи и ждет ее до timeout секунд: параллельные
+        # обработчики событий (consume_events --workers) выстраиваются в очередь, а не падают с
+        # 'database is locked' на повышении блокировки чтения до записи
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
@@ -68,9 +82,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON по умолчанию; msgpack - по Accept/Content-Type вызовов других сервисов (shared/codecs.py)
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        'shared.codecs.MsgpackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'shared.codecs.MsgpackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'shared.codecs.QualityContentNegotiation',
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -94,7 +117,72 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 PRODUCT_SERVICE_URL = 'http://localhost:8001'
 USER_SERVICE_URL = 'http://localhost:8004'
 
+# Клиенты других сервисов (shared/http_client.py): пул keep-alive соединений на сервис
+# base_url - адрес или список адресов экземпляров; max_attempts - попытки идемпотентных вызовов
+# Таймауты не превышают оставшегося срока запроса (X-Request-Deadline)
+# codec - формат тел запросов и предпочитаемый формат ответов ('msgpack' | 'json'); JSON остается запасным
+SERVICE_CLIENTS = {
+    'default': {
+        'pool_maxsize': 10,
+        'connect_timeout': 2.0,
+        'read_timeout': 10.0,
+        'max_attempts': 2,
+        'backoff': 0.05,
+        'codec': 'msgpack',
+    },
+    'product-service': {'base_url': PRODUCT_SERVICE_URL},
+    'user-service': {'base_url': USER_SERVICE_URL},
+}
+
+# Подписанная идентичность от gateway (shared/identity.py)
+GATEWAY_IDENTITY_SECRET = 'gateway-identity-secret-change-in-production'
+GATEWAY_IDENTITY_MAX_AGE = 300  # секунд
+
+# Проверка JWT без gateway (shared/jwks.py): подпись проверяется локально по открытым
+# ключам user-service (/.well-known/jwks.json). Ключи кэшируются на KEYS_TTL секунд;
+# токен с неизвестным kid (ротация ключа) загружает их заново, не чаще MIN_REFRESH_INTERVAL
+JWT_AUTH = {
+    'JWKS_SERVICE': 'user-service',
+    'KEYS_TTL': 300.0,
+    'MIN_REFRESH_INTERVAL': 10.0,
+}
+
 # Redis settings
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
+
+# Шина событий на Redis Streams (shared/events.py): поток на тип события <STREAM>:<тип>
+# GROUP - группа потребителей сервиса: каждое событие обрабатывает один потребитель группы
+# MAXLEN - приблизительная длина потока; CLAIM_IDLE_MS - через сколько забирать события упавшего потребителя
+# Событие, не обработанное за MAX_DELIVERIES доставок, уходит в поток <STREAM>:dead
+# CODEC - формат записываемых событий ('msgpack' | 'json'); потребитель читает кодек из записи
+# Обработка - `manage.py consume_events`: обработчики HANDLERS в WORKERS потоках, порядок по ключу события,
+# не больше MAX_IN_FLIGHT событий в очередях; при остановке очереди дорабатываются до DRAIN_TIMEOUT секунд
+# Повторная доставка события пропускается по журналу ProcessedEvent (shared/models.py), записи хранятся DEDUPE_TTL_HOURS
+EVENT_BUS = {
+    'STREAM': 'events',
+    'GROUP': 'cart-service',
+    'MAXLEN': 100000,
+    'BATCH_SIZE': 10,
+    'BLOCK_MS': 5000,
+    'CLAIM_IDLE_MS': 60000,
+    'CLAIM_INTERVAL': 30.0,
+    'MAX_DELIVERIES': 5,
+    'CODEC': 'msgpack',
+    'HANDLERS': 'apps.cart.event_handlers.handlers',
+    'WORKERS': 4,
+    'MAX_IN_FLIGHT': 100,
+    'DRAIN_TIMEOUT': 30.0,
+    'DEDUPE_TTL_HOURS': 168,
+    'DEDUPE_PURGE_INTERVAL': 3600.0,
+}
+
+# Трассировка W3C trace context (shared/tracing.py)
+# EXPORTER - 'file' (JSON-строки в FILE, по умолчанию во временном каталоге) | 'otlp' (пачки POST на OTLP_ENDPOINT) | 'none'
+TRACING = {
+    'SERVICE_NAME': 'cart-service',
+    'SAMPLE_RATE': 1.0,
+    'EXPORTER': 'file',
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+}
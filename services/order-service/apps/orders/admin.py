@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OutboxEvent
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -27,3 +27,12 @@ class OrderItemAdmin(admin.ModelAdmin):
     ]
     list_filter = ['created_at']
     readonly_fields = ['subtotal', 'created_at']
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'event_type', 'aggregate_id', 'created_at', 'published_at', 'attempts'
+    ]
+    list_filter = ['event_type', 'published_at']
+    search_fields = ['event_id', 'aggregate_id']
+    readonly_fields = ['event_id', 'payload', 'created_at', 'published_at', 'attempts']
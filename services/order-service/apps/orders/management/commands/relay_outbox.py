@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.outbox import OutboxRelay
+
+
+def parse_partition(value):
+    """'index/count' -> (index, count)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise CommandError(f"Bad partition {value!r}: expected index/count, e.g. 0/2")
+    if not 0 <= index < count:
+        raise CommandError(f"Bad partition {value!r}: index must be in [0, count)")
+    return index, count
+
+
+class Command(BaseCommand):
+    help = 'Доставка событий outbox заказов в шину событий (Redis Streams)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='опубликовать накопленное и выйти')
+        parser.add_argument('--batch-size', type=int, help="размер пачки (по умолчанию OUTBOX['BATCH_SIZE'])")
+        parser.add_argument('--partition', help='доля заказов этого relay: index/count (aggregate_id % count)')
+
+    def handle(self, *args, **options):
+        partition = parse_partition(options['partition']) if options['partition'] else None
+        relay = OutboxRelay(options['batch_size'], partition)
+        try:
+            relay.run(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Outbox relay stopped')
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.http import JsonResponse
-from .services import UserService
+from shared.identity import forward_identity_headers, verify_identity_headers
+from shared.jwks import verify_access_token
 
 class JWTAuthenticationMiddleware:
     """Middleware для аутентификации через JWT токены"""
@@ -8,21 +10,32 @@ class JWTAuthenticationMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Пропускаем health check и admin
-        if request.path in ['/health/', '/admin/']:
+        # Пропускаем health check, метрики и admin
+        if request.path in ['/health/', '/metrics', '/admin/']:
             return self.get_response(request)
 
+        # Gateway уже проверил токен и передал подписанную идентичность
+        identity = verify_identity_headers(
+            settings.GATEWAY_IDENTITY_SECRET, request.headers, settings.GATEWAY_IDENTITY_MAX_AGE
+        )
+        # Подписанные заголовки передаются дальше в cart-service
+        request.identity_headers = forward_identity_headers(request.headers) if identity else {}
+
         # Извлекаем токен
         auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
+        if identity:
+            request.user_id = identity['id']
+            request.user_email = identity['email']
+            request.user_data = identity
+        elif auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
 
-            # Получаем пользователя через user-service
-            user_data = UserService.get_user_from_token(token)
-            if user_data:
-                request.user_id = user_data['id']
-                request.user_email = user_data['email']
-                request.user_data = user_data
+            # Подпись проверяется локально по ключам из JWKS user-service
+            claims = verify_access_token(token)
+            if claims:
+                request.user_id = claims['user_id']
+                request.user_email = claims.get('email', '')
+                request.user_data = {'id': claims['user_id'], 'email': request.user_email}
             else:
                 return JsonResponse({'error': 'Invalid token'}, status=401)
         else:
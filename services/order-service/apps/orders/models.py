@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from decimal import Decimal
 
@@ -57,3 +58,27 @@ class OrderItem(models.Model):
     def subtotal(self):
         """Подсумма для данной позиции"""
         return self.price * self.quantity
+
+
+class OutboxEvent(models.Model):
+    """Событие, ожидающее публикации в шину (transactional outbox)
+
+    Пишется в одной транзакции с изменением заказа; relay_outbox публикует
+    события по порядку id, поэтому события одного заказа уходят в порядке
+    записи. Доставка - не менее одного раза: после сбоя relay событие может
+    уйти повторно с тем же event_id.
+    """
+    event_id = models.CharField(max_length=32, unique=True)
+    event_type = models.CharField(max_length=100)
+    aggregate_id = models.IntegerField(db_index=True)  # ID заказа
+    payload = models.JSONField(encoder=DjangoJSONEncoder)  # Конверт события целиком
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['published_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.event_type} for Order #{self.aggregate_id}"
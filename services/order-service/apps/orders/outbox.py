@@ -0,0 +1,96 @@
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from shared.events import event_bus
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_SETTINGS = {
+    'BATCH_SIZE': 100,
+    'POLL_INTERVAL': 0.5,
+    'RETRY_INTERVAL': 2.0,
+    'RETENTION_HOURS': 24,
+    'CLEANUP_INTERVAL': 300.0,
+}
+
+
+def get_outbox_settings() -> Dict:
+    config = dict(DEFAULT_OUTBOX_SETTINGS)
+    config.update(getattr(settings, 'OUTBOX', {}))
+    return config
+
+
+class OutboxRelay:
+    """Доставка событий outbox в шину пачками
+
+    События пачки пишутся в Redis одним pipeline и помечаются
+    опубликованными только после успешной записи. Пачки идут по порядку id,
+    поэтому события одного заказа публикуются в порядке записи. Несколько
+    relay сохраняют этот порядок, только если делят заказы по partition
+    (aggregate_id % count == index).
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, partition: Optional[Tuple[int, int]] = None):
+        self.config = get_outbox_settings()
+        self.batch_size = batch_size or self.config['BATCH_SIZE']
+        self.partition = partition
+        self._cleaned_at = 0.0
+
+    def pending(self):
+        queryset = OutboxEvent.objects.filter(published_at__isnull=True)
+        if self.partition:
+            index, count = self.partition
+            queryset = queryset.annotate(partition=Mod('aggregate_id', count)).filter(partition=index)
+        return queryset.order_by('id')
+
+    def relay_batch(self) -> Optional[int]:
+        """Публикация одной пачки; число опубликованных событий или None при ошибке Redis"""
+        with transaction.atomic():
+            # Другой relay пропускает захваченные строки (на SQLite блокировки нет)
+            events = list(self.pending().select_for_update(skip_locked=True)[:self.batch_size])
+            if not events:
+                return 0
+
+            ids = [event.id for event in events]
+            if not event_bus.write([event.payload for event in events]):
+                OutboxEvent.objects.filter(id__in=ids).update(attempts=F('attempts') + 1)
+                return None
+            OutboxEvent.objects.filter(id__in=ids).update(
+                published_at=timezone.now(), attempts=F('attempts') + 1
+            )
+        return len(events)
+
+    def cleanup(self) -> int:
+        """Удаление опубликованных событий старше RETENTION_HOURS"""
+        border = timezone.now() - timedelta(hours=self.config['RETENTION_HOURS'])
+        deleted, _ = OutboxEvent.objects.filter(published_at__lt=border).delete()
+        if deleted:
+            logger.info(f"Outbox cleanup: deleted {deleted} published events")
+        return deleted
+
+    def run(self, once: bool = False):
+        """Цикл доставки: пачки подряд, пока outbox не опустеет, затем ожидание POLL_INTERVAL"""
+        while True:
+            published = self.relay_batch()
+            if published:
+                logger.info(f"Outbox relay published {published} events")
+
+            if time.monotonic() - self._cleaned_at >= self.config['CLEANUP_INTERVAL']:
+                self._cleaned_at = time.monotonic()
+                self.cleanup()
+
+            if once and not published:
+                return
+            if published is None:
+                time.sleep(self.config['RETRY_INTERVAL'])
+            elif published < self.batch_size:
+                time.sleep(self.config['POLL_INTERVAL'])
@@ -1,35 +1,30 @@
-import requests
-import redis
-import json
 import logging
-from django.conf import settings
 from typing import Optional, Dict, Any, List
+from shared.deadline import DeadlineExceeded, without_deadline
+from shared.events import event_bus as stream_bus
+from shared.http_client import ServiceCallError, get_client, response_data
+from .models import OutboxEvent
 
 logger = logging.getLogger(__name__)
 
 class EventBus:
-    """Сервис для публикации событий"""
+    """Сервис для публикации событий через outbox
 
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True
-        )
+    Событие записывается в таблицу OutboxEvent в текущей транзакции, в шину
+    (Redis Streams) его доставляет relay_outbox.
+    """
 
-    def publish_event(self, event_type: str, data: Dict[str, Any]):
-        """Публикация события"""
-        try:
-            event_data = {
-                'type': event_type,
-                'data': data,
-                'timestamp': json.dumps({}, default=str)
-            }
-            self.redis_client.publish('events', json.dumps(event_data, default=str))
-            logger.info(f"Published event: {event_type}")
-        except Exception as e:
-            logger.error(f"Failed to publish event {event_type}: {e}")
+    def publish_event(self, event_type: str, data: Dict[str, Any], aggregate_id: Optional[int] = None,
+                      version: int = 1) -> str:
+        """Публикация события (version - версия схемы data); возвращает id события"""
+        event = stream_bus.build_event(event_type, data, version)
+        OutboxEvent.objects.create(
+            event_id=event['id'],
+            event_type=event_type,
+            aggregate_id=aggregate_id or data['order_id'],
+            payload=event
+        )
+        return event['id']
 
 event_bus = EventBus()
 
@@ -37,19 +32,18 @@ class CartService:
     """Сервис для взаимодействия с Cart Service"""
 
     @staticmethod
-    def get_user_cart(user_id: int, token: str) -> Optional[Dict[str, Any]]:
+    def get_user_cart(user_id: int, token: str,
+                      identity_headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
         """Получение корзины пользователя"""
         try:
             headers = {'Authorization': f'Bearer {token}'}
-            response = requests.get(
-                f"{settings.CART_SERVICE_URL}/api/cart/",
-                headers=headers,
-                timeout=10
-            )
+            # С подписанной идентичностью cart-service не обращается к user-service
+            headers.update(identity_headers or {})
+            response = get_client('cart-service').get("/api/cart/", operation='get_cart', headers=headers)
             if response.status_code == 200:
-                return response.json()
+                return response_data(response)
             return None
-        except requests.exceptions.RequestException as e:
+        except (ServiceCallError, ValueError) as e:
             logger.error(f"Failed to get cart for user {user_id}: {e}")
             return None
 
@@ -58,34 +52,44 @@ class ProductService:
 
     @staticmethod
     def reserve_products(items: List[Dict]) -> bool:
-        """Резервирование товаров"""
+        """Резервирование товаров
+
+        При ошибке или истечении срока запроса уже зарезервированные товары
+        освобождаются.
+        """
+        reserved = []
         try:
             for item in items:
-                response = requests.post(
-                    f"{settings.PRODUCT_SERVICE_URL}/api/products/{item['product_id']}/reserve/",
-                    json={'quantity': item['quantity']},
-                    timeout=10
+                response = get_client('product-service').post(
+                    f"/api/products/{item['product_id']}/reserve/", operation='reserve',
+                    json={'quantity': item['quantity']}
                 )
                 if response.status_code != 200:
                     logger.error(f"Failed to reserve product {item['product_id']}")
-                    # В случае ошибки нужно откатить уже зарезервированные товары
+                    ProductService.release_products(reserved)
                     return False
+                reserved.append(item)
             return True
-        except requests.exceptions.RequestException as e:
+        except ServiceCallError as e:
             logger.error(f"Failed to reserve products: {e}")
+            ProductService.release_products(reserved)
             return False
+        except DeadlineExceeded:
+            ProductService.release_products(reserved)
+            raise
 
     @staticmethod
     def release_products(items: List[Dict]):
         """Освобождение зарезервированных товаров"""
         try:
-            for item in items:
-                requests.post(
-                    f"{settings.PRODUCT_SERVICE_URL}/api/products/{item['product_id']}/release/",
-                    json={'quantity': item['quantity']},
-                    timeout=10
-                )
-        except requests.exceptions.RequestException as e:
+            # Компенсация выполняется и после истечения срока запроса
+            with without_deadline():
+                for item in items:
+                    get_client('product-service').post(
+                        f"/api/products/{item['product_id']}/release/", operation='release',
+                        json={'quantity': item['quantity']}
+                    )
+        except ServiceCallError as e:
             logger.error(f"Failed to release products: {e}")
 
 class UserService:
@@ -95,15 +99,13 @@ class UserService:
     def get_user_from_token(token: str) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе по токену"""
         try:
-            headers = {'Authorization': f'Bearer {token}'}
-            response = requests.get(
-                f"{settings.USER_SERVICE_URL}/api/users/profile/",
-                headers=headers,
-                timeout=10
+            response = get_client('user-service').get(
+                "/api/users/profile/", operation='get_profile',
+                headers={'Authorization': f'Bearer {token}'}
             )
             if response.status_code == 200:
-                return response.json()
+                return response_data(response)
             return None
-        except requests.exceptions.RequestException as e:
+        except (ServiceCallError, ValueError) as e:
             logger.error(f"Failed to get user from token: {e}")
             return None
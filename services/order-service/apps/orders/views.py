@@ -10,6 +10,7 @@ from .serializers import (
     UpdateOrderStatusSerializer
 )
 from .services import CartService, ProductService, UserService, event_bus
+from shared.deadline import DeadlineExceeded
 import logging
 
 logger = logging.getLogger(__name__)
@@ -59,7 +60,7 @@ def create_order(request):
         with transaction.atomic():
             # Получаем корзину пользователя
             token = request.headers.get('Authorization', '').replace('Bearer ', '')
-            cart_data = CartService.get_user_cart(user_id, token)
+            cart_data = CartService.get_user_cart(user_id, token, request.identity_headers)
 
             if not cart_data or not cart_data.get('items'):
                 return Response({
@@ -154,6 +155,9 @@ def create_order(request):
                 ProductService.release_products(items_to_reserve)
                 raise
 
+    except DeadlineExceeded:
+        # Клиент ответа уже не ждет - DeadlineMiddleware ответит 504
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {e}")
         return Response({
@@ -178,33 +182,34 @@ def update_order_status(request, pk):
                 'error': f'Invalid status transition from {old_status} to {new_status}'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        order.status = new_status
-        order.save()
-
-        # Публикуем событие об изменении статуса
-        event_bus.publish_event('order.status_changed', {
-            'order_id': order.id,
-            'user_id': order.user_id,
-            'old_status': old_status,
-            'new_status': new_status
-        })
-
-        # Если заказ отменен, освобождаем товары
-        if new_status == 'cancelled':
-            items_to_release = []
-            for item in order.items.all():
-                items_to_release.append({
-                    'product_id': item.product_id,
-                    'quantity': item.quantity
-                })
-            ProductService.release_products(items_to_release)
+        # Статус и события (outbox) фиксируются вместе
+        with transaction.atomic():
+            order.status = new_status
+            order.save()
 
-            event_bus.publish_event('order.cancelled', {
+            # Публикуем событие об изменении статуса
+            event_bus.publish_event('order.status_changed', {
                 'order_id': order.id,
                 'user_id': order.user_id,
-                'items': items_to_release
+                'old_status': old_status,
+                'new_status': new_status
             })
 
+            # Товары отмененного заказа освобождает product-service по событию order.cancelled
+            if new_status == 'cancelled':
+                items_to_release = []
+                for item in order.items.all():
+                    items_to_release.append({
+                        'product_id': item.product_id,
+                        'quantity': item.quantity
+                    })
+
+                event_bus.publish_event('order.cancelled', {
+                    'order_id': order.id,
+                    'user_id': order.user_id,
+                    'items': items_to_release
+                })
+
         return Response(OrderSerializer(order).data)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
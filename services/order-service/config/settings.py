@@ -1,9 +1,15 @@
 # ===== services/order-service/config/settings.py =====
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий код сервисов (shared/) лежит в корне репозитория
+ROOT_DIR = BASE_DIR.parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
 SECRET_KEY = 'order-service-secret-key-change-in-production'
 DEBUG = True
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
@@ -23,12 +29,16 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    'shared',
     'apps.orders',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'shared.tracing.TracingMiddleware',
+    'shared.metrics.MetricsMiddleware',
+    'shared.deadline.DeadlineMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -69,9 +79,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON по умолчанию; msgpack - по Accept/Content-Type вызовов других сервисов (shared/codecs.py)
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        'shared.codecs.MsgpackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'shared.codecs.MsgpackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'shared.codecs.QualityContentNegotiation',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -98,7 +117,75 @@ PRODUCT_SERVICE_URL = 'http://localhost:8001'
 CART_SERVICE_URL = 'http://localhost:8002'
 USER_SERVICE_URL = 'http://localhost:8004'
 
+# Клиенты других сервисов (shared/http_client.py): пул keep-alive соединений на сервис
+# base_url - адрес или список адресов экземпляров; max_attempts - попытки идемпотентных вызовов
+# Таймауты не превышают оставшегося срока запроса (X-Request-Deadline)
+# codec - формат тел запросов и предпочитаемый формат ответов ('msgpack' | 'json'); JSON остается запасным
+SERVICE_CLIENTS = {
+    'default': {
+        'pool_maxsize': 10,
+        'connect_timeout': 2.0,
+        'read_timeout': 10.0,
+        'max_attempts': 2,
+        'backoff': 0.05,
+        'codec': 'msgpack',
+    },
+    'product-service': {'base_url': PRODUCT_SERVICE_URL},
+    'cart-service': {'base_url': CART_SERVICE_URL},
+    'user-service': {'base_url': USER_SERVICE_URL},
+}
+
+# Подписанная идентичность от gateway (shared/identity.py)
+GATEWAY_IDENTITY_SECRET = 'gateway-identity-secret-change-in-production'
+GATEWAY_IDENTITY_MAX_AGE = 300  # секунд
+
+# Проверка JWT без gateway (shared/jwks.py): подпись проверяется локально по открытым
+# ключам user-service (/.well-known/jwks.json). Ключи кэшируются на KEYS_TTL секунд;
+# токен с неизвестным kid (ротация ключа) загружает их заново, не чаще MIN_REFRESH_INTERVAL
+JWT_AUTH = {
+    'JWKS_SERVICE': 'user-service',
+    'KEYS_TTL': 300.0,
+    'MIN_REFRESH_INTERVAL': 10.0,
+}
+
 # Redis settings
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
+
+# Шина событий на Redis Streams (shared/events.py): поток на тип события <STREAM>:<тип>
+# GROUP - группа потребителей сервиса: каждое событие обрабатывает один потребитель группы
+# MAXLEN - приблизительная длина потока; CLAIM_IDLE_MS - через сколько забирать события упавшего потребителя
+# Событие, не обработанное за MAX_DELIVERIES доставок, уходит в поток <STREAM>:dead
+# CODEC - формат записываемых событий ('msgpack' | 'json'); потребитель читает кодек из записи
+EVENT_BUS = {
+    'STREAM': 'events',
+    'GROUP': 'order-service',
+    'MAXLEN': 100000,
+    'BATCH_SIZE': 10,
+    'BLOCK_MS': 5000,
+    'CLAIM_IDLE_MS': 60000,
+    'CLAIM_INTERVAL': 30.0,
+    'MAX_DELIVERIES': 5,
+    'CODEC': 'msgpack',
+}
+
+# Outbox событий заказов (apps/orders/outbox.py): события пишутся в БД в транзакции заказа,
+# в шину их доставляет `manage.py relay_outbox` пачками по BATCH_SIZE одним pipeline
+# RETENTION_HOURS - сколько хранить опубликованные события
+OUTBOX = {
+    'BATCH_SIZE': 100,
+    'POLL_INTERVAL': 0.5,
+    'RETRY_INTERVAL': 2.0,
+    'RETENTION_HOURS': 24,
+    'CLEANUP_INTERVAL': 300.0,
+}
+
+# Трассировка W3C trace context (shared/tracing.py)
+# EXPORTER - 'file' (JSON-строки в FILE, по умолчанию во временном каталоге) | 'otlp' (пачки POST на OTLP_ENDPOINT) | 'none'
+TRACING = {
+    'SERVICE_NAME': 'order-service',
+    'SAMPLE_RATE': 1.0,
+    'EXPORTER': 'file',
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+}
@@ -1,41 +1,20 @@
-import json
-import redis
-import threading
 import logging
-from django.conf import settings
+from django.db import transaction
+from shared.events import EventHandlers
 
 logger = logging.getLogger(__name__)
 
-def start_event_listener():
-    """Запуск слушателя событий Redis"""
-    try:
-        redis_client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT,
-                                 db=settings.REDIS_DB, decode_responses=True)
-        pubsub = redis_client.pubsub()
-        pubsub.subscribe('events')
+# Обработчики событий сервиса (EVENT_BUS['HANDLERS']), запуск: manage.py consume_events
+handlers = EventHandlers()
 
-        logger.info("Product service event listener started")
+@handlers.on('order.cancelled', key='order_id')
+def release_cancelled_order(data):
+    """Восстанавливаем количество товаров при отмене заказа"""
+    from .models import Product
 
-        for message in pubsub.listen():
-            if message['type'] == 'message':
-                try:
-                    event_data = json.loads(message['data'])
-                    handle_event(event_data)
-                except Exception as e:
-                    logger.error(f"Error processing event: {e}")
-    except Exception as e:
-        logger.error(f"Redis connection error: {e}")
-
-def handle_event(event_data):
-    """Обработка событий"""
-    event_type = event_data.get('type')
-    data = event_data.get('data', {})
-
-    if event_type == 'order.cancelled':
-        # Восстанавливаем количество товаров при отмене заказа
-        from .models import Product
-
-        order_items = data.get('items', [])
+    order_items = data.get('items', [])
+    # Все позиции заказа возвращаются на склад вместе
+    with transaction.atomic():
         for item in order_items:
             try:
                 product = Product.objects.get(id=item['product_id'])
@@ -43,8 +22,3 @@ def handle_event(event_data):
                 logger.info(f"Released {item['quantity']} units of product {product.id}")
             except Product.DoesNotExist:
                 logger.warning(f"Product {item['product_id']} not found for release")
-
-# Запуск в отдельном потоке
-if settings.DEBUG:
-    thread = threading.Thread(target=start_event_listener, daemon=True)
-    thread.start()
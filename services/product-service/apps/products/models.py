@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.utils.text import slugify
 
 class Category(models.Model):
@@ -40,15 +42,20 @@ class Product(models.Model):
     def is_in_stock(self):
         return self.stock_quantity > 0
 
+    # Остаток меняется одним UPDATE в БД: параллельные резервирования и
+    # освобождения (обработчики событий, запросы) не затирают друг друга
+
     def reserve_quantity(self, quantity):
         """Резервирование количества товара"""
-        if self.stock_quantity >= quantity:
-            self.stock_quantity -= quantity
-            self.save()
-            return True
-        return False
+        reserved = Product.objects.filter(pk=self.pk, stock_quantity__gte=quantity).update(
+            stock_quantity=F('stock_quantity') - quantity, updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['stock_quantity', 'updated_at'])
+        return bool(reserved)
 
     def release_quantity(self, quantity):
         """Освобождение зарезервированного количества"""
-        self.stock_quantity += quantity
-        self.save()
+        Product.objects.filter(pk=self.pk).update(
+            stock_quantity=F('stock_quantity') + quantity, updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['stock_quantity', 'updated_at'])
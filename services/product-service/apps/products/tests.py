@@ -1,3 +1,62 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.db import connection
+from django.test import TransactionTestCase
+
+from .event_handlers import release_cancelled_order
+from .models import Category, Product
+
+
+class ConcurrentStockTest(TransactionTestCase):
+    """Параллельные изменения остатка (обработчики событий, запросы) не теряются"""
+
+    workers = 8
+    calls_per_worker = 5
+
+    def setUp(self):
+        category = Category.objects.create(name='Phones')
+        self.product = Product.objects.create(
+            name='Phone', description='', price='100.00', category=category, stock_quantity=10
+        )
+
+    def run_in_threads(self, func):
+        barrier = threading.Barrier(self.workers)
+        errors = []
+
+        def target(worker):
+            try:
+                barrier.wait()
+                for index in range(self.calls_per_worker):
+                    func(worker * self.calls_per_worker + index)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=target, args=(worker,)) for worker in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_cancelled_orders_release_all_items(self):
+        self.run_in_threads(lambda order_id: release_cancelled_order({
+            'order_id': order_id,
+            'items': [{'product_id': self.product.id, 'quantity': 2}],
+        }))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10 + self.workers * self.calls_per_worker * 2)
+
+    def test_parallel_releases_outside_transaction(self):
+        # Как в release_product: объект читается отдельно, изменение - в autocommit
+        self.run_in_threads(lambda _: Product.objects.get(pk=self.product.pk).release_quantity(1))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10 + self.workers * self.calls_per_worker)
+
+    def test_parallel_reserves_do_not_oversell(self):
+        reserved = []
+        self.run_in_threads(lambda _: reserved.append(Product.objects.get(pk=self.product.pk).reserve_quantity(1)))
+        self.product.refresh_from_db()
+        self.assertEqual(reserved.count(True), 10)
+        self.assertEqual(self.product.stock_quantity, 0)
@@ -1,8 +1,14 @@
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий код сервисов (shared/) лежит в корне репозитория
+ROOT_DIR = BASE_DIR.parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
 SECRET_KEY = 'product-service-secret-key-change-in-production'
 DEBUG = True
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
@@ -23,12 +29,16 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    'shared',
     'apps.products',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'shared.tracing.TracingMiddleware',
+    'shared.metrics.MetricsMiddleware',
+    'shared.deadline.DeadlineMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,6 +72,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR.parent.parent / 'databases' / 'product.db',
+        # Транзакция сразу берет блокировку записи и ждет ее до timeout секунд: параллельные
+        # обработчики событий (consume_events) выстраиваются в очередь, а не падают с
+        # 'database is locked' на повышении блокировки чтения до записи
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # Тестовая БД в файле: тесты с потоками пишут в нее параллельно
+        'TEST': {'NAME': BASE_DIR.parent.parent / 'databases' / 'test_product.db'},
     }
 }
 
@@ -69,9 +85,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # JSON по умолчанию; msgpack - по Accept/Content-Type вызовов других сервисов (shared/codecs.py)
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        'shared.codecs.MsgpackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'shared.codecs.MsgpackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'shared.codecs.QualityContentNegotiation',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -97,3 +122,38 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
+
+# Шина событий на Redis Streams (shared/events.py): поток на тип события <STREAM>:<тип>
+# GROUP - группа потребителей сервиса: каждое событие обрабатывает один потребитель группы
+# MAXLEN - приблизительная длина потока; CLAIM_IDLE_MS - через сколько забирать события упавшего потребителя
+# Событие, не обработанное за MAX_DELIVERIES доставок, уходит в поток <STREAM>:dead
+# CODEC - формат записываемых событий ('msgpack' | 'json'); потребитель читает кодек из записи
+# Обработка - `manage.py consume_events`: обработчики HANDLERS в WORKERS потоках, порядок по ключу события,
+# не больше MAX_IN_FLIGHT событий в очередях; при остановке очереди дорабатываются до DRAIN_TIMEOUT секунд
+# Повторная доставка события пропускается по журналу ProcessedEvent (shared/models.py), записи хранятся DEDUPE_TTL_HOURS
+EVENT_BUS = {
+    'STREAM': 'events',
+    'GROUP': 'product-service',
+    'MAXLEN': 100000,
+    'BATCH_SIZE': 10,
+    'BLOCK_MS': 5000,
+    'CLAIM_IDLE_MS': 60000,
+    'CLAIM_INTERVAL': 30.0,
+    'MAX_DELIVERIES': 5,
+    'CODEC': 'msgpack',
+    'HANDLERS': 'apps.products.event_handlers.handlers',
+    'WORKERS': 4,
+    'MAX_IN_FLIGHT': 100,
+    'DRAIN_TIMEOUT': 30.0,
+    'DEDUPE_TTL_HOURS': 168,
+    'DEDUPE_PURGE_INTERVAL': 3600.0,
+}
+
+# Трассировка W3C trace context (shared/tracing.py)
+# EXPORTER - 'file' (JSON-строки в FILE, по умолчанию во временном каталоге) | 'otlp' (пачки POST на OTLP_ENDPOINT) | 'none'
+TRACING = {
+    'SERVICE_NAME': 'product-service',
+    'SAMPLE_RATE': 1.0,
+    'EXPORTER': 'file',
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+}
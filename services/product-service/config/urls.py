@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
+from shared.metrics import metrics_view
 
 def health_check(request):
     return JsonResponse({'status': 'healthy', 'service': 'product-service'})
@@ -8,5 +9,6 @@ def health_check(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', health_check),
+    path('metrics', metrics_view),
     path('api/', include('apps.products.urls')),
 ]
@@ -0,0 +1,90 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.exceptions import ImproperlyConfigured
+from jwt.algorithms import RSAAlgorithm
+
+logger = logging.getLogger(__name__)
+
+PRIVATE_KEY_FILE = 'private.pem'
+PREVIOUS_KEYS_DIR = 'previous'
+
+
+def generate_private_key() -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def _write_temp(keys_dir: Path, private_pem: str) -> Path:
+    """Ключ во временном файле каталога ключей (права 0600)"""
+    keys_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=keys_dir, prefix='.private-', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(private_pem)
+    return Path(tmp_path)
+
+
+def write_private_key(keys_dir: Path, private_pem: str):
+    """Запись приватного ключа с заменой текущего"""
+    os.replace(_write_temp(keys_dir, private_pem), keys_dir / PRIVATE_KEY_FILE)
+
+
+def create_private_key(keys_dir: Path, private_pem: str) -> bool:
+    """Запись приватного ключа, только если его еще нет; False - ключ уже создан другим процессом"""
+    tmp_path = _write_temp(keys_dir, private_pem)
+    try:
+        # link атомарен и не заменяет существующий файл: из одновременно
+        # запущенных воркеров ключ создает один, остальные читают его ключ
+        os.link(tmp_path, keys_dir / PRIVATE_KEY_FILE)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        tmp_path.unlink()
+
+
+def load_private_key(keys_dir: Path, generate: bool = False) -> str:
+    """Приватный ключ подписи токенов (PEM); generate - создать, если его еще нет"""
+    path = keys_dir / PRIVATE_KEY_FILE
+    if not path.exists():
+        if not generate:
+            raise ImproperlyConfigured(
+                f"JWT signing key {path} not found: put the service RSA private key (PEM) there, e.g. "
+                f"openssl genpkey -algorithm RSA -pkeyopt rsa_keygen_bits:2048 -out {path}"
+            )
+        if create_private_key(keys_dir, generate_private_key()):
+            logger.warning(f"Generated JWT signing key {path}")
+    return path.read_text()
+
+
+def public_key_pem(private_pem: str) -> str:
+    key = serialization.load_pem_private_key(private_pem.encode(), password=None)
+    return key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+
+
+def load_previous_public_keys(keys_dir: Path) -> List[str]:
+    """Открытые ключи прежних приватных ключей: токены, подписанные ими, еще действуют"""
+    return [path.read_text() for path in sorted((keys_dir / PREVIOUS_KEYS_DIR).glob('*.pem'))]
+
+
+def public_jwk(public_pem: str) -> Dict:
+    """JWK открытого ключа; kid - отпечаток ключа по RFC 7638"""
+    jwk = RSAAlgorithm.to_jwk(RSAAlgorithm(RSAAlgorithm.SHA256).prepare_key(public_pem), as_dict=True)
+    thumbprint = json.dumps({name: jwk[name] for name in ('e', 'kty', 'n')}, separators=(',', ':'), sort_keys=True)
+    kid = base64.urlsafe_b64encode(hashlib.sha256(thumbprint.encode()).digest()).rstrip(b'=').decode()
+    return dict(jwk, kid=kid, alg='RS256', use='sig')
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.authentication.keys import (
+    PREVIOUS_KEYS_DIR, generate_private_key, public_jwk, public_key_pem, write_private_key,
+)
+
+
+class Command(BaseCommand):
+    help = ('Новый ключ подписи JWT: текущий открытый ключ переносится в JWT_KEYS_DIR/previous '
+            'и остается в JWKS (после ротации нужен перезапуск user-service)')
+
+    def handle(self, *args, **options):
+        keys_dir = settings.JWT_KEYS_DIR
+        previous_pem = public_key_pem(settings.JWT_PRIVATE_KEY)
+        previous_kid = public_jwk(previous_pem)['kid']
+        previous_dir = keys_dir / PREVIOUS_KEYS_DIR
+        previous_dir.mkdir(parents=True, exist_ok=True)
+        (previous_dir / f"{previous_kid}.pem").write_text(previous_pem)
+
+        private_pem = generate_private_key()
+        write_private_key(keys_dir, private_pem)
+        kid = public_jwk(public_key_pem(private_pem))['kid']
+        self.stdout.write(self.style.SUCCESS(f"New signing key {kid}, previous key {previous_kid} kept in JWKS"))
+        self.stdout.write(f"Remove {previous_dir / f'{previous_kid}.pem'} after refresh tokens it signed expire "
+                          f"({settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']})")
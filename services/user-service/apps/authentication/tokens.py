@@ -0,0 +1,75 @@
+from functools import lru_cache
+from typing import Any, Dict
+
+import jwt
+from django.conf import settings
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.settings import api_settings
+
+from .keys import public_jwk
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """Подпись токенов текущим ключом с его kid в заголовке
+
+    По kid сервисы находят ключ в JWKS, а сам user-service проверяет токены
+    и текущим, и прежними ключами (JWT_PREVIOUS_PUBLIC_KEYS), так что
+    ротация ключа не обрывает выданные токены.
+    """
+
+    def __init__(self, public_keys, **kwargs):
+        super().__init__(**kwargs)
+        self.jwks = [public_jwk(public_key) for public_key in public_keys]
+        self.kid = self.jwks[0]['kid']
+        self.verifying_keys = dict(zip((jwk['kid'] for jwk in self.jwks), public_keys))
+
+    def get_verifying_key(self, token) -> str:
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError:
+            kid = None
+        return self.verifying_keys.get(kid, self.verifying_key)
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.signing_key,
+            algorithm=self.algorithm,
+            headers={'kid': self.kid},
+            json_encoder=self.json_encoder,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_token_backend() -> KeyRingTokenBackend:
+    return KeyRingTokenBackend(
+        [api_settings.VERIFYING_KEY, *settings.JWT_PREVIOUS_PUBLIC_KEYS],
+        algorithm=api_settings.ALGORITHM,
+        signing_key=api_settings.SIGNING_KEY,
+        verifying_key=api_settings.VERIFYING_KEY,
+        audience=api_settings.AUDIENCE,
+        issuer=api_settings.ISSUER,
+        leeway=api_settings.LEEWAY,
+        json_encoder=api_settings.JSON_ENCODER,
+    )
+
+
+class KeyRingTokenMixin:
+    @property
+    def token_backend(self) -> KeyRingTokenBackend:
+        return get_token_backend()
+
+
+class AccessToken(KeyRingTokenMixin, tokens.AccessToken):
+    pass
+
+
+class RefreshToken(KeyRingTokenMixin, tokens.RefreshToken):
+    access_token_class = AccessToken
@@ -2,9 +2,10 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.http import JsonResponse
 from apps.users.models import User
+from .tokens import RefreshToken, get_token_backend
 
 
 @api_view(['POST'])
@@ -22,6 +23,8 @@ def login_view(request):
     user = authenticate(username=email, password=password)
     if user and user.is_active:
         refresh = RefreshToken.for_user(user)
+        # email попадает и в access токен, gateway передает его сервисам
+        refresh['email'] = user.email
         return Response({
             'access': str(refresh.access_token),
             'refresh': str(refresh),
@@ -58,3 +61,10 @@ def refresh_token(request):
             {'error': 'Invalid refresh token'},
             status=status.HTTP_401_UNAUTHORIZED
         )
+
+def jwks_view(request):
+    """Открытые ключи подписи токенов (JWKS): текущий и прежние"""
+    response = JsonResponse({'keys': get_token_backend().jwks})
+    # Сервисы кэшируют ключи сами (JWT_AUTH['KEYS_TTL'])
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
@@ -1,9 +1,17 @@
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий код сервисов (shared/) лежит в корне репозитория
+ROOT_DIR = BASE_DIR.parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from apps.authentication.keys import load_previous_public_keys, load_private_key, public_key_pem
+
 SECRET_KEY = 'user-service-secret-key-change-in-production'
 DEBUG = True
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
@@ -31,6 +39,9 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'shared.tracing.TracingMiddleware',
+    'shared.metrics.MetricsMiddleware',
+    'shared.deadline.DeadlineMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -74,17 +85,42 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Изменили на AllowAny по умолчанию
     ],
+    # JSON по умолчанию; msgpack - по Accept/Content-Type вызовов других сервисов (shared/codecs.py)
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        'shared.codecs.MsgpackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'shared.codecs.MsgpackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'shared.codecs.QualityContentNegotiation',
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
 
+# Ключи подписи JWT (apps/authentication/keys.py)
+# Токены подписываются RS256 ключом JWT_KEYS_DIR/private.pem (в DEBUG создается при
+# первом запуске, без DEBUG его отсутствие - ImproperlyConfigured при старте). Открытые
+# ключи публикуются в /.well-known/jwks.json: по ним gateway, cart-service и
+# order-service проверяют токены сами, без запроса в user-service.
+# Ротация (manage.py rotate_jwt_key): текущий открытый ключ - в JWT_KEYS_DIR/previous/, новый private.pem,
+# перезапуск; прежний ключ удаляется после истечения выданных им refresh токенов
+JWT_KEYS_DIR = BASE_DIR / 'keys'
+JWT_PRIVATE_KEY = load_private_key(JWT_KEYS_DIR, generate=DEBUG)
+JWT_PREVIOUS_PUBLIC_KEYS = load_previous_public_keys(JWT_KEYS_DIR)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    'ALGORITHM': 'RS256',
+    'SIGNING_KEY': JWT_PRIVATE_KEY,
+    'VERIFYING_KEY': public_key_pem(JWT_PRIVATE_KEY),
+    # kid в заголовке токена и проверка прежними ключами (apps/authentication/tokens.py)
+    'AUTH_TOKEN_CLASSES': ('apps.authentication.tokens.AccessToken',),
 }
 
 AUTH_USER_MODEL = 'users.User'
@@ -154,3 +190,12 @@ LOGGING = {
         'level': 'INFO',
     },
 }
+
+# Трассировка W3C trace context (shared/tracing.py)
+# EXPORTER - 'file' (JSON-строки в FILE, по умолчанию во временном каталоге) | 'otlp' (пачки POST на OTLP_ENDPOINT) | 'none'
+TRACING = {
+    'SERVICE_NAME': 'user-service',
+    'SAMPLE_RATE': 1.0,
+    'EXPORTER': 'file',
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+}
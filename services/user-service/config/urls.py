@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
+from shared.metrics import metrics_view
+from apps.authentication.views import jwks_view
 
 def health_check(request):
     return JsonResponse({'status': 'healthy', 'service': 'user-service'})
@@ -8,6 +10,8 @@ def health_check(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', health_check),
+    path('metrics', metrics_view),
+    path('.well-known/jwks.json', jwks_view),
     path('api/auth/', include('apps.authentication.urls')),
     path('api/users/', include('apps.users.urls')),
 ]
@@ -0,0 +1,200 @@
+import json
+import logging
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from rest_framework.exceptions import ParseError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+
+class CodecError(ValueError):
+    """Кодек неизвестен, недоступен (нет библиотеки) или данные не декодируются"""
+
+
+class JSONCodec:
+    """JSON: совместимый формат по умолчанию; Decimal, даты и UUID становятся строками"""
+
+    name = 'json'
+    content_type = 'application/json'
+
+    def encode(self, obj) -> bytes:
+        return json.dumps(obj, default=str, separators=(',', ':')).encode()
+
+    def decode(self, data: bytes):
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise CodecError(f"Bad JSON payload: {e}") from e
+
+
+class MsgpackCodec:
+    """msgpack: компактный двоичный формат; Decimal, даты и UUID передаются без потерь
+
+    Библиотека msgpack необязательна: без нее кодек недоступен и
+    используется JSON.
+    """
+
+    name = 'msgpack'
+    content_type = 'application/msgpack'
+
+    # Коды ext-типов msgpack
+    DECIMAL, DATETIME, DATE, UUID = 1, 2, 3, 4
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            msgpack = None
+        self.msgpack = msgpack
+
+    @property
+    def available(self) -> bool:
+        return self.msgpack is not None
+
+    def _default(self, obj):
+        if isinstance(obj, Decimal):
+            return self.msgpack.ExtType(self.DECIMAL, str(obj).encode())
+        if isinstance(obj, datetime):
+            return self.msgpack.ExtType(self.DATETIME, obj.isoformat().encode())
+        if isinstance(obj, date):
+            return self.msgpack.ExtType(self.DATE, obj.isoformat().encode())
+        if isinstance(obj, uuid.UUID):
+            return self.msgpack.ExtType(self.UUID, obj.bytes)
+        return str(obj)
+
+    def _ext_hook(self, code: int, data: bytes):
+        if code == self.DECIMAL:
+            return Decimal(data.decode())
+        if code == self.DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == self.DATE:
+            return date.fromisoformat(data.decode())
+        if code == self.UUID:
+            return uuid.UUID(bytes=data)
+        return self.msgpack.ExtType(code, data)
+
+    def encode(self, obj) -> bytes:
+        if not self.available:
+            raise CodecError('msgpack is not installed')
+        return self.msgpack.packb(obj, default=self._default, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        if not self.available:
+            raise CodecError('msgpack is not installed')
+        try:
+            return self.msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False)
+        except (ValueError, self.msgpack.UnpackException) as e:
+            raise CodecError(f"Bad msgpack payload: {e}") from e
+
+
+json_codec = JSONCodec()
+msgpack_codec = MsgpackCodec()
+
+CODECS = {codec.name: codec for codec in (json_codec, msgpack_codec)}
+
+_fallbacks_logged = set()
+
+
+def get_codec(name: Optional[str]):
+    """Кодек по имени; недоступный (msgpack без библиотеки) заменяется JSON"""
+    codec = CODECS.get(name or 'json')
+    if codec is None:
+        raise CodecError(f"Unknown codec {name!r}")
+    if not getattr(codec, 'available', True):
+        if name not in _fallbacks_logged:
+            _fallbacks_logged.add(name)
+            logger.warning(f"Codec {name} is not available, falling back to json")
+        return json_codec
+    return codec
+
+
+def decoder_for(name: Optional[str]):
+    """Кодек для декодирования данных кодека name (без замены: чужие данные JSON не прочитает)"""
+    codec = CODECS.get(name or 'json')
+    if codec is None or not getattr(codec, 'available', True):
+        raise CodecError(f"Codec {name!r} is not available")
+    return codec
+
+
+def codec_for_content_type(content_type: Optional[str]):
+    """Кодек по Content-Type ответа (без параметров); None - формат не из CODECS"""
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    for codec in CODECS.values():
+        if codec.content_type == media_type:
+            return codec
+    return None
+
+
+def accept_header(preferred: Optional[str]) -> str:
+    """Accept исходящего запроса: предпочитаемый кодек, если доступен, и JSON как запасной"""
+    codec = get_codec(preferred)
+    if codec is json_codec:
+        return json_codec.content_type
+    return f"{codec.content_type}, {json_codec.content_type};q=0.5"
+
+
+class MsgpackRenderer(BaseRenderer):
+    """DRF renderer application/msgpack: выбирается по Accept клиента"""
+
+    media_type = MsgpackCodec.content_type
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack_codec.encode(data)
+
+
+class MsgpackParser(BaseParser):
+    """DRF parser тел запросов application/msgpack"""
+
+    media_type = MsgpackCodec.content_type
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack_codec.decode(stream.read())
+        except CodecError as e:
+            raise ParseError(f"Msgpack parse error - {e}")
+
+
+def media_quality(media_type: str) -> float:
+    """Параметр q типа из Accept (1.0, если не указан)"""
+    for param in media_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+class QualityContentNegotiation(DefaultContentNegotiation):
+    """Выбор renderer с учетом q в Accept
+
+    DefaultContentNegotiation при одинаковой специфичности типов выбирает
+    первый renderer из настроек и q не учитывает, поэтому на
+    'application/msgpack, application/json;q=0.5' ответил бы JSON. Здесь
+    сначала берется самый предпочтительный для клиента тип, если для него
+    есть renderer; иначе - обычный выбор DRF (JSON для */* и браузеров).
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        if format_suffix or request.query_params.get(self.settings.URL_FORMAT_OVERRIDE):
+            return super().select_renderer(request, renderers, format_suffix)
+
+        accepts = self.get_accept_list(request)
+        if accepts:
+            preferred = max(accepts, key=media_quality).split(';')[0].strip()
+            for renderer in renderers:
+                if renderer.media_type == preferred:
+                    return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
@@ -0,0 +1,119 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Абсолютный срок ответа клиенту, миллисекунды Unix time
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Срок запроса истек: продолжать работу бессмысленно, клиент ответа уже не ждет"""
+
+
+def parse_deadline(value: Optional[str]) -> Optional[float]:
+    """Срок из заголовка X-Request-Deadline, секунды Unix time"""
+    if not value:
+        return None
+    try:
+        return int(value) / 1000
+    except ValueError:
+        return None
+
+
+def set_deadline(deadline: Optional[float]):
+    """Срок текущего запроса (секунды Unix time); возвращает токен для reset_deadline"""
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+@contextmanager
+def without_deadline():
+    """Блок без срока запроса - для компенсирующих действий, которые нужно довести до конца"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Оставшееся до срока время, секунд (None - срок не задан)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check_deadline():
+    """DeadlineExceeded, если срок текущего запроса истек"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded by {-left:.3f}s")
+
+
+def get_timeout(default: float) -> float:
+    """Таймаут исходящего вызова: default, но не дольше оставшегося срока"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded by {-left:.3f}s")
+    return min(default, left)
+
+
+def deadline_headers(headers: Optional[Dict] = None) -> Dict:
+    """Заголовки исходящего запроса со сроком текущего запроса"""
+    headers = dict(headers or {})
+    deadline = _deadline.get()
+    if deadline is not None:
+        headers[DEADLINE_HEADER] = str(int(deadline * 1000))
+    return headers
+
+
+def deadline_exceeded_response() -> JsonResponse:
+    return JsonResponse({'error': 'Deadline exceeded'}, status=504)
+
+
+class DeadlineMiddleware:
+    """Срок запроса из X-Request-Deadline для исходящих вызовов сервиса
+
+    Запрос с уже истекшим сроком отклоняется 504 без обработки, а
+    DeadlineExceeded из представления (исходящий вызов после срока)
+    превращается в 504.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+        if deadline is not None and deadline <= time.time():
+            logger.warning(f"Dropping {request.method} {request.path}: deadline already passed")
+            return deadline_exceeded_response()
+
+        token = set_deadline(deadline)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_deadline(token)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, DeadlineExceeded):
+            logger.warning(f"Aborting {request.method} {request.path}: {exception}")
+            return deadline_exceeded_response()
+        return None
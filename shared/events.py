@@ -0,0 +1,463 @@
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import redis
+from django.db import DatabaseError, close_old_connections, transaction
+
+from .codecs import CodecError, decoder_for, get_codec
+from .tracing import parse_traceparent, tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_BUS_SETTINGS = {
+    'STREAM': 'events',
+    'MAXLEN': 100000,
+    'GROUP': None,
+    'BATCH_SIZE': 10,
+    'BLOCK_MS': 5000,
+    'CLAIM_IDLE_MS': 60000,
+    'CLAIM_INTERVAL': 30.0,
+    'MAX_DELIVERIES': 5,
+    'HANDLERS': None,
+    'WORKERS': 4,
+    'MAX_IN_FLIGHT': 100,
+    'DRAIN_TIMEOUT': 30.0,
+    'DEDUPE_TTL_HOURS': 168,
+    'DEDUPE_PURGE_INTERVAL': 3600.0,
+    'CODEC': 'json',
+}
+
+class EventBus:
+    """Шина событий на Redis Streams
+
+    Событие - запись потока своего типа <STREAM>:<тип> с полями type, codec
+    и event (конверт {'id', 'type', 'version', 'data', 'timestamp',
+    'traceparent'} в кодеке CODEC, shared/codecs.py), так что подписчик
+    получает только нужные ему типы, а потребитель декодирует запись кодеком
+    из самой записи. Каждый поток обрезается
+    приблизительно до MAXLEN записей: отставший больше чем на MAXLEN событий
+    потребитель потеряет самые старые из них.
+
+    Событие публикуется после фиксации транзакции, в которой вызван publish
+    (откат транзакции отменяет его), в том же потоке: фоновой очереди нет,
+    при недоступном Redis событие теряется с записью в лог. Сервис, которому нужна гарантия
+    доставки, пишет события в outbox в своей транзакции, а relay передает их
+    пачками в write (одним pipeline), как order-service.
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._raw_redis = None
+
+    @property
+    def config(self) -> Dict:
+        from django.conf import settings
+
+        config = dict(DEFAULT_EVENT_BUS_SETTINGS)
+        config.update(getattr(settings, 'EVENT_BUS', {}))
+        return config
+
+    def connect(self, decode_responses: bool) -> redis.Redis:
+        from django.conf import settings
+
+        return redis.Redis(
+            host=getattr(settings, 'REDIS_HOST', 'localhost'),
+            port=getattr(settings, 'REDIS_PORT', 6379),
+            db=getattr(settings, 'REDIS_DB', 0),
+            decode_responses=decode_responses
+        )
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = self.connect(decode_responses=True)
+        return self._redis
+
+    @property
+    def raw_redis(self) -> "redis.Redis":
+        """Клиент без декодирования ответов: чтение записей с двоичным телом события"""
+        if self._raw_redis is None:
+            self._raw_redis = self.connect(decode_responses=False)
+        return self._raw_redis
+
+    def build_event(self, event_type: str, data: Dict, version: int = 1) -> Dict:
+        """Конверт события: id, время и трасса - на момент публикации; version - версия схемы data"""
+        with tracer.span(f"publish {event_type}", 'producer') as span:
+            event = {
+                'id': uuid.uuid4().hex,
+                'type': event_type,
+                'version': version,
+                'data': data,
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                # Обработчик продолжает трассу от спана публикации
+                'traceparent': span.context.to_traceparent(),
+            }
+            span.set_attribute('event.id', event['id'])
+        return event
+
+    def publish(self, event_type: str, data: Dict, version: int = 1) -> str:
+        """Публикация события после фиксации текущей транзакции; возвращает id события"""
+        event = self.build_event(event_type, data, version)
+        # Вне транзакции on_commit выполняет функцию сразу
+        transaction.on_commit(partial(self.write, [event]))
+        return event['id']
+
+    def write(self, events: List[Dict]) -> bool:
+        """Запись событий в поток одним pipeline"""
+        config = self.config
+        codec = get_codec(config['CODEC'])
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for event in events:
+                pipe.xadd(
+                    self.stream_for(event['type']),
+                    {'type': event['type'], 'codec': codec.name, 'event': codec.encode(event)},
+                    maxlen=config['MAXLEN'], approximate=True
+                )
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Failed to publish {len(events)} events: {e}")
+            return False
+        logger.info(f"Published {len(events)} events: {', '.join(event['type'] for event in events)}")
+        return True
+
+    def stream_for(self, event_type: str) -> str:
+        """Поток событий типа event_type"""
+        return f"{self.config['STREAM']}:{event_type}"
+
+    def event_streams(self) -> List[str]:
+        """Все потоки событий (кроме потока необработанных)"""
+        prefix = self.config['STREAM']
+        streams = self.redis.scan_iter(match=f"{prefix}:*", _type='STREAM')
+        return sorted(stream for stream in streams if stream != f"{prefix}:dead")
+
+    def ensure_group(self, stream: str, group: str, start_id: str = '0'):
+        """Создание группы потребителей потока (новая группа читает события после start_id)
+
+        По умолчанию группа получает и события, записанные в поток до ее
+        создания (например, outbox relay успел опубликовать их до первого
+        запуска consume_events); повторы отсекает журнал ProcessedEvent.
+        """
+        try:
+            self.redis.xgroup_create(stream, group, id=start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+
+def decode_entries(entries) -> List[Tuple[str, Optional[Dict]]]:
+    """Записи потока от raw_redis: id и имена полей - строки, тело события остается байтами"""
+    decoded = []
+    for entry_id, fields in entries:
+        if fields is not None:
+            fields = {
+                name.decode(): value if name == b'event' else value.decode()
+                for name, value in fields.items()
+            }
+        decoded.append((entry_id.decode(), fields))
+    return decoded
+
+
+class EventConsumer:
+    """Потребитель событий заданных типов в группе сервиса
+
+    Потребитель читает только потоки своих типов событий (<STREAM>:<тип>),
+    поэтому чужие события не доставляются и не декодируются. Каждое событие
+    получает ровно один потребитель группы, так что сервис может запускать
+    несколько потребителей параллельно. Событие подтверждается (XACK) только
+    после успешной обработки; необработанные события упавших потребителей
+    через CLAIM_IDLE_MS забирает живой потребитель (XAUTOCLAIM). Событие, не
+    обработанное за MAX_DELIVERIES доставок, переносится в поток
+    <STREAM>:dead и подтверждается.
+    """
+
+    def __init__(self, handler: Callable[[Dict], None], event_types: Iterable[str],
+                 group: Optional[str] = None, name: Optional[str] = None, bus: Optional[EventBus] = None):
+        self.bus = bus or event_bus
+        self.config = self.bus.config
+        self.handler = handler
+        self.group = group or self.config['GROUP']
+        if not self.group:
+            raise ValueError("EventConsumer needs a group (EVENT_BUS['GROUP'])")
+        self.streams = [self.bus.stream_for(event_type) for event_type in event_types]
+        if not self.streams:
+            raise ValueError("EventConsumer needs at least one event type")
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self._claim_cursors = {stream: '0-0' for stream in self.streams}
+        self._claimed_at = 0.0
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """Цикл чтения событий до установки stop"""
+        logger.info(f"Event consumer {self.name} started in group {self.group}: {', '.join(self.streams)}")
+        groups_ready = False
+        while stop is None or not stop.is_set():
+            try:
+                if not groups_ready:
+                    for stream in self.streams:
+                        self.bus.ensure_group(stream, self.group)
+                    groups_ready = True
+                self.poll()
+            except redis.RedisError as e:
+                logger.error(f"Event consumer {self.name}: Redis error: {e}")
+                time.sleep(1)
+
+    def poll(self) -> int:
+        """Одна итерация: забрать зависшие события, прочитать новые; возвращает число обработанных"""
+        processed = 0
+        if time.monotonic() - self._claimed_at >= self.config['CLAIM_INTERVAL']:
+            self._claimed_at = time.monotonic()
+            for stream in self.streams:
+                processed += self.process_entries(stream, self.claim(stream))
+
+        response = self.bus.raw_redis.xreadgroup(
+            self.group, self.name, {stream: '>' for stream in self.streams},
+            count=self.config['BATCH_SIZE'], block=self.config['BLOCK_MS']
+        )
+        for stream, entries in response or []:
+            processed += self.process_entries(stream.decode(), decode_entries(entries))
+        return processed
+
+    def claim(self, stream: str) -> List[Tuple[str, Dict]]:
+        """Перехват событий потока, которые потребители группы не подтвердили за CLAIM_IDLE_MS"""
+        result = self.bus.raw_redis.xautoclaim(
+            stream, self.group, self.name,
+            min_idle_time=self.config['CLAIM_IDLE_MS'], start_id=self._claim_cursors[stream],
+            count=self.config['BATCH_SIZE']
+        )
+        self._claim_cursors[stream], entries = result[0].decode(), decode_entries(result[1])
+        if entries:
+            logger.warning(f"Event consumer {self.name} reclaimed {len(entries)} pending events from {stream}")
+        return [entry for entry in entries if not self.dead_letter_if_exhausted(stream, entry)]
+
+    def dead_letter_if_exhausted(self, stream: str, entry: Tuple[str, Dict]) -> bool:
+        entry_id, fields = entry
+        pending = self.bus.redis.xpending_range(stream, self.group, min=entry_id, max=entry_id, count=1)
+        deliveries = pending[0].get('times_delivered', 0) if pending else 0
+        if deliveries < self.config['MAX_DELIVERIES']:
+            return False
+
+        dead_stream = f"{self.config['STREAM']}:dead"
+        logger.error(f"Event {stream} {entry_id} failed {deliveries} times, moving to {dead_stream}")
+        pipe = self.bus.redis.pipeline()
+        pipe.xadd(dead_stream, dict(fields or {}, stream=stream, id=entry_id, group=self.group),
+                  maxlen=self.config['MAXLEN'], approximate=True)
+        pipe.xack(stream, self.group, entry_id)
+        pipe.execute()
+        return True
+
+    def process_entries(self, stream: str, entries: List[Tuple[str, Dict]]) -> int:
+        processed = 0
+        for entry_id, fields in entries:
+            if fields is None:
+                # Запись удалена обрезкой потока, пока была в обработке
+                self.bus.redis.xack(stream, self.group, entry_id)
+                continue
+            if self.process(stream, entry_id, fields):
+                processed += 1
+        return processed
+
+    def process(self, stream: str, entry_id: str, fields: Dict) -> bool:
+        """Обработка одного события; подтверждается только успешная"""
+        event = self.decode(stream, entry_id, fields)
+        if event is None:
+            return False
+        return self.handle(stream, entry_id, event)
+
+    def decode(self, stream: str, entry_id: str, fields: Dict) -> Optional[Dict]:
+        """Конверт события из записи потока; битая запись подтверждается и пропускается
+
+        Запись кодека, недоступного здесь (нет msgpack), не подтверждается:
+        ее обработает другой потребитель или она уйдет в <STREAM>:dead.
+        """
+        try:
+            codec = decoder_for(fields.get('codec'))
+        except CodecError as e:
+            logger.error(f"Cannot decode event {stream} {entry_id}: {e}")
+            return None
+        try:
+            return codec.decode(fields['event'])
+        except (KeyError, CodecError) as e:
+            logger.error(f"Malformed event {stream} {entry_id}: {e}")
+            self.bus.redis.xack(stream, self.group, entry_id)
+            return None
+
+    def handle(self, stream: str, entry_id: str, event: Dict) -> bool:
+        try:
+            # Спан обработки - продолжение трассы, в которой событие опубликовано
+            with tracer.span(f"consume {event.get('type')}", 'consumer',
+                             parse_traceparent(event.get('traceparent')),
+                             attributes={'event.id': event.get('id'), 'consumer.group': self.group}):
+                self.handler(event)
+        except Exception as e:
+            logger.error(f"Error processing event {stream} {entry_id}: {e}")
+            return False
+
+        self.bus.redis.xack(stream, self.group, entry_id)
+        return True
+
+
+class EventHandlers:
+    """Реестр обработчиков событий сервиса по типу события
+
+    Обработчик получает data события. key - поле data, по которому
+    сохраняется порядок: события с одним значением ключа обрабатываются
+    последовательно (PooledEventConsumer).
+
+    Обработка идемпотентна: id события записывается в журнал ProcessedEvent
+    в одной транзакции с изменениями обработчика в БД, повторная доставка
+    пропускается. Побочные эффекты вне БД сервиса (HTTP вызовы) журнал не
+    защищает.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+
+    def on(self, event_type: str, key: Optional[str] = None, versions: Iterable[int] = (1,)):
+        """Декоратор регистрации обработчика событий event_type версий схемы versions"""
+        def decorator(func):
+            self._handlers[event_type] = (func, key, tuple(versions))
+            return func
+        return decorator
+
+    @property
+    def event_types(self) -> List[str]:
+        return list(self._handlers)
+
+    def key_for(self, event: Dict) -> str:
+        """Ключ порядка события (без ключа - id события, то есть без ограничений порядка)"""
+        _, key, _ = self._handlers.get(event.get('type'), (None, None, None))
+        value = (event.get('data') or {}).get(key) if key else None
+        return str(value if value is not None else event.get('id'))
+
+    def __call__(self, event: Dict):
+        event_type = event.get('type')
+        func, _, versions = self._handlers.get(event_type, (None, None, None))
+        if func is None:
+            logger.warning(f"No handler for event {event_type}")
+            return
+        version = event.get('version', 1)
+        if version not in versions:
+            # Событие остается неподтвержденным до обновления обработчика (или уходит в <STREAM>:dead)
+            raise ValueError(f"Unsupported {event_type} schema version {version}, supported: {versions}")
+        if not event.get('id'):
+            func(event.get('data') or {})
+            return
+
+        from .models import ProcessedEvent
+
+        # Отметка в журнале и изменения обработчика фиксируются вместе
+        with transaction.atomic():
+            if not ProcessedEvent.record(event['id'], event_type):
+                logger.info(f"Skipping duplicate event {event_type} {event['id']}")
+                return
+            func(event.get('data') or {})
+
+    def purge(self, ttl_hours: float) -> int:
+        """Удаление из журнала обработанных событий старше ttl_hours"""
+        from .models import ProcessedEvent
+
+        border = datetime.now(timezone.utc) - timedelta(hours=ttl_hours)
+        try:
+            deleted, _ = ProcessedEvent.objects.filter(processed_at__lt=border).delete()
+        except DatabaseError as e:
+            logger.error(f"Failed to purge processed events: {e}")
+            return 0
+        if deleted:
+            logger.info(f"Purged {deleted} processed events older than {ttl_hours}h")
+        return deleted
+
+
+class PooledEventConsumer(EventConsumer):
+    """Потребитель с пулом потоков-обработчиков
+
+    Читатель забирает события из потоков и раздает их WORKERS потокам по
+    ключу события: события одного ключа идут в один поток и обрабатываются
+    по порядку, разные ключи - параллельно. Очередь потока ограничена
+    MAX_IN_FLIGHT / WORKERS событиями; когда она полна, чтение останавливается
+    (backpressure). При остановке читатель перестает читать, а потоки
+    дорабатывают очереди не дольше DRAIN_TIMEOUT; неподтвержденные события
+    остаются в pending группы и будут перехвачены.
+
+    Порядок по ключу гарантирован внутри одного потребителя: экземпляры,
+    запущенные параллельно в одной группе, делят события без учета ключа.
+    """
+
+    def __init__(self, handlers: EventHandlers, workers: Optional[int] = None,
+                 group: Optional[str] = None, name: Optional[str] = None, bus: Optional[EventBus] = None):
+        super().__init__(handlers, handlers.event_types, group, name, bus)
+        self.handlers = handlers
+        self.workers = workers or self.config['WORKERS']
+        size = max(1, self.config['MAX_IN_FLIGHT'] // self.workers)
+        self.queues = [queue.Queue(maxsize=size) for _ in range(self.workers)]
+        self._in_flight = set()
+        self._draining = threading.Event()
+        self._purged_at = 0.0
+
+    def process(self, stream: str, entry_id: str, fields: Dict) -> bool:
+        if entry_id in self._in_flight:
+            # Долго ждущее в очереди событие перехвачено этим же потребителем
+            return False
+        event = self.decode(stream, entry_id, fields)
+        if event is None:
+            return False
+        key = self.handlers.key_for(event)
+        self._in_flight.add(entry_id)
+        # Блокируется, пока в очереди потока нет места
+        self.queues[zlib.crc32(key.encode()) % self.workers].put((stream, entry_id, event))
+        return True
+
+    def poll(self) -> int:
+        if time.monotonic() - self._purged_at >= self.config['DEDUPE_PURGE_INTERVAL']:
+            self._purged_at = time.monotonic()
+            self.handlers.purge(self.config['DEDUPE_TTL_HOURS'])
+        return super().poll()
+
+    def run(self, stop: Optional[threading.Event] = None):
+        threads = [
+            threading.Thread(target=self._work, args=(worker_queue,), name=f"event-worker-{index}", daemon=True)
+            for index, worker_queue in enumerate(self.queues)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            super().run(stop)
+        finally:
+            self.drain(threads)
+
+    def _work(self, worker_queue: queue.Queue):
+        while not (self._draining.is_set() and worker_queue.empty()):
+            try:
+                stream, entry_id, event = worker_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self.handle(stream, entry_id, event)
+            finally:
+                self._in_flight.discard(entry_id)
+                close_old_connections()
+
+    def drain(self, threads: List[threading.Thread]):
+        """Завершение: потоки дорабатывают очереди не дольше DRAIN_TIMEOUT"""
+        in_flight = sum(worker_queue.qsize() for worker_queue in self.queues)
+        logger.info(f"Event consumer {self.name} draining {in_flight} queued events")
+        self._draining.set()
+        deadline = time.monotonic() + self.config['DRAIN_TIMEOUT']
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        left = sum(worker_queue.qsize() for worker_queue in self.queues)
+        if left or any(thread.is_alive() for thread in threads):
+            logger.warning(f"Event consumer {self.name} stopped with {left} queued events left pending")
+        else:
+            logger.info(f"Event consumer {self.name} drained")
+
+
+event_bus = EventBus()
@@ -0,0 +1,274 @@
+import asyncio
+import itertools
+import logging
+import random
+import time
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .codecs import accept_header, codec_for_content_type, get_codec, json_codec
+from .deadline import get_timeout
+from .metrics import service_call
+
+logger = logging.getLogger(__name__)
+
+# Адреса сервисов по умолчанию; settings.SERVICE_CLIENTS[<сервис>]['base_url'] переопределяет их
+DEFAULT_BASE_URLS = {
+    'user-service': 'http://localhost:8004',
+    'product-service': 'http://localhost:8001',
+    'cart-service': 'http://localhost:8002',
+    'order-service': 'http://localhost:8003',
+}
+
+DEFAULT_CLIENT_SETTINGS = {
+    'base_url': None,
+    'pool_maxsize': 10,
+    'connect_timeout': 2.0,
+    'read_timeout': 10.0,
+    'max_attempts': 2,
+    'backoff': 0.05,
+    'retry_methods': ['GET', 'HEAD', 'OPTIONS'],
+    'retry_on_status': [502, 503, 504],
+    'codec': 'json',
+}
+
+
+def get_client_settings(service_name: str) -> Dict:
+    """Настройки клиента сервиса: значения по умолчанию + 'default' + ключ сервиса в SERVICE_CLIENTS"""
+    from django.conf import settings
+
+    config = dict(DEFAULT_CLIENT_SETTINGS, base_url=DEFAULT_BASE_URLS.get(service_name))
+    configured = getattr(settings, 'SERVICE_CLIENTS', {})
+    config.update(configured.get('default', {}))
+    config.update(configured.get(service_name, {}))
+    if not config['base_url']:
+        raise ValueError(f"No base_url configured for {service_name}")
+    return config
+
+
+def response_data(response):
+    """Тело ответа сервиса по его Content-Type (msgpack или JSON); ошибка формата - ValueError"""
+    codec = codec_for_content_type(response.headers.get('Content-Type'))
+    if codec is None or codec is json_codec:
+        return response.json()
+    return codec.decode(response.content)
+
+
+class ServiceCallError(Exception):
+    """Сервис недоступен: ошибка соединения или таймаут после всех попыток"""
+
+    def __init__(self, service_name: str, operation: str, error: Exception):
+        super().__init__(f"{service_name} {operation} failed: {error}")
+        self.service_name = service_name
+        self.operation = operation
+        self.error = error
+
+
+class BaseServiceClient:
+    """Общая часть синхронного и асинхронного клиентов сервиса
+
+    Значение base_url - адрес сервиса или список адресов его экземпляров,
+    между которыми запросы распределяются по очереди.
+    """
+
+    def __init__(self, service_name: str, config: Dict):
+        self.service_name = service_name
+        self.config = config
+        base_url = config['base_url']
+        self.urls: List[str] = [base_url] if isinstance(base_url, str) else list(base_url)
+        self._counter = itertools.count()
+
+    def base_url(self) -> str:
+        if len(self.urls) == 1:
+            return self.urls[0]
+        return self.urls[next(self._counter) % len(self.urls)]
+
+    def max_attempts(self, method: str, retry: Optional[bool]) -> int:
+        """Повторяются только идемпотентные вызовы (retry=True - явно разрешить, False - запретить)"""
+        if retry is None:
+            retry = method in self.config['retry_methods']
+        return self.config['max_attempts'] if retry else 1
+
+    def timeouts(self, timeout: Optional[float]):
+        """(connect, read) таймауты попытки, не дольше оставшегося срока запроса"""
+        read = get_timeout(timeout or self.config['read_timeout'])
+        return min(self.config['connect_timeout'], read), read
+
+    def backoff(self, attempt: int) -> float:
+        # Экспоненциальная задержка с полным jitter
+        return random.uniform(0, self.config['backoff'] * 2 ** (attempt - 1))
+
+    def encode_body(self, data, headers: Optional[Dict]) -> Tuple[Optional[bytes], Dict]:
+        """Тело запроса в кодеке клиента ('codec') и заголовки: Accept - этот кодек с JSON как запасным"""
+        headers = dict(headers or {})
+        headers.setdefault('Accept', accept_header(self.config['codec']))
+        if data is None:
+            return None, headers
+        codec = get_codec(self.config['codec'])
+        headers.setdefault('Content-Type', codec.content_type)
+        return codec.encode(data), headers
+
+
+class ServiceClient(BaseServiceClient):
+    """Синхронный клиент сервиса с пулом keep-alive соединений
+
+    Каждый вызов замеряется и трассируется (service_call), получает
+    traceparent и X-Request-Deadline, а его таймаут ограничен оставшимся
+    сроком запроса. Ошибка соединения после всех попыток -
+    ServiceCallError; ответ с любым статусом возвращается вызывающему коду.
+    Тело json= кодируется кодеком 'codec' настроек, а формат ответа
+    согласуется через Accept - тело ответа читает response_data().
+
+        response = get_client('product-service').get(
+            f"/api/products/{product_id}/", operation='get_product')
+        product = response_data(response)
+    """
+
+    def __init__(self, service_name: str, config: Dict):
+        super().__init__(service_name, config)
+        self.session = requests.Session()
+        # Сессия общая для всех запросов процесса, поэтому cookies ответов не сохраняем
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=len(self.urls), pool_maxsize=config['pool_maxsize'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, path: str, operation: Optional[str] = None, *,
+                params: Optional[Dict] = None, json=None, headers: Optional[Dict] = None,
+                timeout: Optional[float] = None, retry: Optional[bool] = None) -> requests.Response:
+        operation = operation or method.lower()
+        max_attempts = self.max_attempts(method, retry)
+        body, headers = self.encode_body(json, headers)
+        with service_call(self.service_name, operation) as call:
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    response = self.session.request(
+                        method, f"{self.base_url()}{path}", params=params, data=body,
+                        headers=call.headers(headers), timeout=self.timeouts(timeout)
+                    )
+                except requests.exceptions.RequestException as e:
+                    if attempt >= max_attempts:
+                        raise ServiceCallError(self.service_name, operation, e) from e
+                    logger.warning(f"Retrying {self.service_name} {operation} after error: {e}")
+                else:
+                    call.status = response.status_code
+                    if response.status_code not in self.config['retry_on_status'] or attempt >= max_attempts:
+                        return response
+                    logger.warning(f"Retrying {self.service_name} {operation} after status {response.status_code}")
+                call.span.set_attribute('retries', attempt)
+                time.sleep(self.backoff(attempt))
+
+    def get(self, path: str, operation: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request('GET', path, operation, **kwargs)
+
+    def post(self, path: str, operation: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request('POST', path, operation, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncServiceClient(BaseServiceClient):
+    """Асинхронный клиент сервиса (httpx) с тем же поведением, что и ServiceClient
+
+    httpx.AsyncClient привязан к event loop, поэтому пул соединений
+    создается отдельно для каждого loop.
+    """
+
+    def __init__(self, service_name: str, config: Dict):
+        super().__init__(service_name, config)
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get_http_client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(max_connections=self.config['pool_maxsize'],
+                                  max_keepalive_connections=self.config['pool_maxsize'])
+            client = self._clients[loop] = httpx.AsyncClient(limits=limits)
+        return client
+
+    async def request(self, method: str, path: str, operation: Optional[str] = None, *,
+                      params: Optional[Dict] = None, json=None, headers: Optional[Dict] = None,
+                      timeout: Optional[float] = None, retry: Optional[bool] = None):
+        import httpx
+
+        client = self.get_http_client()
+        operation = operation or method.lower()
+        max_attempts = self.max_attempts(method, retry)
+        body, headers = self.encode_body(json, headers)
+        with service_call(self.service_name, operation) as call:
+            attempt = 0
+            while True:
+                attempt += 1
+                connect, read = self.timeouts(timeout)
+                try:
+                    response = await client.request(
+                        method, f"{self.base_url()}{path}", params=params, content=body,
+                        headers=call.headers(headers),
+                        timeout=httpx.Timeout(read, connect=connect)
+                    )
+                except httpx.TransportError as e:
+                    if attempt >= max_attempts:
+                        raise ServiceCallError(self.service_name, operation, e) from e
+                    logger.warning(f"Retrying {self.service_name} {operation} after error: {e}")
+                else:
+                    call.status = response.status_code
+                    if response.status_code not in self.config['retry_on_status'] or attempt >= max_attempts:
+                        return response
+                    logger.warning(f"Retrying {self.service_name} {operation} after status {response.status_code}")
+                call.span.set_attribute('retries', attempt)
+                await asyncio.sleep(self.backoff(attempt))
+
+    async def get(self, path: str, operation: Optional[str] = None, **kwargs):
+        return await self.request('GET', path, operation, **kwargs)
+
+    async def post(self, path: str, operation: Optional[str] = None, **kwargs):
+        return await self.request('POST', path, operation, **kwargs)
+
+    async def aclose(self):
+        """Закрытие пула текущего event loop"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class ServiceClients:
+    """Клиенты сервисов процесса: по одному синхронному и асинхронному на сервис"""
+
+    def __init__(self):
+        self._clients = {}
+        self._async_clients = {}
+
+    def get(self, service_name: str) -> ServiceClient:
+        client = self._clients.get(service_name)
+        if client is None:
+            client = self._clients.setdefault(
+                service_name, ServiceClient(service_name, get_client_settings(service_name)))
+        return client
+
+    def get_async(self, service_name: str) -> AsyncServiceClient:
+        client = self._async_clients.get(service_name)
+        if client is None:
+            client = self._async_clients.setdefault(
+                service_name, AsyncServiceClient(service_name, get_client_settings(service_name)))
+        return client
+
+
+service_clients = ServiceClients()
+
+
+def get_client(service_name: str) -> ServiceClient:
+    return service_clients.get(service_name)
+
+
+def get_async_client(service_name: str) -> AsyncServiceClient:
+    return service_clients.get_async(service_name)
@@ -0,0 +1,58 @@
+import hashlib
+import hmac
+import time
+from typing import Dict, Optional
+
+# Заголовки идентичности, которые gateway добавляет после проверки JWT
+USER_ID_HEADER = 'X-User-Id'
+USER_EMAIL_HEADER = 'X-User-Email'
+TIMESTAMP_HEADER = 'X-Identity-Timestamp'
+SIGNATURE_HEADER = 'X-Identity-Signature'
+
+IDENTITY_HEADERS = [USER_ID_HEADER, USER_EMAIL_HEADER, TIMESTAMP_HEADER, SIGNATURE_HEADER]
+
+
+def sign_identity(secret: str, user_id, email: str, timestamp: int) -> str:
+    """HMAC-SHA256 подпись идентичности пользователя"""
+    message = f"{user_id}:{email}:{timestamp}".encode('utf-8')
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def build_identity_headers(secret: str, user_id, email: str) -> Dict[str, str]:
+    """Подписанные заголовки для передачи идентичности в сервисы"""
+    timestamp = int(time.time())
+    return {
+        USER_ID_HEADER: str(user_id),
+        USER_EMAIL_HEADER: email or '',
+        TIMESTAMP_HEADER: str(timestamp),
+        SIGNATURE_HEADER: sign_identity(secret, user_id, email or '', timestamp),
+    }
+
+
+def verify_identity_headers(secret: str, headers, max_age: int = 300) -> Optional[Dict]:
+    """Проверка подписанных заголовков, возвращает {'id', 'email'} или None"""
+    user_id = headers.get(USER_ID_HEADER)
+    signature = headers.get(SIGNATURE_HEADER)
+    if not user_id or not signature:
+        return None
+
+    email = headers.get(USER_EMAIL_HEADER, '')
+    try:
+        timestamp = int(headers.get(TIMESTAMP_HEADER, ''))
+        user_id = int(user_id)
+    except ValueError:
+        return None
+
+    if abs(time.time() - timestamp) > max_age:
+        return None
+
+    expected = sign_identity(secret, user_id, email, timestamp)
+    if not hmac.compare_digest(expected, signature):
+        return None
+
+    return {'id': user_id, 'email': email}
+
+
+def forward_identity_headers(headers) -> Dict[str, str]:
+    """Копия подписанных заголовков для передачи в следующий сервис"""
+    return {name: headers[name] for name in IDENTITY_HEADERS if headers.get(name)}
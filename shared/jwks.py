@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import jwt
+
+from .http_client import ServiceCallError, get_async_client, get_client, response_data
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JWT_AUTH_SETTINGS = {
+    'JWKS_SERVICE': 'user-service',
+    'JWKS_PATH': '/.well-known/jwks.json',
+    'ALGORITHMS': ['RS256'],
+    'KEYS_TTL': 300.0,
+    'MIN_REFRESH_INTERVAL': 10.0,
+    'LEEWAY': 0,
+}
+
+
+class JWKSVerifier:
+    """Локальная проверка access токенов user-service по открытым ключам из JWKS
+
+    Ключи загружаются с JWKS_SERVICE и кэшируются по kid. Токен с
+    неизвестным kid (ротация ключа в user-service) и устаревший кэш
+    (KEYS_TTL, ключ мог быть отозван) приводят к повторной загрузке, но не
+    чаще раза в MIN_REFRESH_INTERVAL: поток токенов с выдуманным kid не
+    превращается в поток запросов к user-service. При ошибке загрузки
+    остаются прежние ключи.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._loaded_at = 0.0
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> Dict:
+        from django.conf import settings
+
+        config = dict(DEFAULT_JWT_AUTH_SETTINGS)
+        config.update(getattr(settings, 'JWT_AUTH', {}))
+        return config
+
+    def claim_refresh(self, kid: str) -> bool:
+        """Нужна ли загрузка ключей для kid; True - вызывающий загружает их сам"""
+        now = time.monotonic()
+        config = self.config
+        if kid in self._keys and now - self._loaded_at < config['KEYS_TTL']:
+            return False
+        with self._lock:
+            if self._attempted_at is not None and now - self._attempted_at < config['MIN_REFRESH_INTERVAL']:
+                return False
+            self._attempted_at = now
+        return True
+
+    def load(self, response):
+        """Замена кэша ключами из ответа JWKS_SERVICE"""
+        if response.status_code != 200:
+            raise ValueError(f"JWKS request failed with status {response.status_code}")
+        keys = {key.key_id: key for key in jwt.PyJWKSet.from_dict(response_data(response)).keys if key.key_id}
+        if not keys:
+            raise ValueError('JWKS has no keys with kid')
+        self._keys = keys
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded JWKS keys: {', '.join(keys)}")
+
+    def refresh(self):
+        config = self.config
+        try:
+            self.load(get_client(config['JWKS_SERVICE']).get(config['JWKS_PATH'], operation='jwks'))
+        except (ServiceCallError, ValueError, jwt.PyJWKSetError) as e:
+            logger.error(f"Failed to load JWKS from {config['JWKS_SERVICE']}: {e}")
+
+    async def arefresh(self):
+        config = self.config
+        try:
+            self.load(await get_async_client(config['JWKS_SERVICE']).get(config['JWKS_PATH'], operation='jwks'))
+        except (ServiceCallError, ValueError, jwt.PyJWKSetError) as e:
+            logger.error(f"Failed to load JWKS from {config['JWKS_SERVICE']}: {e}")
+
+    def verify(self, token: str) -> Optional[Dict]:
+        """Claims действительного access токена или None"""
+        kid = token_key_id(token)
+        if kid and self.claim_refresh(kid):
+            self.refresh()
+        return self.decode(token, kid)
+
+    async def averify(self, token: str) -> Optional[Dict]:
+        """verify для event loop: ключи загружаются асинхронным клиентом"""
+        kid = token_key_id(token)
+        if kid and self.claim_refresh(kid):
+            await self.arefresh()
+        return self.decode(token, kid)
+
+    def decode(self, token: str, kid: Optional[str]) -> Optional[Dict]:
+        """Проверка подписи и срока действия токена ключом из кэша, без загрузки ключей"""
+        key = self._keys.get(kid)
+        if key is None:
+            logger.debug(f"Rejected access token: unknown key {kid!r}")
+            return None
+
+        config = self.config
+        try:
+            claims = jwt.decode(
+                token,
+                key.key,
+                algorithms=config['ALGORITHMS'],
+                leeway=config['LEEWAY'],
+                options={'require': ['exp', 'user_id']},
+            )
+        except jwt.InvalidTokenError as e:
+            logger.debug(f"Rejected access token: {e}")
+            return None
+
+        if claims.get('token_type', 'access') != 'access':
+            return None
+        return claims
+
+
+def token_key_id(token: str) -> Optional[str]:
+    """kid из заголовка токена (без проверки подписи); None - токен не разбирается или без kid"""
+    try:
+        return jwt.get_unverified_header(token).get('kid')
+    except jwt.InvalidTokenError:
+        return None
+
+
+jwks_verifier = JWKSVerifier()
+
+
+def verify_access_token(token: str) -> Optional[Dict]:
+    return jwks_verifier.verify(token)
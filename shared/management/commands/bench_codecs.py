@@ -0,0 +1,87 @@
+import json
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from shared.codecs import CODECS
+
+
+def order_created_event():
+    """Конверт order.created с тремя позициями"""
+    return {
+        'id': '5f0c4a8e2b7d4c1e9a3f6b2d8e1c7a90',
+        'type': 'order.created',
+        'version': 1,
+        'data': {
+            'order_id': 1042,
+            'user_id': 17,
+            'total_amount': Decimal('2389.97'),
+            'items': [
+                {'product_id': 3, 'quantity': 1, 'product_name': 'Laptop Pro 14', 'price': Decimal('1999.99')},
+                {'product_id': 8, 'quantity': 2, 'product_name': 'USB-C Hub', 'price': Decimal('49.99')},
+                {'product_id': 11, 'quantity': 1, 'product_name': 'Wireless Mouse', 'price': Decimal('289.99')},
+            ],
+            'customer_info': {'email': 'user@example.com', 'phone': '+7 900 000-00-00'},
+        },
+        'timestamp': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        'traceparent': '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01',
+    }
+
+
+def product_page():
+    """Страница каталога: 20 товаров в виде ответа сериализатора"""
+    return {
+        'count': 240,
+        'next': 'http://localhost:8001/api/products/?page=2',
+        'previous': None,
+        'results': [
+            {
+                'id': index,
+                'name': f"Product {index}",
+                'slug': f"product-{index}",
+                'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.',
+                'price': f"{index * 10 + 0.99:.2f}",
+                'stock_quantity': index * 3,
+                'is_available': True,
+                'category': {'id': index % 5, 'name': f"Category {index % 5}", 'slug': f"category-{index % 5}"},
+                'created_at': '2024-05-01T12:30:00Z',
+            }
+            for index in range(1, 21)
+        ],
+    }
+
+
+SAMPLES = [
+    ('event order.created', order_created_event),
+    ('product list page', product_page),
+]
+
+
+class Command(BaseCommand):
+    help = 'Размер и скорость кодирования событий и ответов сервисов: JSON (прежний путь) против кодеков shared/codecs.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        codecs = [('json default=str (legacy)', lambda obj: json.dumps(obj, default=str).encode(), json.loads)]
+        for name, codec in CODECS.items():
+            if getattr(codec, 'available', True):
+                codecs.append((name, codec.encode, codec.decode))
+            else:
+                self.stdout.write(f"{name}: not available, skipped")
+
+        for sample_name, factory in SAMPLES:
+            payload = factory()
+            self.stdout.write(f"\n{sample_name}, {iterations} iterations")
+            for name, encode, decode in codecs:
+                data = encode(payload)
+                encode_us = min(timeit.repeat(lambda: encode(payload), number=iterations, repeat=3)) / iterations * 1e6
+                decode_us = min(timeit.repeat(lambda: decode(data), number=iterations, repeat=3)) / iterations * 1e6
+                self.stdout.write(
+                    f"{name:28} {len(data):6} bytes  encode {encode_us:7.2f} us  decode {decode_us:7.2f} us"
+                )
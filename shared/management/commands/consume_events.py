@@ -0,0 +1,40 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from shared.events import PooledEventConsumer, event_bus
+
+
+class Command(BaseCommand):
+    help = ('Обработка событий сервиса: обработчики EVENT_BUS[\'HANDLERS\'], '
+            'пул потоков с порядком по ключу события; SIGTERM/SIGINT - остановка с дообработкой очередей')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="число потоков-обработчиков (по умолчанию EVENT_BUS['WORKERS'])")
+        parser.add_argument('--group', help="группа потребителей (по умолчанию EVENT_BUS['GROUP'])")
+
+    def handle(self, *args, **options):
+        path = event_bus.config['HANDLERS']
+        if not path:
+            raise CommandError("EVENT_BUS['HANDLERS'] is not set: nothing to consume")
+        handlers = import_string(path)
+        if not handlers.event_types:
+            raise CommandError(f"{path} has no registered handlers")
+
+        consumer = PooledEventConsumer(handlers, options['workers'], options['group'])
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write(f"Stopping event consumer {consumer.name}...")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(
+            f"Consuming {', '.join(handlers.event_types)} in group {consumer.group} "
+            f"with {consumer.workers} workers"
+        )
+        consumer.run(stop)
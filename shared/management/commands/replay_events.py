@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+
+import redis
+from django.core.management.base import BaseCommand, CommandError
+
+from shared.events import event_bus
+
+MAX_SEQUENCE = 2 ** 64 - 1
+
+
+def parse_offset(value: str) -> str:
+    """Id записи потока, с которой начинается повтор: id ('0', '1700000000000-0') или время ISO 8601"""
+    if value == '0':
+        return '0-0'
+    ms, _, seq = value.partition('-')
+    if ms.isdigit() and (not seq or seq.isdigit()):
+        return f"{ms}-{seq or 0}"
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Bad offset {value!r}: expected stream id or ISO 8601 time")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return f"{int(moment.timestamp() * 1000)}-0"
+
+
+def previous_id(entry_id: str) -> str:
+    """Id непосредственно перед entry_id: группа получит entry_id первым"""
+    ms, seq = (int(part) for part in entry_id.split('-'))
+    if seq > 0:
+        return f"{ms}-{seq - 1}"
+    if ms > 0:
+        return f"{ms - 1}-{MAX_SEQUENCE}"
+    return '0-0'
+
+
+class Command(BaseCommand):
+    help = ('Повтор событий для группы потребителей с заданного смещения '
+            '(обработчики должны быть идемпотентны: группа получит события повторно)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('offset', help="id записи ('0' - с начала потока) или время ISO 8601")
+        parser.add_argument('--group', help="группа потребителей (по умолчанию EVENT_BUS['GROUP'])")
+        parser.add_argument('--type', action='append', dest='event_types',
+                            help='тип события (можно несколько; по умолчанию все потоки, которые читает группа)')
+        parser.add_argument('--dry-run', action='store_true', help='только посчитать события для повтора')
+
+    def handle(self, *args, **options):
+        group = options['group'] or event_bus.config['GROUP']
+        if not group:
+            raise CommandError("Consumer group is not set: pass --group or EVENT_BUS['GROUP']")
+
+        if options['event_types']:
+            streams = [event_bus.stream_for(event_type) for event_type in options['event_types']]
+        else:
+            streams = [stream for stream in event_bus.event_streams() if self.has_group(stream, group)]
+        if not streams:
+            raise CommandError(f"Group {group} does not read any event stream: pass --type")
+
+        start = parse_offset(options['offset'])
+        last_delivered = previous_id(start)
+        for stream in streams:
+            count, first, last = self.count_entries(stream, start)
+            self.stdout.write(f"{stream}: {count} events from {first or start} to {last or start} for group {group}")
+            if options['dry_run'] or not count:
+                continue
+
+            try:
+                event_bus.redis.xgroup_setid(stream, group, last_delivered)
+            except redis.ResponseError as e:
+                if 'NOGROUP' not in str(e):
+                    raise
+                event_bus.redis.xgroup_create(stream, group, id=last_delivered, mkstream=True)
+            self.stdout.write(self.style.SUCCESS(f"Group {group} will receive {stream} events after {last_delivered}"))
+
+    def has_group(self, stream: str, group: str) -> bool:
+        return any(info['name'] == group for info in event_bus.redis.xinfo_groups(stream))
+
+    def count_entries(self, stream: str, start: str):
+        count, first, last = 0, None, None
+        cursor = start
+        while True:
+            # Тело события может быть двоичным (msgpack): нужны только id
+            entries = event_bus.raw_redis.xrange(stream, min=cursor, max='+', count=1000)
+            if not entries:
+                break
+            first = first or entries[0][0].decode()
+            last = entries[-1][0].decode()
+            count += len(entries)
+            cursor = f"({last}"
+        return count, first, last
@@ -0,0 +1,330 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Sequence, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+from .deadline import deadline_headers
+from .tracing import TRACEPARENT_HEADER, tracer
+
+# Границы корзин гистограмм задержки, секунд
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Число шардов значений метрики
+SHARDS = 16
+
+
+class Metric:
+    """Базовый класс метрики со значениями, разбитыми на SHARDS шардов
+
+    Поток пишет в шард по своему id под блокировкой шарда, так что потоки
+    редко ждут друг друга, а число шардов не растет с числом потоков (сервер
+    разработки и WSGI создают поток на соединение). Шарды суммируются при
+    чтении (/metrics). Ключ значений - кортеж значений меток, передаваемый
+    позиционно, без создания словарей на каждый вызов.
+    """
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = [({}, threading.Lock()) for _ in range(SHARDS)]
+
+    def _shard(self) -> Tuple[Dict, threading.Lock]:
+        # native id (TID) распределяется по шардам равномерно, в отличие от get_ident (адрес)
+        return self._shards[threading.get_native_id() % SHARDS]
+
+    def _snapshot(self) -> Iterable[Tuple[Tuple, object]]:
+        """Значения всех шардов (списки копируются под блокировкой)"""
+        for values, lock in self._shards:
+            with lock:
+                items = [(key, list(value) if isinstance(value, list) else value)
+                         for key, value in values.items()]
+            yield from items
+
+    def collect(self) -> Iterable[Tuple[str, Tuple, float]]:
+        """Сэмплы метрики: (суффикс имени, пары меток, значение)"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.collect():
+            lines.append(f"{self.name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонный счетчик (имя по соглашению Prometheus оканчивается на _total)"""
+
+    type_name = 'counter'
+
+    def inc(self, *labelvalues, amount: float = 1):
+        values, lock = self._shard()
+        with lock:
+            values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for labelvalues, value in self._snapshot():
+            totals[labelvalues] = totals.get(labelvalues, 0) + value
+        for labelvalues, value in sorted(totals.items()):
+            yield '', tuple(zip(self.labelnames, labelvalues)), value
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными корзинами
+
+    В шарде хранятся некумулятивные счетчики корзин, сумма и количество в
+    одном списке; кумулятивные значения считаются только при чтении.
+    """
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        values, lock = self._shard()
+        with lock:
+            counts = values.get(labelvalues)
+            if counts is None:
+                # Корзины + бесконечность, затем сумма и количество
+                counts = values[labelvalues] = [0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def collect(self):
+        size = len(self.buckets) + 3
+        totals = {}
+        for labelvalues, counts in self._snapshot():
+            merged = totals.setdefault(labelvalues, [0] * size)
+            for index, value in enumerate(counts):
+                merged[index] += value
+
+        for labelvalues, counts in sorted(totals.items()):
+            labels = tuple(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', labels + (('le', format_value(bound)),), cumulative
+            yield '_sum', labels, counts[-2]
+            yield '_count', labels, counts[-1]
+
+
+class CallbackMetric(Metric):
+    """Метрика, значения которой считываются функцией в момент чтения /metrics
+
+    Подходит для состояния, которое приложение и так хранит (размер кэша,
+    состояние breaker). function возвращает список пар (кортеж значений
+    меток, значение).
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 function: Callable, type_name: str = 'gauge'):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self.type_name = type_name
+
+    def collect(self):
+        for labelvalues, value in self.function():
+            yield '', tuple(zip(self.labelnames, labelvalues)), value
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # Повторная регистрация (например, при повторном импорте) возвращает существующую метрику
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str],
+              function: Callable) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, function))
+
+    def counter_callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                         function: Callable) -> CallbackMetric:
+        """Счетчик, который приложение уже ведет само (например, попадания в кэш)"""
+        return self.register(CallbackMetric(name, documentation, labelnames, function, 'counter'))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+def format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{escape_label(value)}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+# Общие метрики HTTP, БД и межсервисных вызовов
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests handled', ('route', 'method', 'status'))
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request handling time', ('route', 'method'))
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    'db_queries_per_request', 'Database queries per request', ('route',),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+DB_TIME_PER_REQUEST = registry.histogram(
+    'db_time_per_request_seconds', 'Database time per request', ('route',))
+SERVICE_CALL_DURATION = registry.histogram(
+    'service_client_request_duration_seconds', 'Calls to other services', ('target', 'operation', 'status'))
+
+
+class ServiceCall:
+    """Межсервисный вызов: status для метрик задает вызывающий код, span - клиентский спан"""
+
+    __slots__ = ('status', 'span')
+
+    def __init__(self, span):
+        self.status = 'error'
+        self.span = span
+
+    def headers(self, headers: Dict = None) -> Dict:
+        """Заголовки запроса с traceparent клиентского спана и сроком текущего запроса"""
+        headers = deadline_headers(headers)
+        headers[TRACEPARENT_HEADER] = self.span.context.to_traceparent()
+        return headers
+
+
+@contextmanager
+def service_call(target: str, operation: str):
+    """Замер и трассировка межсервисного вызова
+
+        with service_call('product-service', 'get_product') as call:
+            response = requests.get(..., headers=call.headers())
+            call.status = response.status_code
+    """
+    started = time.perf_counter()
+    with tracer.span(f"{target} {operation}", 'client', attributes={'peer.service': target}) as span:
+        call = ServiceCall(span)
+        try:
+            yield call
+        finally:
+            span.set_attribute('http.status_code', call.status)
+            if call.status == 'error' or (isinstance(call.status, int) and call.status >= 500):
+                span.status = 'error'
+            SERVICE_CALL_DURATION.observe(time.perf_counter() - started, target, operation, str(call.status))
+
+
+class QueryStats:
+    """Количество и время SQL-запросов в рамках одного HTTP запроса"""
+
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def get_route_label(request) -> str:
+    """Метка маршрута: шаблон URL Django, а не фактический путь (ограниченная кардинальность)
+
+    Приложение может задать метку само через request.metrics_route.
+    """
+    route = getattr(request, 'metrics_route', None)
+    if route:
+        return route
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.route or match.view_name or 'unmatched'
+
+
+class MetricsMiddleware:
+    """Счетчики и гистограммы HTTP запросов и запросов к БД
+
+    Ставится первым в MIDDLEWARE. В синхронном режиме дополнительно считает
+    SQL-запросы через connection.execute_wrapper.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        from django.db import connection
+
+        queries = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        route = self.record(request, response, started)
+        DB_QUERIES_PER_REQUEST.observe(queries.count, route)
+        DB_TIME_PER_REQUEST.observe(queries.duration, route)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, started)
+        return response
+
+    def record(self, request, response, started) -> str:
+        route = get_route_label(request)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, route, request.method)
+        HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+        return route
+
+
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus"""
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
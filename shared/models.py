@@ -0,0 +1,27 @@
+from django.db import IntegrityError, models, transaction
+
+
+class ProcessedEvent(models.Model):
+    """Журнал обработанных событий для идемпотентной обработки
+
+    Запись создается в одной транзакции с изменениями обработчика: повторная
+    доставка того же события находит запись и пропускается, а откат
+    обработчика удаляет и запись. Записи старше EVENT_BUS['DEDUPE_TTL_HOURS']
+    удаляются - повтор более старых событий (replay_events) обработается заново.
+    """
+    event_id = models.UUIDField(primary_key=True)
+    event_type = models.CharField(max_length=100)
+    processed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id.hex}"
+
+    @classmethod
+    def record(cls, event_id: str, event_type: str) -> bool:
+        """Отметка события обработанным; False - событие уже обработано"""
+        try:
+            with transaction.atomic():
+                cls.objects.create(event_id=event_id, event_type=event_type)
+        except IntegrityError:
+            return False
+        return True
@@ -0,0 +1,328 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = 'traceparent'
+
+DEFAULT_TRACING_SETTINGS = {
+    'ENABLED': True,
+    'SERVICE_NAME': 'unknown-service',
+    'SAMPLE_RATE': 1.0,
+    # 'file' - JSON-строки в FILE, 'otlp' - POST пачками на OTLP_ENDPOINT, 'none' - не экспортировать
+    'EXPORTER': 'file',
+    # None - <временный каталог>/<SERVICE_NAME>-traces.jsonl, не в дереве исходников
+    'FILE': None,
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 1.0,
+    'QUEUE_SIZE': 10000,
+    'MAX_DB_SPANS': 50,
+}
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class SpanContext:
+    """Идентификаторы трассы и спана (W3C trace context)"""
+
+    __slots__ = ('trace_id', 'span_id', 'sampled')
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Разбор заголовка traceparent: 00-<trace-id>-<parent-id>-<flags>"""
+    if not value:
+        return None
+    parts = value.strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if version == 'ff' or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return SpanContext(trace_id, span_id, sampled)
+
+
+class Span:
+    """Интервал работы внутри трассы"""
+
+    __slots__ = ('name', 'kind', 'context', 'parent_id', 'start', 'end', 'attributes', 'status')
+
+    def __init__(self, name: str, kind: str, context: SpanContext, parent_id: Optional[str],
+                 attributes: Optional[Dict] = None, start: Optional[float] = None):
+        self.name = name
+        self.kind = kind
+        self.context = context
+        self.parent_id = parent_id
+        self.start = start if start is not None else time.time()
+        self.end = None
+        self.attributes = attributes or {}
+        self.status = 'ok'
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self, service_name: str) -> Dict:
+        return {
+            'service': service_name,
+            'trace_id': self.context.trace_id,
+            'span_id': self.context.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start': self.start,
+            'duration_ms': round((self.end - self.start) * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class SpanExporter:
+    """Фоновая пачечная выгрузка завершенных спанов
+
+    Спаны копятся в ограниченной очереди и выгружаются отдельным потоком
+    пачками по BATCH_SIZE или раз в FLUSH_INTERVAL; при переполнении
+    очереди спаны отбрасываются, не задерживая запрос.
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self.queue = queue.Queue(maxsize=config['QUEUE_SIZE'])
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.config['FLUSH_INTERVAL']
+            while len(batch) < self.config['BATCH_SIZE']:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List[Span]):
+        service_name = self.config['SERVICE_NAME']
+        records = [span.to_dict(service_name) for span in batch]
+        try:
+            if self.config['EXPORTER'] == 'otlp':
+                # Упрощенный OTLP/HTTP JSON: приемник-заглушка принимает тот же формат, что и файл
+                body = json.dumps({'service': service_name, 'spans': records}, default=str).encode('utf-8')
+                request = urllib.request.Request(self.config['OTLP_ENDPOINT'], data=body,
+                                                 headers={'Content-Type': 'application/json'})
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                path = self.config['FILE'] or os.path.join(tempfile.gettempdir(), f"{service_name}-traces.jsonl")
+                with open(path, 'a', encoding='utf-8') as output:
+                    for record in records:
+                        output.write(json.dumps(record, default=str) + '\n')
+        except Exception as e:
+            logger.warning(f"Failed to export {len(records)} spans: {e}")
+
+
+class Tracer:
+    """Создание спанов и распространение контекста трассы"""
+
+    def __init__(self):
+        self._config = None
+        self._exporter = None
+
+    @property
+    def config(self) -> Dict:
+        if self._config is None:
+            from django.conf import settings
+
+            config = dict(DEFAULT_TRACING_SETTINGS)
+            config.update(getattr(settings, 'TRACING', {}))
+            self._config = config
+        return self._config
+
+    @property
+    def exporter(self) -> Optional[SpanExporter]:
+        if self._exporter is None and self.config['EXPORTER'] != 'none':
+            self._exporter = SpanExporter(self.config)
+        return self._exporter
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, kind: str = 'internal', parent: Optional[SpanContext] = None,
+                   attributes: Optional[Dict] = None, start: Optional[float] = None) -> Span:
+        """Новый спан: дочерний для parent, текущего спана или корневой"""
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current else None
+
+        if parent is None:
+            context = SpanContext(new_id(128), new_id(64), random.random() < self.config['SAMPLE_RATE'])
+            return Span(name, kind, context, None, attributes, start)
+        return Span(name, kind, SpanContext(parent.trace_id, new_id(64), parent.sampled),
+                    parent.span_id, attributes, start)
+
+    def finish_span(self, span: Span, end: Optional[float] = None):
+        span.end = end if end is not None else time.time()
+        if span.context.sampled and self.config['ENABLED'] and self.exporter:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = 'internal', parent: Optional[SpanContext] = None,
+             attributes: Optional[Dict] = None):
+        """Спан на время блока; внутри блока он текущий"""
+        span = self.start_span(name, kind, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.set_attribute('error', repr(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish_span(span)
+
+    def inject(self, headers: Optional[Dict] = None) -> Dict:
+        """Заголовки исходящего запроса с traceparent текущего спана"""
+        headers = dict(headers or {})
+        span = _current_span.get()
+        if span is not None:
+            headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+        return headers
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.context.to_traceparent() if span else None
+
+
+def new_id(bits: int) -> str:
+    value = random.getrandbits(bits) or 1
+    return f'{value:0{bits // 4}x}'
+
+
+class DatabaseSpans:
+    """Спаны SQL-запросов внутри HTTP запроса (не больше MAX_DB_SPANS) и суммарное время"""
+
+    __slots__ = ('tracer', 'limit', 'count', 'duration')
+
+    def __init__(self, tracer: Tracer, limit: int):
+        self.tracer = tracer
+        self.limit = limit
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ended = time.time()
+            self.count += 1
+            self.duration += ended - started
+            if self.count <= self.limit:
+                span = self.tracer.start_span('db.query', 'client', start=started,
+                                              attributes={'db.statement': sql[:200]})
+                self.tracer.finish_span(span, ended)
+
+
+class TracingMiddleware:
+    """Серверный спан на каждый HTTP запрос
+
+    Контекст берется из входящего traceparent (или начинается новая
+    трасса), в синхронном режиме SQL-запросы записываются дочерними
+    спанами. Ставится первым в MIDDLEWARE.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        from django.db import connection
+
+        with tracer.span(f"{request.method} {request.path}", 'server',
+                         parse_traceparent(request.headers.get(TRACEPARENT_HEADER))) as span:
+            queries = DatabaseSpans(tracer, tracer.config['MAX_DB_SPANS'])
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+            span.set_attribute('db.query_count', queries.count)
+            span.set_attribute('db.time_ms', round(queries.duration * 1000, 3))
+            self.finish(request, response, span)
+        return response
+
+    async def __acall__(self, request):
+        with tracer.span(f"{request.method} {request.path}", 'server',
+                         parse_traceparent(request.headers.get(TRACEPARENT_HEADER))) as span:
+            response = await self.get_response(request)
+            self.finish(request, response, span)
+        return response
+
+    def finish(self, request, response, span):
+        # Имя спана - шаблон маршрута (как метка route в метриках), а не фактический путь
+        route = getattr(request, 'metrics_route', None)
+        match = getattr(request, 'resolver_match', None)
+        if not route and match is not None:
+            route = match.route
+        if route:
+            span.name = f"{request.method} {route}"
+        span.set_attribute('http.target', request.path)
+        span.set_attribute('http.status_code', response.status_code)
+        if response.status_code >= 500:
+            span.status = 'error'
+        # Клиент может найти трассу по заголовку ответа
+        response[TRACEPARENT_HEADER] = span.context.to_traceparent()
+
+
+tracer = Tracer()